@@ -1,3 +1,5 @@
+import sys
+
 # This function adds two numbers
 def add(x, y):
     return x + y
@@ -15,6 +17,14 @@ def divide(x, y):
     return x / y
 
 
+# Given arguments, evaluate in bulk instead of prompting (see --help). Piped menu
+# answers ("1", "3", "4") keep the prompts, so piped expressions need "-" or a flag.
+# calc_stream is only imported here: the menu doesn't need NumPy or Arrow
+if sys.argv[1:]:
+    import calc_stream
+    sys.exit(calc_stream.main())
+
+
 print("Select operation.")
 print("1.Add")
 print("2.Subtract")
@@ -8,6 +8,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential # type: ignore
 from openai import OpenAI # type: ignore
 import json
 import pandas as pd # type: ignore
+import image_ingest
 
 # === Configuration ===
 # Use environment variables or Streamlit secrets for API keys
@@ -259,14 +260,14 @@ with col1:
     with st.expander("📷 Upload Rooftop Image", expanded=True):
         uploaded_file = st.file_uploader(
             "Choose a rooftop image (satellite or direct photo)",
-            type=["png", "jpg", "jpeg"],
+            type=["png", "jpg", "jpeg", "tif", "tiff"],
             help="Clear, top-down views work best for accurate analysis."
         )
 
         image = None
         if uploaded_file:
             try:
-                image = Image.open(uploaded_file)
+                image = image_ingest.load_image(uploaded_file)
                 st.image(image, caption="Uploaded Rooftop Image", use_column_width=True)
             except Exception as e:
                 st.error(f"Failed to load image: {str(e)}")
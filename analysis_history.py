@@ -0,0 +1,229 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import image_hash
+
+# === Configuration ===
+HISTORY_DB_PATH = os.getenv("SOLAR_HISTORY_DB", "solar_history.db")
+DEFAULT_PAGE_SIZE = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    site TEXT NOT NULL DEFAULT '',
+    country TEXT NOT NULL DEFAULT '',
+    system_size_kw REAL,
+    panel_type TEXT,
+    report TEXT NOT NULL,
+    image_phash INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_site ON analyses(site);
+CREATE INDEX IF NOT EXISTS idx_analyses_country_date ON analyses(country, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_date ON analyses(created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_size ON analyses(system_size_kw);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+    site, report, content='analyses', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS analyses_ai AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts(rowid, site, report) VALUES (new.id, new.site, new.report);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_ad AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts(analyses_fts, rowid, site, report) VALUES ('delete', old.id, old.site, old.report);
+END;
+"""
+
+# Columns returned by listings; the report body is only loaded on demand
+SUMMARY_COLUMNS = "a.id, a.created_at, a.site, a.country, a.system_size_kw, a.panel_type"
+
+_connections = {}
+_phash_indexes = {}  # db_path -> (HammingIndex of hash -> analysis id, highest id loaded)
+_lock = threading.Lock()
+
+# === Connection Handling ===
+def get_connection(db_path: str = HISTORY_DB_PATH) -> sqlite3.Connection:
+    """Open (once per path) a WAL-mode connection shared across Streamlit reruns"""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            _migrate(conn)
+            _connections[db_path] = conn
+        return conn
+
+def _migrate(conn):
+    # Databases created before image hashes were stored lack the column
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(analyses)")}
+    if "image_phash" not in columns:
+        conn.execute("ALTER TABLE analyses ADD COLUMN image_phash INTEGER")
+
+def close_connection(db_path: str = HISTORY_DB_PATH):
+    """Close the cached connection for db_path, if any"""
+    with _lock:
+        conn = _connections.pop(db_path, None)
+        _phash_indexes.pop(db_path, None)
+    if conn is not None:
+        conn.close()
+
+# === Helpers ===
+def parse_system_size(report: str):
+    """Pull the recommended system size (kW) out of an analysis report, if present"""
+    match = re.search(r"Recommended system size[^0-9]*([0-9]+(?:\.[0-9]+)?)\s*kW", report or "", re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+def parse_panel_type(report: str):
+    """Pull the optimal panel type out of an analysis report, if present"""
+    match = re.search(r"Optimal panel type[^A-Za-z]*(Monocrystalline|Polycrystalline|Thin-Film)", report or "", re.IGNORECASE)
+    return match.group(1).title() if match else None
+
+def _filters_sql(country=None, site=None, date_from=None, date_to=None, min_size=None, max_size=None):
+    clauses, params = [], []
+    if country:
+        clauses.append("a.country = ?")
+        params.append(country)
+    if site:
+        clauses.append("a.site = ?")
+        params.append(site)
+    if date_from:
+        clauses.append("a.created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("a.created_at <= ?")
+        params.append(date_to)
+    if min_size is not None:
+        clauses.append("a.system_size_kw >= ?")
+        params.append(min_size)
+    if max_size is not None:
+        clauses.append("a.system_size_kw <= ?")
+        params.append(max_size)
+    return clauses, params
+
+# === Public API ===
+def save_analysis(report: str, country: str, site: str = "", system_size_kw=None, panel_type=None,
+                  image_phash=None, db_path: str = HISTORY_DB_PATH) -> int:
+    """Persist an analysis report (and the perceptual hash of its image) and return its id"""
+    if system_size_kw is None:
+        system_size_kw = parse_system_size(report)
+    if panel_type is None:
+        panel_type = parse_panel_type(report)
+    created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    conn = get_connection(db_path)
+    with _lock, conn:
+        cursor = conn.execute(
+            "INSERT INTO analyses (created_at, site, country, system_size_kw, panel_type, report, image_phash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (created_at, site or "", country or "", system_size_kw, panel_type, report,
+             None if image_phash is None else image_hash.to_signed(image_phash))
+        )
+    return cursor.lastrowid
+
+def get_analysis(analysis_id: int, db_path: str = HISTORY_DB_PATH):
+    """Load a single analysis, including the full report"""
+    row = get_connection(db_path).execute(
+        "SELECT * FROM analyses WHERE id = ?", (analysis_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def list_analyses(page: int = 0, page_size: int = DEFAULT_PAGE_SIZE, db_path: str = HISTORY_DB_PATH, **filters):
+    """Return one page of analysis summaries (newest first) without report bodies"""
+    clauses, params = _filters_sql(**filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = get_connection(db_path).execute(
+        f"SELECT {SUMMARY_COLUMNS} FROM analyses a {where} "
+        "ORDER BY a.created_at DESC, a.id DESC LIMIT ? OFFSET ?",
+        (*params, page_size, page * page_size)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def search_analyses(query: str, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE,
+                    db_path: str = HISTORY_DB_PATH, **filters):
+    """Full-text search over site names and reports, best matches first"""
+    clauses, params = _filters_sql(**filters)
+    clauses.insert(0, "analyses_fts MATCH ?")
+    params.insert(0, _fts_query(query))
+    rows = get_connection(db_path).execute(
+        f"SELECT {SUMMARY_COLUMNS}, snippet(analyses_fts, 1, '**', '**', '…', 12) AS snippet "
+        "FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid "
+        f"WHERE {' AND '.join(clauses)} ORDER BY rank LIMIT ? OFFSET ?",
+        (*params, page_size, page * page_size)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def count_analyses(db_path: str = HISTORY_DB_PATH, **filters) -> int:
+    """Count stored analyses matching the filters"""
+    clauses, params = _filters_sql(**filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return get_connection(db_path).execute(f"SELECT COUNT(*) FROM analyses a {where}", params).fetchone()[0]
+
+def iter_analyses(batch_size: int = 100, db_path: str = HISTORY_DB_PATH, **filters):
+    """Yield full analysis records in id order, fetching batch_size rows at a time"""
+    clauses, params = _filters_sql(**filters)
+    last_id = 0
+    while True:
+        where = " AND ".join(["a.id > ?"] + clauses)
+        rows = get_connection(db_path).execute(
+            f"SELECT a.* FROM analyses a WHERE {where} ORDER BY a.id LIMIT ?",
+            (last_id, *params, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row)
+        last_id = rows[-1]["id"]
+
+def find_similar(image_phash: int, max_distance: int = image_hash.NEAR_DUPLICATE_DISTANCE,
+                 limit: int = 5, country=None, db_path: str = HISTORY_DB_PATH):
+    """Summaries of analyses whose images are perceptually close, closest first
+
+    Hashes are kept in an in-memory multi-index that picks up rows added since
+    the last call, so lookups don't scan the table. With country, only
+    analyses for that country are returned.
+    """
+    conn = get_connection(db_path)
+    with _lock:
+        index, last_id = _phash_indexes.get(db_path) or (image_hash.HammingIndex(), 0)
+        for row in conn.execute(
+            "SELECT id, image_phash FROM analyses WHERE id > ? AND image_phash IS NOT NULL ORDER BY id", (last_id,)
+        ):
+            index.add(image_hash.to_unsigned(row["image_phash"]), row["id"])
+            last_id = row["id"]
+        _phash_indexes[db_path] = (index, last_id)
+        matches = index.search(image_phash, max_distance)
+    if not matches:
+        return []
+    distances = {}
+    for distance, analysis_id in matches:
+        distances.setdefault(analysis_id, distance)
+    ids = list(distances)
+    clauses, params = _filters_sql(country=country)
+    clauses.append(f"a.id IN ({','.join('?' * len(ids))})")
+    # Deleted analyses stay in the index; they simply no longer match a row here
+    rows = conn.execute(
+        f"SELECT {SUMMARY_COLUMNS} FROM analyses a WHERE {' AND '.join(clauses)}", params + ids
+    ).fetchall()
+    results = [{**dict(row), "distance": distances[row["id"]]} for row in rows]
+    results.sort(key=lambda r: (r["distance"], -r["id"]))
+    return results[:limit]
+
+def delete_analysis(analysis_id: int, db_path: str = HISTORY_DB_PATH):
+    """Remove an analysis from the history"""
+    conn = get_connection(db_path)
+    with _lock, conn:
+        conn.execute("DELETE FROM analyses WHERE id = ?", (analysis_id,))
+
+def _fts_query(query: str) -> str:
+    # Quote each term so user input can't inject FTS5 syntax; prefix-match the last one
+    terms = [t.replace('"', '""') for t in query.split()]
+    if not terms:
+        return '""'
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
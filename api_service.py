@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import io
+import logging
+import os
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile  # type: ignore
+from openai import OpenAI  # type: ignore
+from pydantic import BaseModel, Field  # type: ignore
+
+import battery_dispatch
+import geo_index
+import image_ingest
+import prompt_builder
+import results_store
+import solar_core
+import tariff_billing
+import vision_hedging
+from solar_compliance import SolarInstallation
+
+# === Configuration ===
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MODEL_NAME = os.getenv("VISION_MODEL", "google/gemini-pro-vision")
+MAX_BATCH_SIZE = int(os.getenv("API_MAX_BATCH_SIZE", "1000"))
+MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+RECORD_RESULTS = os.getenv("RECORD_RESULTS", "1") != "0"  # Feed the portfolio dashboard's results store
+
+logger = logging.getLogger("solar.api")
+
+openrouter_client = None
+if OPENROUTER_API_KEY:
+    openrouter_client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
+
+# Hedge vision calls to a backup provider when HEDGE_* / OPENAI_API_KEY is set
+vision_hedger = None
+backup_provider = vision_hedging.backup_provider_from_env()
+if OPENROUTER_API_KEY and backup_provider:
+    vision_hedger = vision_hedging.Hedger(
+        vision_hedging.VisionProvider("openrouter", OPENROUTER_BASE_URL, OPENROUTER_API_KEY, MODEL_NAME),
+        backup_provider
+    )
+
+app = FastAPI(title="Solar Industry AI Assistant API")
+
+# === Schemas ===
+class FinancialsRequest(BaseModel):
+    panel_type: str = Field(..., examples=["Monocrystalline"])
+    system_size: float = Field(..., gt=0, description="System size in kW")
+    electricity_rate: float = Field(..., gt=0, description="Electricity rate per kWh")
+    sun_hours: float = Field(4.5, gt=0)
+    country: str = "India"
+    tariff: Optional[str] = Field(None, description="Name of a preset hourly tariff; flat rate if omitted")
+    annual_load_kwh: Optional[float] = Field(None, gt=0)
+    has_bi_directional_meter: bool = Field(True, description="Without one, exports are billed at zero")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Applies the local net metering rules")
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    battery_capacity_kwh: Optional[float] = Field(None, gt=0, description="Usable battery capacity; no battery if omitted")
+    battery_power_kw: Optional[float] = Field(None, gt=0, description="Max charge/discharge power; half the capacity if omitted")
+    battery_efficiency: float = Field(0.9, gt=0, le=1, description="Round-trip efficiency")
+    battery_cost_per_kwh: float = Field(20000, ge=0)
+    battery_strategy: str = Field("self_consumption", examples=list(battery_dispatch.DISPATCH_STRATEGIES))
+
+class FinancialsResponse(BaseModel):
+    total_cost: float
+    annual_production_kwh: float
+    annual_savings: float
+    roi_years: Optional[float] = Field(None, description="Payback in years; null when the system saves nothing")
+    incentives: Dict[str, str]
+    tariff: Optional[str] = None
+    annual_bill_before: Optional[float] = None
+    annual_bill_after: Optional[float] = None
+    annual_export_kwh: Optional[float] = None
+    self_consumption_kwh: Optional[float] = None
+    battery_cost: Optional[float] = None
+    battery_strategy: Optional[str] = None
+    battery_annual_discharge_kwh: Optional[float] = None
+    battery_cycles_per_year: Optional[float] = None
+
+class ComplianceRequest(BaseModel):
+    location: str
+    system_size_kw: float = Field(..., gt=0)
+    has_bi_directional_meter: bool
+    inverter_certified: bool
+    meets_fire_code: bool
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Applies the local jurisdiction's rules")
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+class CheckResult(BaseModel):
+    passed: bool
+    message: str
+
+class ComplianceResponse(BaseModel):
+    all_passed: bool
+    checks: Dict[str, CheckResult]
+
+class BatchItem(BaseModel):
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+class AnalysisResponse(BaseModel):
+    analysis: str
+    token_usage: Optional[dict] = None
+
+# === Handlers ===
+# Buffered and written in batches off the event loop; a failed write never fails a request
+results_writer = results_store.ResultsWriter() if RECORD_RESULTS else None
+
+def _record(records):
+    if results_writer is not None and records:
+        results_writer.add(records)
+
+def _region_rules(latitude, longitude):
+    """(region, compliance rules) for a point, or (None, None) without one or without a region index"""
+    if latitude is None or longitude is None:
+        return None, None
+    region = geo_index.lookup(latitude, longitude)
+    return region, region["compliance_rules"] if region else None
+
+def _financials_scenario(request: FinancialsRequest) -> dict:
+    """calculate_financials arguments for a request; raises ValueError for unknown names"""
+    if request.panel_type not in solar_core.SOLAR_PANEL_TYPES:
+        raise ValueError(f"Unknown panel type: {request.panel_type}")
+    if request.battery_strategy not in battery_dispatch.DISPATCH_STRATEGIES:
+        raise ValueError(f"Unknown battery strategy: {request.battery_strategy}")
+    tariff = None
+    if request.tariff:
+        tariff = tariff_billing.preset_tariffs(request.electricity_rate).get(request.tariff)
+        if tariff is None:
+            raise ValueError(f"Unknown tariff: {request.tariff}")
+    # Exports are credited only where net metering is offered and metered; the other checks don't affect billing
+    _, rules = _region_rules(request.latitude, request.longitude)
+    installation = SolarInstallation(request.country, request.system_size, request.has_bi_directional_meter,
+                                     inverter_certified=True, meets_fire_code=True, rules=rules)
+    battery = None
+    if request.battery_capacity_kwh:
+        battery = battery_dispatch.Battery(
+            request.battery_capacity_kwh, request.battery_power_kw or request.battery_capacity_kwh / 2,
+            round_trip_efficiency=request.battery_efficiency, cost_per_kwh=request.battery_cost_per_kwh
+        )
+    return {
+        "panel_type": request.panel_type,
+        "system_size": request.system_size,
+        "electricity_rate": request.electricity_rate,
+        "sun_hours": request.sun_hours,
+        "country": request.country,
+        "tariff": installation.billing_tariff(tariff, request.electricity_rate),
+        "annual_load_kwh": request.annual_load_kwh,
+        "latitude": request.latitude if request.latitude is not None else 20.0,
+        "battery": battery,
+        "battery_strategy": request.battery_strategy,
+    }
+
+def _financials_record(request: FinancialsRequest, result: dict) -> dict:
+    return results_store.make_record(
+        request.country, system_size_kw=request.system_size, panel_type=request.panel_type,
+        financials=result, source="api"
+    )
+
+def _financials(request: FinancialsRequest, records=None) -> dict:
+    result = solar_core.calculate_financials(**_financials_scenario(request))
+    if records is not None:
+        records.append(_financials_record(request, result))
+    return result
+
+def _financials_batch(requests, records=None):
+    """Per-item results like _run_batch, with valid items billed together by calculate_financials_batch"""
+    results = [None] * len(requests)
+    valid, scenarios = [], []
+    for i, request in enumerate(requests):
+        try:
+            scenarios.append(_financials_scenario(request))
+            valid.append(i)
+        except Exception as e:
+            results[i] = {"error": str(e)}
+    for i, result in zip(valid, solar_core.calculate_financials_batch(scenarios)):
+        results[i] = {"result": result}
+        if records is not None:
+            records.append(_financials_record(requests[i], result))
+    return results
+
+def _compliance(request: ComplianceRequest, records=None) -> dict:
+    fields = request.model_dump(exclude={"latitude", "longitude"})
+    region, rules = _region_rules(request.latitude, request.longitude)
+    checks = SolarInstallation(**fields, rules=rules).run_all_checks()
+    if records is not None:
+        records.append(results_store.make_record(
+            (region or {}).get("country") or "Unknown", site=request.location,
+            system_size_kw=request.system_size_kw, checks=checks, source="api"
+        ))
+    return {
+        "all_passed": all(status for status, _ in checks.values()),
+        "checks": {name: {"passed": status, "message": message} for name, (status, message) in checks.items()},
+    }
+
+def _run_batch(handler, requests):
+    # Errors are reported per item so one bad row doesn't fail the whole batch
+    results = []
+    for request in requests:
+        try:
+            results.append({"result": handler(request)})
+        except Exception as e:
+            results.append({"error": str(e)})
+    return results
+
+def _check_batch_size(requests):
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {MAX_BATCH_SIZE}")
+
+# === Endpoints ===
+# Handlers that compute (billing, geo lookups, compliance) are plain functions,
+# which FastAPI runs on its threadpool instead of the event loop
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "vision_configured": openrouter_client is not None,
+        "hedging": vision_hedger.stats.snapshot() if vision_hedger else None,
+    }
+
+@app.get("/region")
+def region(lat: float, lon: float):
+    result = geo_index.lookup(lat, lon)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Region index not built")
+    return result
+
+@app.post("/financials", response_model=FinancialsResponse)
+def financials(request: FinancialsRequest):
+    records = []
+    try:
+        result = _financials(request, records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _record(records)
+    return result
+
+@app.post("/financials/batch", response_model=List[BatchItem])
+def financials_batch(requests: List[FinancialsRequest]):
+    _check_batch_size(requests)
+    records = []
+    results = _financials_batch(requests, records)
+    _record(records)
+    return results
+
+@app.post("/compliance", response_model=ComplianceResponse)
+def compliance(request: ComplianceRequest):
+    records = []
+    result = _compliance(request, records)
+    _record(records)
+    return result
+
+@app.post("/compliance/batch", response_model=List[BatchItem])
+def compliance_batch(requests: List[ComplianceRequest]):
+    _check_batch_size(requests)
+    records = []
+    results = _run_batch(lambda request: _compliance(request, records), requests)
+    _record(records)
+    return results
+
+@app.post("/analysis", response_model=AnalysisResponse)
+async def analysis(
+    file: UploadFile = File(...),
+    country: str = Form("India"),
+    depth: str = Form("Full assessment"),
+):
+    if openrouter_client is None:
+        raise HTTPException(status_code=503, detail="Vision API is not configured")
+    preset = prompt_builder.ANALYSIS_PRESETS.get(depth)
+    if preset is None:
+        raise HTTPException(status_code=400, detail=f"Unknown analysis depth: {depth}")
+    try:
+        sections = prompt_builder.fit_sections(country, solar_core.SOLAR_PANEL_TYPES.keys(),
+                                               preset["sections"], preset["concise"])
+    except prompt_builder.PromptBudgetError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # Read in chunks so an oversized upload is refused before it's all in memory
+    upload = io.BytesIO()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        if upload.tell() + len(chunk) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        upload.write(chunk)
+    upload.seek(0)
+    try:
+        # Header-first, downscaled decode with its own pixel limits; off the event loop since it's CPU-bound
+        image = await asyncio.to_thread(image_ingest.load_image, upload)
+    except image_ingest.ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to load image: {str(e)}")
+
+    # The OpenAI client is synchronous; keep the event loop free while it waits
+    try:
+        result, usage = await asyncio.to_thread(
+            solar_core.analyze_rooftop, openrouter_client, MODEL_NAME, image, country,
+            sections, preset["concise"], hedger=vision_hedger
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"API call failed: {str(e)}")
+    return {"analysis": result, "token_usage": usage}
+
+# === Entry Point ===
+if __name__ == "__main__":
+    import uvicorn  # type: ignore
+
+    parser = argparse.ArgumentParser(description="Run the Solar Industry AI Assistant API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    args = parser.parse_args()
+
+    # Multiple workers need the app as an import string so each process loads its own copy
+    uvicorn.run("api_service:app", host=args.host, port=args.port, workers=args.workers)
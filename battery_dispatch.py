@@ -0,0 +1,113 @@
+import numpy as np  # type: ignore
+
+import tariff_billing
+
+# The state of charge depends on the previous hour, so dispatch is a sequential
+# recurrence. numba compiles it to machine code when installed; the plain
+# Python fallback gives the same results, just more slowly.
+try:
+    from numba import njit  # type: ignore
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+DISPATCH_STRATEGIES = ("self_consumption", "tou_arbitrage")
+
+# === Battery ===
+class Battery:
+    def __init__(self, capacity_kwh, power_kw, round_trip_efficiency=0.9, min_soc=0.1,
+                 initial_soc=0.5, cost_per_kwh=20000):
+        self.capacity_kwh = capacity_kwh
+        self.power_kw = power_kw
+        self.round_trip_efficiency = round_trip_efficiency
+        self.min_soc = min_soc
+        self.initial_soc = initial_soc
+        self.cost_per_kwh = cost_per_kwh
+
+    @property
+    def total_cost(self):
+        return self.capacity_kwh * self.cost_per_kwh
+
+# === Dispatch Kernel ===
+@njit(cache=True)
+def _dispatch(pv, load, grid_charge, allow_discharge, capacity, power, charge_eff, discharge_eff,
+              soc_min, soc_start):
+    hours = pv.shape[0]
+    charge = np.zeros(hours)
+    discharge = np.zeros(hours)
+    soc = np.empty(hours)
+    energy = soc_start
+    for h in range(hours):
+        surplus = pv[h] - load[h]
+        if surplus > 0:
+            # Store PV surplus first; whatever doesn't fit is exported
+            stored = min(surplus, power, (capacity - energy) / charge_eff)
+            charge[h] = stored
+            energy += stored * charge_eff
+        elif grid_charge[h]:
+            stored = min(power, (capacity - energy) / charge_eff)
+            charge[h] = stored
+            energy += stored * charge_eff
+        elif allow_discharge[h]:
+            delivered = min(-surplus, power, (energy - soc_min) * discharge_eff)
+            if delivered > 0:
+                discharge[h] = delivered
+                energy -= delivered / discharge_eff
+        soc[h] = energy
+    return charge, discharge, soc
+
+# === Simulation ===
+def dispatch_schedule(strategy: str, tariff=None, band: float = 0.25):
+    """Hourly (grid_charge, allow_discharge) flags for a dispatch strategy
+
+    self_consumption: charge only from PV surplus, discharge whenever load exceeds PV.
+    tou_arbitrage: also charge from the grid in hours priced within `band` of the
+    cheapest rate, and hold stored energy for hours within `band` of the dearest.
+    """
+    hours = tariff_billing.HOURS_PER_YEAR
+    if strategy == "self_consumption":
+        return np.zeros(hours, dtype=np.bool_), np.ones(hours, dtype=np.bool_)
+    if strategy == "tou_arbitrage":
+        if tariff is None:
+            raise ValueError("TOU arbitrage needs a tariff")
+        rates = tariff.hourly_rates()
+        low, high = rates.min(), rates.max()
+        if high - low <= 1e-9:
+            # Flat prices: nothing to arbitrage, behave like self-consumption
+            return np.zeros(hours, dtype=np.bool_), np.ones(hours, dtype=np.bool_)
+        spread = (high - low) * band
+        return rates <= low + spread, rates >= high - spread
+    raise ValueError(f"Unknown dispatch strategy: {strategy}")
+
+def simulate_battery(pv, load, battery: Battery, strategy: str = "self_consumption", tariff=None):
+    """Hourly battery dispatch over a year of PV production and load (kWh per hour)
+
+    Returns hourly charge, discharge and state of charge (kWh), plus the
+    resulting grid imports/exports and annual totals.
+    """
+    pv = np.ascontiguousarray(pv, dtype=np.float64)
+    load = np.ascontiguousarray(load, dtype=np.float64)
+    grid_charge, allow_discharge = dispatch_schedule(strategy, tariff)
+    # Split the round-trip losses evenly between charging and discharging
+    one_way = battery.round_trip_efficiency ** 0.5
+    soc_min = battery.capacity_kwh * battery.min_soc
+    soc_start = max(soc_min, battery.capacity_kwh * battery.initial_soc)
+    charge, discharge, soc = _dispatch(
+        pv, load, grid_charge, allow_discharge, float(battery.capacity_kwh), float(battery.power_kw),
+        one_way, one_way, soc_min, soc_start
+    )
+    net = load - pv + charge - discharge
+    throughput = discharge.sum()
+    return {
+        "charge_kwh": charge,
+        "discharge_kwh": discharge,
+        "soc_kwh": soc,
+        "grid_import_kwh": np.maximum(net, 0),
+        "grid_export_kwh": np.maximum(-net, 0),
+        # What billing should treat as on-site supply: PV plus battery output minus battery input
+        "effective_production_kwh": pv - charge + discharge,
+        "annual_discharge_kwh": throughput,
+        "equivalent_full_cycles": throughput / battery.capacity_kwh if battery.capacity_kwh else 0.0,
+    }
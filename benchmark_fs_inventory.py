@@ -0,0 +1,81 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import fs_inventory
+
+# Builds a synthetic tree and times a plain os.walk + stat pass against the
+# inventory's first scan, an unchanged rescan and a rescan after a few
+# directories gained files. Directory mtimes are backdated so the rescans
+# aren't forced to relist directories created moments before the scan.
+
+def build_tree(root, directories, files_per_directory, fanout=20):
+    old = time.time() - 3600
+    paths = [root]
+    for i in range(1, directories):
+        parent = paths[(i - 1) // fanout]
+        path = os.path.join(parent, f"d{i}")
+        os.mkdir(path)
+        paths.append(path)
+    for path in paths:
+        for j in range(files_per_directory):
+            with open(os.path.join(path, f"f{j}.txt"), "w") as f:
+                f.write("x" * j)
+    for path in paths:
+        os.utime(path, (old, old))
+    return paths
+
+def walk_and_stat(root):
+    count = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            os.stat(os.path.join(directory, name), follow_symlinks=False)
+            count += 1
+    return count
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental directory inventory")
+    parser.add_argument("--directories", type=int, default=5000)
+    parser.add_argument("--files", type=int, default=40, help="Files per directory")
+    parser.add_argument("--touched", type=int, default=10, help="Directories changed before the last rescan")
+    parser.add_argument("--workers", type=int, default=fs_inventory.FS_INVENTORY_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "tree")
+        os.mkdir(root)
+        paths = build_tree(root, args.directories, args.files)
+        total = args.directories * args.files
+        index = fs_inventory.InventoryIndex(os.path.join(tmp, "index.db"))
+
+        def run(changes_only=False):
+            out = io.StringIO()
+            stats = fs_inventory.scan(root, index, out, changes_only, workers=args.workers)
+            return stats, out.getvalue().count("\n")
+
+        walk_s, walked = timed(lambda: walk_and_stat(root))
+        first_s, (first, first_lines) = timed(run)
+        rescan_s, (rescan, rescan_lines) = timed(run)
+        changed_s, (_, unchanged_lines) = timed(lambda: run(True))
+        for path in paths[::max(1, len(paths) // args.touched)][:args.touched]:
+            open(os.path.join(path, "new.txt"), "w").close()
+        touched_s, (touched, touched_lines) = timed(lambda: run(True))
+        index.close()
+
+    assert walked == first["files"] == total and first_lines == total + args.directories
+    assert rescan["reused"] == args.directories and rescan_lines == first_lines and unchanged_lines == 0
+    assert touched["listed"] == args.touched and touched_lines == args.touched
+    print(f"{args.directories} directories, {total} files, {args.workers} workers")
+    print(f"{'pass':<34}{'seconds':>9}{'listed':>9}{'lines':>10}")
+    print(f"{'os.walk + stat':<34}{walk_s:>9.2f}{args.directories:>9}{'-':>10}")
+    print(f"{'first scan':<34}{first_s:>9.2f}{first['listed']:>9}{first_lines:>10}")
+    print(f"{'rescan, full inventory':<34}{rescan_s:>9.2f}{rescan['listed']:>9}{rescan_lines:>10}")
+    print(f"{'rescan, --changes':<34}{changed_s:>9.2f}{0:>9}{unchanged_lines:>10}")
+    print(f"{f'rescan, --changes, {args.touched} dirs touched':<34}{touched_s:>9.2f}{touched['listed']:>9}{touched_lines:>10}")
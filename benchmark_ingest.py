@@ -0,0 +1,77 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Each case runs in a fresh subprocess so peak RSS (ru_maxrss) belongs to that case alone
+CASE_SCRIPT = """
+import resource, sys, time
+from PIL import Image
+Image.MAX_IMAGE_PIXELS = None
+import image_ingest
+path, method, max_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if method == "naive":
+    image = Image.open(path)
+    image.load()
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+else:
+    image = image_ingest.load_image(path, max_size=max_size)
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, baseline, peak, image.size[0], image.size[1])
+"""
+
+# Test images are generated in a subprocess too, so the benchmark process itself stays small
+GENERATE_SCRIPT = """
+import sys
+import numpy as np
+from PIL import Image
+path, fmt, side = sys.argv[1], sys.argv[2], int(sys.argv[3])
+rng = np.random.default_rng(0)
+pattern = Image.fromarray(rng.integers(0, 255, (256, side, 3), dtype=np.uint8))
+image = Image.new("RGB", (side, side))
+for top in range(0, side, 256):
+    image.paste(pattern, (0, top))
+if fmt == "jpg":
+    image.save(path, quality=90)
+else:
+    image.save(path)
+"""
+
+def make_source(directory, fmt, megapixels):
+    """Write a synthetic test image of roughly `megapixels` size"""
+    side = int((megapixels * 1_000_000) ** 0.5)
+    path = os.path.join(directory, f"tile_{megapixels}mp.{fmt}")
+    if not os.path.exists(path):
+        subprocess.run([sys.executable, "-c", GENERATE_SCRIPT, path, fmt, str(side)], check=True)
+    return path, side
+
+def run_case(path, method, max_size):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", CASE_SCRIPT, path, method, str(max_size)],
+        cwd=here, capture_output=True, text=True, check=True
+    ).stdout.split()
+    elapsed, baseline, peak = float(output[0]), int(output[1]), int(output[2])
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    return elapsed, baseline / scale, peak / scale
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image ingestion time and peak memory")
+    parser.add_argument("--megapixels", type=int, nargs="+", default=[25, 100])
+    parser.add_argument("--formats", nargs="+", default=["jpg", "tif", "bmp", "png"])
+    parser.add_argument("--max-size", type=int, default=2048)
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Where to write the synthetic test images")
+    args = parser.parse_args()
+
+    print(f"{'source':<22}{'method':<10}{'time (s)':>10}{'peak RSS (MiB)':>16}{'over baseline':>15}")
+    for megapixels in args.megapixels:
+        for fmt in args.formats:
+            path, side = make_source(args.dir, fmt, megapixels)
+            label = f"{side}x{side} {fmt}"
+            for method in ("naive", "streaming"):
+                elapsed, baseline, peak = run_case(path, method, args.max_size)
+                print(f"{label:<22}{method:<10}{elapsed:>10.2f}{peak:>16.1f}{peak - baseline:>15.1f}")
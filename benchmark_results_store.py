@@ -0,0 +1,102 @@
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np  # type: ignore
+import pyarrow as pa  # type: ignore
+
+import analysis_history
+import results_store
+
+# Fills a results store with synthetic portfolio rows and times the dashboard
+# aggregates against it, next to the cost of recovering the same figures by
+# re-parsing markdown reports (measured on a sample and scaled to the row count).
+COUNTRIES = ["India", "United States", "Germany", "Australia", "Brazil", "South Africa"]
+
+def synthetic_table(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp() * 1000
+    created = np.sort(rng.uniform(start, start + 2 * 365 * 86400 * 1000, rows)).astype("int64")
+    created_at = pa.array(created, pa.timestamp("ms", tz="UTC"))
+    size = rng.uniform(2, 15, rows)
+    cost = size * rng.uniform(35000, 50000, rows)
+    savings = size * 4.5 * 365 * rng.uniform(5, 11, rows)
+    checked = rng.random(rows) < 0.6
+    building = size <= 10
+    net_metering = rng.random(rows) < 0.92
+    safety = rng.random(rows) < 0.97
+
+    def checks(values):
+        return pa.array(values, mask=~checked)
+
+    return pa.table({
+        "created_at": created_at,
+        "source": pa.array(np.full(rows, "app")),
+        "analysis_id": pa.array(np.arange(rows)),
+        "site": pa.array(np.full(rows, "")),
+        "panel_type": pa.array(rng.choice(["Monocrystalline", "Polycrystalline", "Thin-Film"], rows)),
+        "system_size_kw": size,
+        "total_cost": cost,
+        "annual_production_kwh": size * 4.5 * 365,
+        "annual_savings": savings,
+        "roi_years": cost / savings,
+        "tariff": pa.nulls(rows, pa.string()),
+        "battery_cost": pa.nulls(rows, pa.float64()),
+        "compliance_passed": checks(building & net_metering & safety),
+        "building_code_passed": checks(building),
+        "net_metering_passed": checks(net_metering),
+        "safety_passed": checks(safety),
+        "country": pa.array(rng.choice(COUNTRIES, rows, p=[0.4, 0.25, 0.1, 0.1, 0.1, 0.05])),
+        "month": pc_strftime(created_at),
+    })
+
+def pc_strftime(timestamps):
+    import pyarrow.compute as pc  # type: ignore
+    return pc.strftime(timestamps, format="%Y-%m")
+
+def reparse_seconds_per_report(samples=20000):
+    reports = [
+        f"## Solar Potential\nRecommended system size: {5 + i % 7}.5 kW\nOptimal panel type: Monocrystalline\n"
+        + "Lorem ipsum dolor sit amet, roof orientation and shading notes. " * 40
+        for i in range(samples)
+    ]
+    start = time.perf_counter()
+    for report in reports:
+        analysis_history.parse_system_size(report)
+        analysis_history.parse_panel_type(report)
+    return (time.perf_counter() - start) / samples
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark portfolio aggregates over the results store")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--batch", type=int, default=250_000, help="Rows per append")
+    args = parser.parse_args()
+
+    per_report = reparse_seconds_per_report()
+    print(f"{'rows':>10}{'write (s)':>11}{'cold (s)':>10}{'warm (s)':>10}{'+1 result (s)':>15}"
+          f"{'1 country, mid-month range (s)':>32}{'re-parse reports (s)':>22}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as root:
+            store = results_store.ResultsStore(root)
+            table = synthetic_table(rows)
+            start = time.perf_counter()
+            for offset in range(0, rows, args.batch):
+                store.append_table(table.slice(offset, args.batch))
+            store.compact()
+            write_s = time.perf_counter() - start
+            # A fresh store object has nothing memoized, like a restarted dashboard
+            cold_s, summary = timed(results_store.ResultsStore(root).portfolio_summary)
+            store.portfolio_summary()
+            warm_s, _ = timed(store.portfolio_summary)
+            store.append_table(synthetic_table(1, seed=1))  # One analysis saved from the app
+            appended_s, appended = timed(store.portfolio_summary)
+            filtered_s, _ = timed(lambda: store.portfolio_summary(["Germany"], date(2025, 4, 15), date(2025, 7, 15)))
+            assert summary["rows"] == rows and appended["rows"] == rows + 1
+        print(f"{rows:>10}{write_s:>11.2f}{cold_s:>10.3f}{warm_s:>10.3f}{appended_s:>15.3f}"
+              f"{filtered_s:>32.3f}{per_report * rows:>22.1f}")
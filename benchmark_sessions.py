@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Simulates N Streamlit sessions each holding an analyzed rooftop image, either
+# as a PIL image in session state (the old behaviour) or as a blob store key.
+# Each mode runs in a fresh subprocess so its resident memory is its own.
+CASE_SCRIPT = """
+import resource, sys, time
+from PIL import Image, ImageDraw
+import blob_store
+
+def rss_mib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+mode, sessions, side, store_dir = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4]
+base = Image.radial_gradient("L").resize((side, side)).convert("RGB")
+store = blob_store.BlobStore(store_dir, max_bytes=1 << 40) if mode == "blob" else None
+baseline = rss_mib()
+start = time.perf_counter()
+session_states = []
+for i in range(sessions):
+    # Every session uploads a different roof
+    image = base.copy()
+    ImageDraw.Draw(image).rectangle((i % side, 0, i % side + 40, 40), fill=(i % 256, 80, 160))
+    state = {"analysis_result": "Recommended system size: 5 kW\\n" * 50}
+    if store:
+        state["image_key"] = store.put_image(image)
+    else:
+        state["image"] = image
+    session_states.append(state)
+    del image
+elapsed = time.perf_counter() - start
+thumb_ms = 0.0
+if store:
+    start = time.perf_counter()
+    store.thumbnail(session_states[0]["image_key"])
+    thumb_ms = (time.perf_counter() - start) * 1000
+print(elapsed, baseline, rss_mib(), thumb_ms)
+"""
+
+def run_case(mode, sessions, side, store_dir):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", CASE_SCRIPT, mode, str(sessions), str(side), store_dir],
+        cwd=here, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return tuple(float(value) for value in output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark server memory with N sessions holding images")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--side", type=int, default=1024, help="Image width/height in pixels")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>9}  {'mode':<6}{'setup (s)':>10}{'RSS (MiB)':>11}{'per session':>13}{'thumbnail (ms)':>16}")
+    for sessions in args.sessions:
+        for mode in ("pil", "blob"):
+            with tempfile.TemporaryDirectory() as store_dir:
+                elapsed, baseline, rss, thumb_ms = run_case(mode, sessions, args.side, store_dir)
+            per_session = (rss - baseline) / sessions
+            thumb = f"{thumb_ms:>16.1f}" if mode == "blob" else f"{'-':>16}"
+            print(f"{sessions:>9}  {mode:<6}{elapsed:>10.2f}{rss:>11.1f}{per_session:>13.2f}{thumb}")
@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np  # type: ignore
+
+import tariff_billing
+
+# Generates 15-minute telemetry for N sites (a known fraction of them degraded)
+# and times telemetry.py ingesting it in a fresh subprocess, reporting records/s,
+# resident memory per site and whether exactly the degraded sites were flagged.
+CASE_SCRIPT = """
+import resource, sys, time
+import telemetry
+
+def rss_mib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+sites_path, telemetry_path = sys.argv[1], sys.argv[2]
+monitor = telemetry.TelemetryMonitor(telemetry.load_sites(sites_path))
+baseline = rss_mib()
+start = time.perf_counter()
+telemetry.ingest_file(monitor, telemetry_path)
+monitor.flush()
+elapsed = time.perf_counter() - start
+flagged = sorted(s["site_id"] for s in monitor.underperforming())
+print(monitor.records, elapsed, baseline, rss_mib(), ",".join(flagged))
+"""
+
+def write_case(directory, sites, days, degraded_fraction, fmt, seed=0):
+    """Sites file plus day-ordered telemetry; returns (sites path, telemetry path, degraded site ids)"""
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(3, 12, sites).round(1)
+    sun_hours = rng.uniform(4.0, 6.0, sites).round(2)
+    latitudes = rng.uniform(8, 35, sites).round(1)
+    health = np.where(rng.random(sites) < degraded_fraction, 0.55, 0.9)
+    ids = [f"site-{i:05d}" for i in range(sites)]
+    sites_path = os.path.join(directory, "sites.csv")
+    with open(sites_path, "w") as f:
+        f.write("site_id,system_size_kw,sun_hours,latitude\n")
+        f.writelines(f"{ids[i]},{sizes[i]},{sun_hours[i]},{latitudes[i]}\n" for i in range(sites))
+
+    shapes = {lat: tariff_billing.production_shape(lat).reshape(365, 24) for lat in np.unique(latitudes.round())}
+    telemetry_path = os.path.join(directory, f"telemetry.{fmt}")
+    with open(telemetry_path, "w") as f:
+        if fmt == "csv":
+            f.write("site_id,timestamp,power_kw\n")
+        for day in range(days):
+            stamp = f"2025-06-{day + 1:02d}" if day < 30 else f"2025-07-{day - 29:02d}"
+            for slot in range(96):
+                hour = slot // 4
+                timestamp = f"{stamp}T{hour:02d}:{slot % 4 * 15:02d}:00"
+                expected_kw = np.array([shapes[round(lat)][151 + day, hour] for lat in latitudes]) * sizes * sun_hours * 365
+                power = expected_kw * health * rng.normal(1, 0.08, sites).clip(0.5, 1.5)
+                if fmt == "csv":
+                    f.writelines(f"{ids[i]},{timestamp},{power[i]:.3f}\n" for i in range(sites))
+                else:
+                    f.writelines(f'{{"site_id": "{ids[i]}", "timestamp": "{timestamp}", "power_kw": {power[i]:.3f}}}\n'
+                                 for i in range(sites))
+    return sites_path, telemetry_path, sorted(ids[i] for i in np.flatnonzero(health < 0.9))
+
+def run_case(sites_path, telemetry_path):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", CASE_SCRIPT, sites_path, telemetry_path],
+        cwd=here, capture_output=True, text=True, check=True
+    ).stdout.split()
+    flagged = output[4].split(",") if len(output) > 4 else []
+    return int(output[0]), float(output[1]), float(output[2]), float(output[3]), flagged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming telemetry ingestion")
+    parser.add_argument("--sites", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--degraded", type=float, default=0.05, help="Fraction of sites producing ~40%% less")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    args = parser.parse_args()
+
+    print(f"{'sites':>7}{'records':>11}{'time (s)':>10}{'records/s':>12}{'RSS (MiB)':>11}{'KiB/site':>10}"
+          f"{'degraded':>10}{'flagged':>9}{'correct':>9}")
+    for sites in args.sites:
+        with tempfile.TemporaryDirectory() as directory:
+            sites_path, telemetry_path, degraded = write_case(directory, sites, args.days, args.degraded, args.format)
+            records, elapsed, baseline, rss, flagged = run_case(sites_path, telemetry_path)
+        per_site = (rss - baseline) * 1024 / sites
+        print(f"{sites:>7}{records:>11}{elapsed:>10.2f}{records / elapsed:>12,.0f}{rss:>11.1f}{per_site:>10.2f}"
+              f"{len(degraded):>10}{len(flagged):>9}{str(flagged == degraded):>9}")
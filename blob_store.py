@@ -0,0 +1,143 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image  # type: ignore
+
+# Content-addressed image storage so Streamlit session state only holds a
+# digest instead of a decoded PIL image per user. Blobs live on disk (the OS
+# page cache keeps hot ones in memory, shared across sessions), identical
+# uploads are stored once, and the least recently used blobs are evicted once
+# the store exceeds its size cap.
+
+# === Configuration ===
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blob_store")
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_MB", "2048")) * 1024 * 1024
+THUMBNAIL_SIZE = 512
+
+class BlobStore:
+    def __init__(self, root: str = BLOB_STORE_DIR, max_bytes: int = BLOB_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # blob name -> size, least recently used first
+        self.size_bytes = 0
+        os.makedirs(root, exist_ok=True)
+        found = []
+        for shard in os.scandir(root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.size_bytes += size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _touch(self, name: str):
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        try:
+            os.utime(self._path(name))  # Keeps LRU order across restarts
+        except OSError:
+            pass
+
+    def _write(self, name: str, data: bytes):
+        path = self._path(name)
+        if name in self:
+            self._touch(name)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            # Another thread may have stored the same name since the check above; count it once
+            self.size_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted = self._evict(keep=name)
+        for victim in evicted:
+            try:
+                os.remove(self._path(victim))
+            except OSError:
+                pass
+
+    def _evict(self, keep: str):
+        # Drop to 90% of the cap so eviction doesn't run on every write
+        evicted = []
+        if self.size_bytes <= self.max_bytes:
+            return evicted
+        target = self.max_bytes * 0.9
+        for name in list(self._entries):
+            if self.size_bytes <= target:
+                break
+            if name == keep:
+                continue
+            self.size_bytes -= self._entries.pop(name)
+            evicted.append(name)
+        return evicted
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    # === Bytes ===
+    def put_bytes(self, data: bytes, suffix: str = "") -> str:
+        """Store data under its SHA-256 digest (plus optional suffix) and return the key"""
+        key = hashlib.sha256(data).hexdigest() + suffix
+        self._write(key, data)
+        return key
+
+    def put_named(self, key: str, data: bytes) -> str:
+        """Store data under a caller-chosen key, e.g. a digest of whatever it was rendered from"""
+        self._write(key, data)
+        return key
+
+    def get_bytes(self, key: str) -> bytes:
+        """Blob contents; raises KeyError if it was never stored or has been evicted"""
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._entries:
+                    self.size_bytes -= self._entries.pop(key)
+            raise KeyError(key)
+        self._touch(key)
+        return data
+
+    # === Images ===
+    def put_image(self, image: Image.Image) -> str:
+        """Store an image losslessly as PNG and return its key"""
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG", compress_level=1)
+        return self.put_bytes(buffered.getvalue(), ".png")
+
+    def open_image(self, key: str) -> Image.Image:
+        image = Image.open(io.BytesIO(self.get_bytes(key)))
+        image.load()
+        return image
+
+    def thumbnail(self, key: str, size: int = THUMBNAIL_SIZE) -> bytes:
+        """JPEG preview of a stored image, rendered on first request and then cached as its own blob"""
+        thumb_key = f"{key}.thumb{size}.jpg"
+        try:
+            return self.get_bytes(thumb_key)
+        except KeyError:
+            pass
+        image = self.open_image(key)
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffered = io.BytesIO()
+        image.convert("RGB").save(buffered, format="JPEG", quality=85)
+        data = buffered.getvalue()
+        self._write(thumb_key, data)
+        return data
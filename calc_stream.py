@@ -0,0 +1,356 @@
+import argparse
+import ast
+import re
+import sys
+import warnings
+from functools import lru_cache
+
+import numpy as np  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.csv as pa_csv  # type: ignore
+
+# Non-interactive mode for the calculator scripts. Expressions are parsed with
+# ast and only arithmetic, a few math functions and column names are allowed;
+# each expression is compiled once into NumPy operations and evaluated over
+# whole columns. Two input modes:
+#   --expr/--op: every line holds operands ("3 4" or "3,4"), one result per line
+#   otherwise:   every line is an expression ("3 * (4 + 5)"); lines of the same
+#                shape share one compiled expression and are evaluated together
+
+# === Configuration ===
+CHUNK_BYTES = 4 * 1024 * 1024    # Input is read, evaluated and written in chunks of about this size
+MAX_EXPRESSION_LENGTH = 10_000
+MAX_EXPRESSION_DEPTH = 200       # Nesting limit; compiling and evaluating recurse once per level
+ON_ZERO_CHOICES = ("error", "nan", "inf")
+
+# The interactive menu's choices, for --op
+OPERATIONS = {
+    "add": "x + y", "1": "x + y",
+    "subtract": "x - y", "2": "x - y",
+    "multiply": "x * y", "3": "x * y",
+    "divide": "x / y", "4": "x / y",
+}
+
+# === Safe Expressions ===
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+DIVISIONS = (ast.Div, ast.FloorDiv, ast.Mod)
+UNARY_OPERATORS = {ast.USub: np.negative, ast.UAdd: np.positive}
+FUNCTIONS = {
+    "abs": (np.abs, 1), "sqrt": (np.sqrt, 1), "exp": (np.exp, 1), "log": (np.log, 1), "log10": (np.log10, 1),
+    "sin": (np.sin, 1), "cos": (np.cos, 1), "tan": (np.tan, 1), "floor": (np.floor, 1), "ceil": (np.ceil, 1),
+    "round": (np.round, 1), "min": (np.minimum, 2), "max": (np.maximum, 2), "hypot": (np.hypot, 2),
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+
+class Expression:
+    """An arithmetic expression compiled once into NumPy operations over whole columns
+
+    Anything other than numbers, names, + - * / // % **, unary +/- and the
+    FUNCTIONS whitelist is rejected at compile time, so input can't run code.
+    """
+
+    def __init__(self, source: str):
+        if len(source) > MAX_EXPRESSION_LENGTH:
+            raise ValueError("expression too long")
+        self.source = source
+        self.names = []
+        try:
+            tree = ast.parse(source.strip(), mode="eval").body
+        except (RecursionError, MemoryError):
+            # CPython's parser gives up on deep nesting (e.g. thousands of unary minuses) this way
+            raise ValueError("expression nested too deeply")
+        _check_depth(tree)
+        self._evaluate = self._compile(tree)
+
+    def _compile(self, node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            value = float(node.value)  # Floats throughout: 10 ** 10 ** 10 overflows to inf instead of hanging
+            return lambda columns, zeros: value
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                value = CONSTANTS[node.id]
+                return lambda columns, zeros: value
+            if node.id not in self.names:
+                self.names.append(node.id)
+            name = node.id
+            return lambda columns, zeros: columns[name]
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            operand, function = self._compile(node.operand), UNARY_OPERATORS[type(node.op)]
+            return lambda columns, zeros: function(operand(columns, zeros))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            left, right = self._compile(node.left), self._compile(node.right)
+            function = BINARY_OPERATORS[type(node.op)]
+            if not isinstance(node.op, DIVISIONS):
+                return lambda columns, zeros: function(left(columns, zeros), right(columns, zeros))
+
+            def divide(columns, zeros):
+                divisor = right(columns, zeros)
+                zero_rows = np.equal(divisor, 0)
+                if np.any(zero_rows):
+                    zeros.append(zero_rows)
+                return function(left(columns, zeros), divisor)
+            return divide
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and not node.keywords:
+            function, arity = FUNCTIONS[node.func.id]
+            if len(node.args) != arity:
+                raise ValueError(f"{node.func.id}() takes {arity} argument{'s' if arity > 1 else ''}")
+            args = [self._compile(arg) for arg in node.args]
+            return lambda columns, zeros: function(*(arg(columns, zeros) for arg in args))
+        raise ValueError(f"unsupported syntax: {ast.unparse(node) if hasattr(ast, 'unparse') else type(node).__name__}")
+
+    def evaluate(self, columns, rows: int, on_zero: str = "error"):
+        """(float64 results for `rows` rows, mask of rows that divided by zero or None)
+
+        on_zero="nan" turns those rows into NaN, "inf" keeps IEEE results (±inf or
+        NaN), and "error" keeps them flagged in the returned mask for the caller.
+        """
+        zeros = []
+        with np.errstate(all="ignore"):
+            values = np.broadcast_to(np.asarray(self._evaluate(columns, zeros), dtype=np.float64), (rows,))
+        if not zeros or on_zero == "inf":
+            return values, None
+        zero_mask = np.zeros(rows, dtype=bool)
+        for rows_hit in zeros:
+            zero_mask |= rows_hit
+        if on_zero == "nan":
+            return np.where(zero_mask, np.nan, values), None
+        return values, zero_mask
+
+def _check_depth(tree):
+    # Iterative, so the check itself can't hit the recursion limit
+    stack = [(tree, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if depth > MAX_EXPRESSION_DEPTH:
+            raise ValueError("expression nested too deeply")
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+
+@lru_cache(maxsize=4096)
+def compile_expression(source: str) -> Expression:
+    return Expression(source)
+
+# === Output ===
+def write_results(out, values, errors=None):
+    """Write one result per line; errors maps row -> text printed instead of the value"""
+    strings = pa.array(values, type=pa.float64()).cast(pa.string())
+    if errors:
+        mask = np.zeros(len(values), dtype=bool)
+        rows = sorted(errors)
+        mask[rows] = True
+        strings = pc.replace_with_mask(strings, pa.array(mask), pa.array([errors[row] for row in rows], pa.string()))
+    pa_csv.write_csv(pa.table({"result": strings}), out, pa_csv.WriteOptions(
+        include_header=False, delimiter="\t", quoting_style="none"
+    ))
+
+def _error(message) -> str:
+    # Output is one line per row, so messages are flattened
+    return "error: " + " ".join(str(message).split())
+
+def _read_chunks(stream):
+    while True:
+        lines = stream.readlines(CHUNK_BYTES)
+        if not lines:
+            return
+        yield lines
+
+# === Operand Columns ===
+def _column_names(count: int):
+    return ["x", "y", "z"][:count] + [f"c{i + 1}" for i in range(3, count)]
+
+def _parse_rows(lines, width: int):
+    """(rows x width values, {row: error}) for a chunk of operand lines; blank lines are dropped"""
+    data = b" ".join(lines).replace(b",", b" ")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)  # NumPy < 2.3 warns and truncates instead of raising
+            values = np.fromstring(data, sep=" ")
+        if values.size == len(lines) * width:
+            return values.reshape(len(lines), width), {}
+    except ValueError:
+        pass
+    # Blank lines or something that isn't a row of numbers: parse line by line
+    lines = [line for line in lines if line.strip()]
+    values = np.full((len(lines), width), np.nan)
+    errors = {}
+    for i, line in enumerate(lines):
+        tokens = line.replace(b",", b" ").split()
+        if len(tokens) != width:
+            errors[i] = _error(f"expected {width} operands, got {len(tokens)}")
+            continue
+        try:
+            values[i] = [float(token) for token in tokens]
+        except ValueError:
+            errors[i] = _error(f"invalid number in {line.decode(errors='replace').strip()!r}")
+    return values, errors
+
+def evaluate_columns(expression: Expression, stream, out, names=None, on_zero: str = "error") -> int:
+    """Evaluate an expression over operand rows from a binary stream; returns rows with errors
+
+    Columns are named by a header line when the first line isn't numeric, else
+    by `names`, else x, y, z, c4, c5, ... Blank lines are skipped.
+    """
+    width = None
+    failures = 0
+    for lines in _read_chunks(stream):
+        if width is None:
+            first = next((i for i, line in enumerate(lines) if line.strip()), None)
+            if first is None:
+                continue
+            tokens = [token.decode() for token in lines[first].replace(b",", b" ").split()]
+            lines = lines[first:]
+            try:
+                [float(token) for token in tokens]
+            except ValueError:
+                names = tokens
+                lines = lines[1:]
+            width = len(tokens)
+            names = list(names or _column_names(width))
+            if len(names) != width:
+                raise ValueError(f"{len(names)} column names for {width} columns")
+            missing = [name for name in expression.names if name not in names]
+            if missing:
+                raise ValueError(f"unknown column{'s' if len(missing) > 1 else ''}: {', '.join(missing)} "
+                                 f"(columns are {', '.join(names)})")
+            if not lines:
+                continue
+        values, errors = _parse_rows(lines, width)
+        if not len(values):
+            continue
+        columns = {name: values[:, i] for i, name in enumerate(names)}
+        results, zero_mask = expression.evaluate(columns, len(values), on_zero)
+        if zero_mask is not None:
+            for row in np.flatnonzero(zero_mask).tolist():
+                errors.setdefault(row, _error("division by zero"))
+        failures += len(errors)
+        write_results(out, results, errors)
+    return failures
+
+# === Expression Lines ===
+NUMBER = re.compile(r"(?<![\w.])(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+PLACEHOLDER = "\x00"
+
+@lru_cache(maxsize=4096)
+def _shape_expression(shape: str):
+    """Compile an expression shape (a line with its numbers replaced by PLACEHOLDER) with _0, _1, ... as the numbers"""
+    parts = shape.split(PLACEHOLDER)
+    source = "".join(part + (f"_{i}" if i < len(parts) - 1 else "") for i, part in enumerate(parts))
+    expression = compile_expression(source)
+    unknown = [name for name in expression.names if not re.fullmatch(r"_\d+", name)]
+    if unknown:
+        raise ValueError(f"unknown name: {unknown[0]}")
+    return expression
+
+def _parse_numbers(tokens):
+    try:
+        values = np.fromstring(" ".join(tokens), sep=" ")
+        if values.size == len(tokens):
+            return values
+    except ValueError:
+        pass
+    return np.array(tokens, dtype=np.float64)
+
+def evaluate_lines(stream, out, on_zero: str = "error") -> int:
+    """Evaluate one expression per line from a binary stream; returns lines with errors
+
+    Numbers are lifted out of each line, so "1 + 2" and "3.5 + 4" share the shape
+    "_0 + _1": it's compiled once and evaluated for all such lines at once.
+    Output keeps input order; blank lines give blank output lines.
+    """
+    failures = 0
+    for lines in _read_chunks(stream):
+        # Whole-chunk regex passes and Arrow hashing keep per-line Python work to a minimum
+        text = b"".join(lines).decode("utf-8", errors="replace")
+        shapes = NUMBER.sub(PLACEHOLDER, text).split("\n")
+        if text.endswith("\n"):
+            shapes.pop()
+        numbers = _parse_numbers(NUMBER.findall(text))
+        counts = np.fromiter((shape.count(PLACEHOLDER) for shape in shapes), dtype=np.int64, count=len(shapes))
+        offsets = np.cumsum(counts) - counts
+        encoded = pc.dictionary_encode(pa.array(shapes, pa.string()))
+        codes = encoded.indices.to_numpy(zero_copy_only=False)
+        order = np.argsort(codes, kind="stable")
+        ends = np.cumsum(np.bincount(codes, minlength=len(encoded.dictionary)))
+
+        results = np.full(len(shapes), np.nan)
+        errors = {}
+        for code, shape in enumerate(encoded.dictionary.to_pylist()):
+            rows = order[ends[code - 1] if code else 0:ends[code]]
+            if not shape.strip():
+                errors.update((row, "") for row in rows.tolist())
+                continue
+            try:
+                expression = _shape_expression(shape)
+            except (SyntaxError, ValueError) as e:
+                message = _error(e.msg if isinstance(e, SyntaxError) else e)
+                errors.update((row, message) for row in rows.tolist())
+                continue
+            width = shape.count(PLACEHOLDER)
+            operands = numbers[offsets[rows][:, None] + np.arange(width)]
+            columns = {f"_{i}": operands[:, i] for i in range(width)}
+            values, zero_mask = expression.evaluate(columns, len(rows), on_zero)
+            results[rows] = values
+            if zero_mask is not None:
+                errors.update((row, _error("division by zero")) for row in rows[zero_mask].tolist())
+        failures += sum(1 for message in errors.values() if message)
+        write_results(out, results, errors)
+    return failures
+
+# === Command Line ===
+def main(argv=None, prog=None) -> int:
+    """Batch entry point shared by the calculator scripts; returns the exit status"""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Evaluate arithmetic in bulk: one expression per line, or --expr/--op over operand columns"
+    )
+    formula = parser.add_mutually_exclusive_group()
+    formula.add_argument("--expr", help='Expression over operand columns, e.g. "x / y" or "(a + b) * 2"')
+    formula.add_argument("--op", choices=sorted(OPERATIONS), help="Apply the menu operation to x and y columns")
+    parser.add_argument("--names", help="Comma-separated column names when the input has no header")
+    parser.add_argument("--on-zero", choices=ON_ZERO_CHOICES, default="error",
+                        help='Division by zero: print "error: division by zero" (default), nan, or IEEE inf')
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("inputs", nargs="*", help="Input files (default or -: stdin)")
+    args = parser.parse_args(argv)
+
+    source = args.expr or OPERATIONS.get(args.op)
+    try:
+        expression = compile_expression(source) if source else None
+    except (SyntaxError, ValueError) as e:
+        parser.error(f"invalid expression: {e.msg if isinstance(e, SyntaxError) else e}")
+    names = args.names.split(",") if args.names else None
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    failures = 0
+    try:
+        for path in args.inputs or ["-"]:
+            stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+            try:
+                if expression is None:
+                    failures += evaluate_lines(stream, out, args.on_zero)
+                else:
+                    failures += evaluate_columns(expression, stream, out, names, args.on_zero)
+            finally:
+                if stream is not sys.stdin.buffer:
+                    stream.close()
+    except ValueError as e:
+        print(f"{parser.prog}: {e}", file=sys.stderr)
+        return 2
+    finally:
+        out.flush()
+        if args.output:
+            out.close()
+    if failures:
+        print(f"{parser.prog}: {failures} row{'s' if failures > 1 else ''} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
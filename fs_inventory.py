@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Recursive filesystem inventory written as JSON lines. Directories are listed
+# with os.scandir on a thread pool (listing and stat calls release the GIL, so
+# slow or networked disks are read in parallel) and every directory's listing
+# is kept in an SQLite index with the directory's mtime. Adding, removing or
+# renaming an entry changes its directory's mtime, so on a re-run a directory
+# whose mtime is unchanged costs one stat and one index read instead of a
+# listing plus a stat per file. Edits to a file's contents don't touch the
+# directory; --full relists everything to pick those up.
+
+# === Configuration ===
+FS_INVENTORY_INDEX = os.getenv("FS_INVENTORY_INDEX", "fs_inventory.db")
+FS_INVENTORY_WORKERS = int(os.getenv("FS_INVENTORY_WORKERS", "16"))
+DEFAULT_EXCLUDES = ("/proc", "/sys")  # Pseudo filesystems, only relevant when scanning from /
+COMMIT_EVERY = 1000                   # Directories per index transaction
+RACY_WINDOW_NS = 2_000_000_000        # Directories changed this close to a scan are relisted next time
+RACY = -1                             # mtime stored for such directories
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    files TEXT NOT NULL,
+    subdirs TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+KINDS = {"f": "file", "d": "dir", "l": "symlink", "o": "other"}
+
+# === Index ===
+class InventoryIndex:
+    """Per-directory listings keyed by absolute path; reads are safe from any thread"""
+
+    def __init__(self, path: str = FS_INVENTORY_INDEX):
+        self.path = path
+        self._local = threading.local()
+        self._reader_lock = threading.Lock()
+        self._readers = []  # Every thread's read connection, so close() can reach them
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._pending = 0
+
+    def get(self, path: str):
+        """(mtime_ns, files JSON, subdirs JSON) or None"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, check_same_thread=False)
+            with self._reader_lock:
+                self._readers.append(conn)
+        return conn.execute("SELECT mtime_ns, files, subdirs FROM directories WHERE path = ?", (path,)).fetchone()
+
+    def put(self, path: str, mtime_ns: int, files, subdirs):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO directories (path, mtime_ns, files, subdirs) VALUES (?, ?, ?, ?)",
+            (path, mtime_ns, json.dumps(files, separators=(",", ":")), json.dumps(subdirs, separators=(",", ":")))
+        )
+        self._count_write()
+
+    def remove_tree(self, path: str):
+        """Forget a directory and everything indexed below it"""
+        # Every path under path + "/" sorts between it and path + "0" ("0" follows "/")
+        self._conn.execute("DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+                           (path, path + "/", path + "0"))
+        self._count_write()
+
+    def _count_write(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        with self._reader_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._conn.close()
+
+# === Scanning ===
+class _Listing:
+    __slots__ = ("path", "mtime_ns", "files", "subdirs", "old_files", "old_subdirs", "changed", "error")
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime_ns = None
+        self.files = None        # [name, kind, size, mtime_ns] for everything that isn't a directory
+        self.subdirs = None      # Subdirectory names
+        self.old_files = None    # The indexed listing, when it was replaced
+        self.old_subdirs = None
+        self.changed = False
+        self.error = None
+
+def _list_directory(index: InventoryIndex, path: str, full: bool, device, scan_started_ns: int, decode_files: bool):
+    """Runs on the pool: reuse the indexed listing if the directory is unchanged, else scandir it"""
+    listing = _Listing(path)
+    try:
+        stat = os.stat(path, follow_symlinks=False)
+    except OSError as e:
+        listing.error = str(e)
+        return listing
+    if device is not None and stat.st_dev != device:
+        listing.error = "other filesystem"
+        return listing
+    listing.mtime_ns = stat.st_mtime_ns
+    row = index.get(path)
+    if row is not None and not full and row[0] == stat.st_mtime_ns and row[0] != RACY:
+        listing.subdirs = json.loads(row[2])
+        listing.files = json.loads(row[1]) if decode_files else None
+        return listing
+
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    # d_type answers is_dir/is_file without a syscall; only non-directories are stat'ed
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                        continue
+                    kind = "f" if entry.is_file(follow_symlinks=False) else "l" if entry.is_symlink() else "o"
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    files.append([entry.name, kind, entry_stat.st_size, entry_stat.st_mtime_ns])
+                except OSError:
+                    continue
+    except OSError as e:
+        listing.error = str(e)
+        return listing
+    listing.files, listing.subdirs, listing.changed = files, subdirs, True
+    if stat.st_mtime_ns >= scan_started_ns - RACY_WINDOW_NS:
+        # Changes later within the same mtime tick would go unnoticed, so don't trust it next time
+        listing.mtime_ns = RACY
+    if row is not None:
+        listing.old_files, listing.old_subdirs = json.loads(row[1]), json.loads(row[2])
+    return listing
+
+_quote = json.encoder.encode_basestring_ascii  # What json.dumps uses for a str, without the per-call setup
+
+def _directory_lines(directory, names, change=None):
+    prefix = '{"path": ' + _quote(os.path.join(directory, ""))[:-1]
+    suffix = f', "type": "dir", "change": "{change}"}}\n' if change else ', "type": "dir"}\n'
+    return [prefix + _quote(name)[1:] + suffix for name in names]
+
+def _file_lines(directory, files, change=None):
+    """JSON lines for a directory's files; the directory's part of the path is encoded once"""
+    prefix = '{"path": ' + _quote(os.path.join(directory, ""))[:-1]
+    suffix = f', "change": "{change}"}}\n' if change else "}\n"
+    return [f'{prefix}{_quote(name)[1:]}, "type": "{KINDS[kind]}", "size": {size}, "mtime": {mtime_ns / 1e9:.6f}{suffix}'
+            for name, kind, size, mtime_ns in files]
+
+def _changes(listing: _Listing):
+    """JSON lines for entries added, modified or deleted since the indexed listing"""
+    old_files = {f[0]: f for f in listing.old_files or ()}
+    added, modified = [], []
+    for entry in listing.files:
+        old = old_files.pop(entry[0], None)
+        if old is None:
+            added.append(entry)
+        elif old != entry:
+            modified.append(entry)
+    old_subdirs = set(listing.old_subdirs or ())
+    return (_file_lines(listing.path, added, "added") + _file_lines(listing.path, modified, "modified")
+            + _file_lines(listing.path, old_files.values(), "deleted")
+            + _directory_lines(listing.path, [name for name in listing.subdirs if name not in old_subdirs], "added")
+            + _directory_lines(listing.path, old_subdirs.difference(listing.subdirs), "deleted"))
+
+def scan(root: str, index: InventoryIndex, out, changes_only: bool = False, full: bool = False,
+         workers: int = FS_INVENTORY_WORKERS, excludes=DEFAULT_EXCLUDES, one_file_system: bool = False):
+    """Walk root, stream JSON lines to out and bring the index up to date; returns scan statistics
+
+    Writes every file and directory, or with changes_only just what was added,
+    modified or deleted since the last scan (a deleted directory is reported
+    once, not file by file). The files count only covers listings that were
+    read, which with changes_only leaves out unchanged directories. If root
+    itself can't be listed, root_error holds the reason.
+    """
+    root = os.path.abspath(root)
+    excludes = {os.path.abspath(path) for path in excludes}
+    scan_started_ns = time.time_ns()
+    device = os.stat(root).st_dev if one_file_system else None
+    stats = {"directories": 0, "listed": 0, "reused": 0, "files": 0, "lines": 0, "errors": 0, "root_error": None}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fs-inventory") as pool:
+        def submit(path):
+            return pool.submit(_list_directory, index, path, full, device, scan_started_ns, not changes_only)
+
+        pending = {submit(root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                listing = future.result()
+                if listing.error is not None:
+                    stats["errors"] += listing.error != "other filesystem"
+                    if listing.path == root:
+                        stats["root_error"] = listing.error
+                    index.remove_tree(listing.path)  # Retried from scratch next time
+                    continue
+                stats["directories"] += 1
+                stats["listed" if listing.changed else "reused"] += 1
+                if listing.changed:
+                    index.put(listing.path, listing.mtime_ns, listing.files, listing.subdirs)
+                    for name in set(listing.old_subdirs or ()).difference(listing.subdirs):
+                        index.remove_tree(os.path.join(listing.path, name))
+                if changes_only:
+                    lines = _changes(listing) if listing.changed else []
+                else:
+                    lines = _file_lines(listing.path, listing.files)
+                    lines.append(f'{{"path": {_quote(listing.path)}, "type": "dir"}}\n')
+                out.writelines(lines)
+                stats["lines"] += len(lines)
+                if listing.files is not None:
+                    stats["files"] += len(listing.files)
+                for name in listing.subdirs:
+                    child = os.path.join(listing.path, name)
+                    if child not in excludes:
+                        pending.add(submit(child))
+    index.commit()
+    return stats
+
+# === Command Line ===
+def main(argv=None, prog=None) -> int:
+    parser = argparse.ArgumentParser(prog=prog, description="Inventory a directory tree as JSON lines, incrementally")
+    parser.add_argument("root", nargs="?", default="/")
+    parser.add_argument("--index", default=FS_INVENTORY_INDEX, help="SQLite index reused by later runs")
+    parser.add_argument("--output", default="-", help="JSON-lines output file (default: stdout)")
+    parser.add_argument("--changes", action="store_true", help="Only write entries changed since the last run")
+    parser.add_argument("--full", action="store_true", help="Relist every directory, e.g. to catch in-place edits")
+    parser.add_argument("--workers", type=int, default=FS_INVENTORY_WORKERS)
+    parser.add_argument("--exclude", action="append", help=f"Directories to skip (default: {', '.join(DEFAULT_EXCLUDES)})")
+    parser.add_argument("--one-file-system", action="store_true", help="Don't cross into other mounted filesystems")
+    args = parser.parse_args(argv)
+
+    index = InventoryIndex(args.index)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", buffering=1024 * 1024)
+    start = time.perf_counter()
+    try:
+        stats = scan(args.root, index, out, args.changes, args.full, args.workers,
+                     DEFAULT_EXCLUDES if args.exclude is None else args.exclude, args.one_file_system)
+    finally:
+        index.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{stats['directories']} directories ({stats['listed']} listed, {stats['reused']} unchanged), "
+          f"{stats['lines']} entries written, {stats['errors']} unreadable in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    if stats["root_error"] is not None:
+        print(f"{parser.prog}: {stats['root_error']}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
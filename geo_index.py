@@ -0,0 +1,236 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+from functools import lru_cache
+
+import numpy as np  # type: ignore
+
+# Resolve a lat/lon to the regions (state, utility, municipality, ...) that
+# contain it and merge their solar defaults, tariffs, incentives and
+# compliance rules. Regions come from GeoJSON and are compiled into a single
+# binary index file that is memory-mapped at lookup time:
+#
+#   header | nodes (STR-packed R-tree) | leaf entries | regions | rings | vertices | properties
+#
+# Only the pages touched by a lookup are read, so opening an index is instant
+# regardless of how many regions it holds.
+
+GEO_INDEX_PATH = os.getenv("GEO_INDEX_PATH", "regions.idx")
+MAGIC = b"SGEO"
+VERSION = 1
+NODE_CAPACITY = 16
+
+# Coarse to fine: values from finer regions override coarser ones
+LEVELS = ("country", "state", "utility", "municipality")
+
+_HEADER = struct.Struct("<4sI6I6Q")          # magic, version, counts, section offsets
+_NODE = struct.Struct("<4dIIB3x")           # bbox, first child, child count, is_leaf
+_REGION = struct.Struct("<4dIIIQI4x")       # bbox, level, first ring, ring count, props offset, props length
+_RING = struct.Struct("<II")                # first vertex, vertex count
+
+# === Building ===
+def _rings_of(geometry):
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+def _str_pack(boxes, ids):
+    """Sort-Tile-Recursive grouping of (bbox, id) pairs into runs of NODE_CAPACITY"""
+    order = sorted(range(len(ids)), key=lambda i: (boxes[i][0] + boxes[i][2]))
+    slices = max(1, math.ceil(math.sqrt(math.ceil(len(ids) / NODE_CAPACITY))))
+    per_slice = slices * NODE_CAPACITY
+    groups = []
+    for start in range(0, len(order), per_slice):
+        vertical = sorted(order[start:start + per_slice], key=lambda i: (boxes[i][1] + boxes[i][3]))
+        for group_start in range(0, len(vertical), NODE_CAPACITY):
+            groups.append([ids[i] for i in vertical[group_start:group_start + NODE_CAPACITY]])
+    return groups
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def build_index(geojson_path: str, index_path: str = GEO_INDEX_PATH):
+    """Compile a GeoJSON FeatureCollection of regions into a binary index file
+
+    Each feature needs a Polygon/MultiPolygon geometry and properties with at
+    least "name" and "level" (one of LEVELS); any of "sun_hours",
+    "electricity_rate", "tariff", "incentives" and "compliance_rules" are
+    returned by lookups.
+    """
+    with open(geojson_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+
+    regions, rings, vertices, props = [], [], [], bytearray()
+    for feature in features:
+        properties = feature["properties"]
+        if properties.get("level") not in LEVELS:
+            raise ValueError(f"Region {properties.get('name')!r} has unknown level {properties.get('level')!r}")
+        first_ring = len(rings)
+        for ring in _rings_of(feature["geometry"]):
+            points = [(float(point[0]), float(point[1])) for point in ring]
+            if points[0] != points[-1]:
+                points.append(points[0])  # Lookups rely on closed rings
+            rings.append((len(vertices), len(points)))
+            vertices.extend(points)
+        points = vertices[rings[first_ring][0]:]
+        bbox = (min(p[0] for p in points), min(p[1] for p in points),
+                max(p[0] for p in points), max(p[1] for p in points))
+        blob = json.dumps(properties, separators=(",", ":")).encode("utf-8")
+        regions.append((bbox, LEVELS.index(properties["level"]), first_ring, len(rings) - first_ring, len(props), len(blob)))
+        props += blob
+
+    # Bottom-up STR packing: leaves hold runs of region ids; each parent level reorders
+    # the level below so every parent's children are contiguous
+    entries, level = [], []
+    for group in _str_pack([r[0] for r in regions], list(range(len(regions)))):
+        level.append((_union([regions[i][0] for i in group]), len(entries), len(group), 1))
+        entries.extend(group)
+    if not level:
+        raise ValueError("No regions to index")
+    levels = []
+    while len(level) > 1:
+        reordered, parents = [], []
+        for group in _str_pack([n[0] for n in level], list(range(len(level)))):
+            parents.append((_union([level[i][0] for i in group]), len(reordered), len(group), 0))
+            reordered.extend(level[i] for i in group)
+        levels.append(reordered)
+        level = parents
+    levels.append(level)
+
+    # Leaves first, root last; shift each parent's child offset by where its children landed
+    nodes = list(levels[0])
+    for below, above in zip(levels, levels[1:]):
+        base = len(nodes) - len(below)
+        nodes.extend((bbox, first + base, count, leaf) for bbox, first, count, leaf in above)
+
+    counts = (len(nodes), len(entries), len(regions), len(rings), len(vertices), len(props))
+    offsets, position = [], _HEADER.size
+    for size in (len(nodes) * _NODE.size, len(entries) * 4, len(regions) * _REGION.size,
+                 len(rings) * _RING.size, len(vertices) * 16, len(props)):
+        position = (position + 7) // 8 * 8
+        offsets.append(position)
+        position += size
+
+    with open(index_path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, *counts, *offsets))
+        sections = [
+            b"".join(_NODE.pack(*n[0], n[1], n[2], n[3]) for n in nodes),
+            np.asarray(entries, dtype="<u4").tobytes(),
+            b"".join(_REGION.pack(*r[0], *r[1:]) for r in regions),
+            b"".join(_RING.pack(*r) for r in rings),
+            np.asarray(vertices, dtype="<f8").tobytes(),
+            bytes(props),
+        ]
+        for offset, section in zip(offsets, sections):
+            out.write(b"\0" * (offset - out.tell()))
+            out.write(section)
+    return {"regions": len(regions), "vertices": len(vertices), "nodes": len(nodes), "bytes": position}
+
+# === Lookup ===
+class GeoIndex:
+    def __init__(self, index_path: str = GEO_INDEX_PATH):
+        self._file = open(index_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._map, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            raise ValueError(f"{index_path} is not a version {VERSION} region index")
+        (self.node_count, self.entry_count, self.region_count, self.ring_count,
+         self.vertex_count, self.props_size) = header[2:8]
+        (self._nodes_at, self._entries_at, self._regions_at, self._rings_at,
+         self._vertices_at, self._props_at) = header[8:14]
+        # Zero-copy views over the mapped sections
+        self._entries = np.frombuffer(self._map, dtype="<u4", count=self.entry_count, offset=self._entries_at)
+        self._vertices = np.frombuffer(self._map, dtype="<f8", count=self.vertex_count * 2,
+                                       offset=self._vertices_at).reshape(-1, 2)
+        self._properties = lru_cache(maxsize=4096)(self._load_properties)
+
+    def close(self):
+        self._entries = self._vertices = None
+        self._map.close()
+        self._file.close()
+
+    def _load_properties(self, region):
+        *_, props_offset, props_length = _REGION.unpack_from(self._map, self._regions_at + region * _REGION.size)
+        start = self._props_at + props_offset
+        return json.loads(self._map[start:start + props_length])
+
+    def _contains(self, region, lon, lat):
+        record = _REGION.unpack_from(self._map, self._regions_at + region * _REGION.size)
+        west, south, east, north, _, first_ring, ring_count = record[:7]
+        if not (west <= lon <= east and south <= lat <= north):
+            return False
+        # Even-odd rule across all rings handles holes and multipolygons alike
+        inside = False
+        for ring in range(first_ring, first_ring + ring_count):
+            start, count = _RING.unpack_from(self._map, self._rings_at + ring * _RING.size)
+            points = self._vertices[start:start + count]
+            x, y = points[:-1, 0], points[:-1, 1]
+            x_next, y_next = points[1:, 0], points[1:, 1]
+            crosses = (y > lat) != (y_next > lat)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = x + (lat - y) * (x_next - x) / (y_next - y)
+            inside ^= bool(np.count_nonzero(crosses & (lon < x_cross)) % 2)
+        return inside
+
+    def regions_at(self, lat: float, lon: float):
+        """Ids of all regions containing the point"""
+        found, stack = [], [self.node_count - 1]
+        while stack:
+            west, south, east, north, first, count, is_leaf = _NODE.unpack_from(
+                self._map, self._nodes_at + stack.pop() * _NODE.size
+            )
+            if not (west <= lon <= east and south <= lat <= north):
+                continue
+            if is_leaf:
+                found.extend(r for r in self._entries[first:first + count].tolist() if self._contains(r, lon, lat))
+            else:
+                stack.extend(range(first, first + count))
+        return found
+
+    def lookup(self, lat: float, lon: float):
+        """Merged defaults for a point, with finer regions overriding coarser ones"""
+        regions = sorted((self._properties(r) for r in self.regions_at(lat, lon)),
+                         key=lambda p: LEVELS.index(p["level"]))
+        result = {"regions": {}, "incentives": {}, "compliance_rules": {}}
+        for props in regions:
+            result["regions"][props["level"]] = props["name"]
+            for key in ("sun_hours", "electricity_rate", "tariff", "country"):
+                if key in props:
+                    result[key] = props[key]
+            result["incentives"].update(props.get("incentives", {}))
+            result["compliance_rules"].update(props.get("compliance_rules", {}))
+        return result
+
+@lru_cache(maxsize=None)
+def open_index(index_path: str = GEO_INDEX_PATH) -> GeoIndex:
+    """Shared, lazily opened index for a path"""
+    return GeoIndex(index_path)
+
+def lookup(lat: float, lon: float, index_path: str = GEO_INDEX_PATH):
+    """Region defaults for a point, or None when no index has been built"""
+    if not os.path.exists(index_path):
+        return None
+    return open_index(index_path).lookup(lat, lon)
+
+# === Command Line ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the region index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile GeoJSON regions into an index file")
+    build.add_argument("geojson")
+    build.add_argument("index", nargs="?", default=GEO_INDEX_PATH)
+    query = commands.add_parser("lookup", help="Resolve a point")
+    query.add_argument("lat", type=float)
+    query.add_argument("lon", type=float)
+    query.add_argument("--index", default=GEO_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(build_index(args.geojson, args.index))
+    else:
+        print(json.dumps(GeoIndex(args.index).lookup(args.lat, args.lon), indent=2))
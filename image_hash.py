@@ -0,0 +1,98 @@
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np  # type: ignore
+from PIL import Image  # type: ignore
+
+# Perceptual hashes survive re-compression, screenshots, small crops and
+# resizes, so the same roof submitted twice lands within a few bits of its
+# earlier hash. Near-duplicates are then found by Hamming distance with a
+# multi-index hash instead of comparing against every stored hash.
+
+HASH_BITS = 64
+NEAR_DUPLICATE_DISTANCE = 12  # Out of 64 bits; re-encodes land within a few bits, unrelated images near 32
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+_DCT32 = _dct_matrix(32)
+
+def _grayscale(image: Image.Image, size):
+    return np.asarray(image.convert("L").resize(size, Image.LANCZOS), dtype=np.float64)
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT hash: low-frequency coefficients above/below their median"""
+    pixels = _grayscale(image, (32, 32))
+    coefficients = (_DCT32 @ pixels @ _DCT32.T)[:8, :8].ravel()
+    bits = coefficients > np.median(coefficients[1:])  # The DC term only tracks overall brightness
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def dhash(image: Image.Image) -> int:
+    """64-bit gradient hash: is each pixel brighter than its right-hand neighbour"""
+    pixels = _grayscale(image, (9, 8))
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def to_signed(value: int) -> int:
+    """Fit an unsigned 64-bit hash into a signed SQLite INTEGER"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+# === Multi-Index Hamming Search ===
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int):
+    """Every mask of `bits` bits with at most `radius` bits set"""
+    return tuple(
+        sum(1 << bit for bit in flipped)
+        for r in range(radius + 1) for flipped in combinations(range(bits), r)
+    )
+
+class HammingIndex:
+    """Multi-index hashing: the 64-bit hash is split into CHUNKS substrings, each in its own table
+
+    If two hashes differ in at most r bits, at least one substring differs in at
+    most r // CHUNKS bits (pigeonhole), so probing each table within that radius
+    finds every match without scanning the whole collection.
+    """
+    CHUNKS = 4
+    CHUNK_BITS = HASH_BITS // CHUNKS
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.size = 0
+
+    def _chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (i * self.CHUNK_BITS)) & mask for i in range(self.CHUNKS)]
+
+    def add(self, value: int, item):
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append((value, item))
+        self.size += 1
+
+    def search(self, value: int, max_distance: int = NEAR_DUPLICATE_DISTANCE):
+        """(distance, item) pairs within max_distance, closest first"""
+        masks = _flip_masks(self.CHUNK_BITS, max_distance // self.CHUNKS)
+        found, seen = [], set()
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                for candidate, item in table.get(chunk ^ mask, ()):
+                    if (candidate, item) in seen:
+                        continue
+                    seen.add((candidate, item))
+                    distance = hamming(value, candidate)
+                    if distance <= max_distance:
+                        found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,382 @@
+import math
+import mmap
+import os
+import struct
+import warnings
+import zlib
+
+import numpy as np  # type: ignore
+from PIL import Image  # type: ignore
+
+# Large orthophoto/GeoTIFF tiles routinely exceed Pillow's decompression-bomb
+# limit. This module never decodes more than MAX_FULL_DECODE_PIXELS at once,
+# so its own opens allow headers up to MAX_INGEST_PIXELS instead. Pillow's
+# limit is a process-wide global and is never changed here.
+
+# === Configuration ===
+DEFAULT_MAX_SIZE = 2048
+MAX_INGEST_PIXELS = int(os.getenv("MAX_INGEST_PIXELS", str(4 * 1024 ** 3)))  # Largest image header accepted
+MAX_FULL_DECODE_PIXELS = int(os.getenv("MAX_FULL_DECODE_PIXELS", str(64 * 1024 * 1024)))
+BAND_BYTES = 16 * 1024 * 1024  # Rows read per step from memory-mapped rasters and PNGs
+METERS_PER_DEGREE = 111320.0
+
+# Raw layouts that can be memory-mapped directly: rawmode -> (channels, output mode)
+_MAPPABLE_RAWMODES = {"L": (1, "L"), "RGB": (3, "RGB"), "BGR": (3, "RGB")}
+
+# 8-bit PNG colour types whose scanlines match Pillow's raw layout: colour type -> mode
+_BANDED_PNG_MODES = {0: "L", 2: "RGB", 6: "RGBA"}
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image can only be ingested by decoding more pixels than allowed"""
+
+# === Helpers ===
+def _path_of(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return None
+
+def _reduction_factor(width, height, max_size):
+    # Rounded down, so the coarse reduction never undershoots; fit_within finishes the job
+    return max(1, max(width, height) // max_size)
+
+def _open(source) -> Image.Image:
+    """Image.open with MAX_INGEST_PIXELS in place of Pillow's decompression-bomb limit"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            image = Image.open(source)
+        except Image.DecompressionBombError:
+            # Past twice Pillow's limit Image.open refuses outright, so the header is parsed by the plugin
+            image = _open_with_plugin(source)
+    width, height = image.size
+    if width * height > MAX_INGEST_PIXELS:
+        image.close()
+        raise ImageTooLargeError(f"{width}x{height} image exceeds MAX_INGEST_PIXELS ({MAX_INGEST_PIXELS})")
+    return image
+
+def _open_with_plugin(source) -> Image.Image:
+    """Image.open's format detection without its decompression-bomb check; parses the header only"""
+    path = _path_of(source)
+    fp = open(path, "rb") if path else source
+    try:
+        fp.seek(0)
+        prefix = fp.read(16)
+        Image.init()
+        for fmt in Image.ID:
+            factory, accept = Image.OPEN[fmt]
+            accepted = not accept or accept(prefix)
+            if not accepted or isinstance(accepted, str):
+                continue
+            fp.seek(0)
+            try:
+                image = factory(fp, path or "")
+            except (SyntaxError, IndexError, TypeError, struct.error):
+                continue
+            image._exclusive_fp = path is not None  # So close() closes the file opened here, as Image.open does
+            return image
+    except BaseException:
+        if path:
+            fp.close()
+        raise
+    if path:
+        fp.close()
+    raise Image.UnidentifiedImageError(f"cannot identify image file {path or source!r}")
+
+def _check_full_decode(width, height):
+    if width * height > MAX_FULL_DECODE_PIXELS:
+        raise ImageTooLargeError(
+            f"{width}x{height} image would need a full decode; convert it to JPEG, "
+            "uncompressed TIFF or a tiled GeoTIFF (with rasterio installed)"
+        )
+
+def _raw_layout(image: Image.Image):
+    """Offset/stride of an uncompressed, contiguously stored image, or None if it isn't mappable"""
+    width, height = image.size
+    layout, next_row, next_offset = None, 0, None
+    for tile in image.tile:
+        codec, extents, offset, args = tile[0], tuple(tile[1]), tile[2], tile[3]
+        if isinstance(args, str):
+            args = (args, 0, 1)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        if codec != "raw" or rawmode not in _MAPPABLE_RAWMODES or orientation not in (1, -1):
+            return None
+        channels, mode = _MAPPABLE_RAWMODES[rawmode]
+        stride = stride or width * channels
+        # Strips must cover full rows and follow each other on disk
+        if extents[0] != 0 or extents[2] != width or extents[1] != next_row:
+            return None
+        if next_offset is not None and offset != next_offset:
+            return None
+        if layout is None:
+            layout = {"offset": offset, "stride": stride, "channels": channels, "mode": mode,
+                      "rawmode": rawmode, "orientation": orientation}
+        elif (rawmode, stride, orientation) != (layout["rawmode"], layout["stride"], layout["orientation"]):
+            return None
+        next_row = extents[3]
+        next_offset = offset + (extents[3] - extents[1]) * stride
+    if layout is None or next_row != height or image.mode != layout["mode"]:
+        return None
+    if layout["orientation"] == -1 and len(image.tile) > 1:
+        return None
+    layout["bgr"] = layout["rawmode"] == "BGR"
+    layout["bottom_up"] = layout["orientation"] == -1
+    return layout
+
+def _rasterio():
+    try:
+        import rasterio  # type: ignore
+        return rasterio
+    except ImportError:
+        return None
+
+# === Memory-Mapped Reads ===
+def _read_mapped(path, layout, size, box, factor):
+    """Read box (left, upper, right, lower) from a mapped raster, block-averaging by factor"""
+    width, height = size
+    left, upper, right, lower = box
+    out_w, out_h = (right - left) // factor, (lower - upper) // factor
+    stride = layout["stride"]
+    output = Image.new(layout["mode"], (out_w, out_h))
+    orientation = -1 if layout["bottom_up"] else 1
+
+    # Wrap whole bands of `factor`-aligned rows without copying, reduce them in C,
+    # then drop the band's pages so resident memory stays at about one band
+    rows_per_band = max(factor, (BAND_BYTES // max(1, stride)) // factor * factor)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        for out_row in range(0, out_h, rows_per_band // factor):
+            band_rows = min(rows_per_band, (out_h - out_row) * factor)
+            top = upper + out_row * factor
+            first_row = height - top - band_rows if layout["bottom_up"] else top
+            start = layout["offset"] + first_row * stride
+            band = Image.frombuffer(
+                layout["mode"], (width, band_rows), view[start:start + band_rows * stride],
+                "raw", layout["rawmode"], stride, orientation
+            )
+            output.paste(band.reduce(factor, box=(left, 0, left + out_w * factor, band_rows)), (0, out_row))
+            del band
+            _release_pages(mapped, start, band_rows * stride)
+        view.release()
+    return output
+
+def _release_pages(mapped, start, length):
+    if not hasattr(mapped, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    aligned = start // mmap.PAGESIZE * mmap.PAGESIZE
+    mapped.madvise(mmap.MADV_DONTNEED, aligned, min(len(mapped) - aligned, length + start - aligned))
+
+# === Banded PNG Reads ===
+def _png_mode(image: Image.Image, fp):
+    """Mode of an 8-bit, non-interlaced L/RGB/RGBA PNG that can be decoded band by band, or None"""
+    if image.format != "PNG" or len(image.tile) != 1 or image.tile[0][0] != "zip":
+        return None
+    fp.seek(0)
+    header = fp.read(29)  # Signature, then IHDR: width, height, bit depth, colour type, ..., interlace
+    if len(header) < 29 or header[12:16] != b"IHDR":
+        return None
+    bit_depth, color_type, interlace = header[24], header[25], header[28]
+    mode = _BANDED_PNG_MODES.get(color_type)
+    if bit_depth != 8 or interlace or mode != image.mode:
+        return None
+    return mode
+
+def _png_reader(fp, offset):
+    """read(n): the next n bytes of a PNG's inflated IDAT stream, i.e. its filtered scanlines"""
+    def chunks():
+        # Pillow's tile offset points at the first IDAT's data, just past its length and type
+        fp.seek(offset - 8)
+        while True:
+            header = fp.read(8)
+            if len(header) < 8:
+                return
+            length, kind = struct.unpack(">I4s", header)
+            if kind != b"IDAT":
+                return
+            yield fp.read(length)
+            fp.seek(4, os.SEEK_CUR)  # CRC
+
+    inflater = zlib.decompressobj()
+    compressed = chunks()
+    buffer = bytearray()
+    pending = b""
+
+    def read(n):
+        nonlocal pending
+        while len(buffer) < n:
+            if not pending:
+                pending = next(compressed, None)
+                if pending is None:
+                    raise ValueError("PNG image data is truncated")
+            # Bounded output, so a highly compressible stream can't inflate past one band
+            buffer.extend(inflater.decompress(pending, n - len(buffer)))
+            pending = inflater.unconsumed_tail
+        data = bytes(buffer[:n])
+        del buffer[:n]
+        return data
+    return read
+
+def _read_png(fp, mode, offset, size, box, factor):
+    """Read box from a PNG band by band, block-averaging by factor
+
+    Scanlines are inflated here and unfiltered by Pillow's decoder a band at a
+    time. Each band is prefixed with the previous band's last row, unfiltered,
+    since the first row's filter may refer to it.
+    """
+    width, _ = size
+    left, upper, right, lower = box
+    out_w, out_h = (right - left) // factor, (lower - upper) // factor
+    row_bytes = width * len(mode)
+    output = Image.new(mode, (out_w, out_h))
+    rows_per_band = max(factor, (BAND_BYTES // row_bytes) // factor * factor)
+    read = _png_reader(fp, offset)
+    previous = bytes(row_bytes)  # The row above the first one reads as zeros
+    row, out_row, bottom = 0, 0, upper + out_h * factor
+    while row < bottom:
+        # Rows above the box are decoded too (filters chain down the image) but only their last row is kept
+        rows = min(rows_per_band, upper - row if row < upper else bottom - row)
+        data = zlib.compress(b"\0" + previous + read(rows * (row_bytes + 1)), 0)
+        band = Image.frombytes(mode, (width, rows + 1), data, "zip", mode)
+        previous = band.crop((0, rows, width, rows + 1)).tobytes()
+        if row >= upper:
+            # reduce() premultiplies alpha even at factor 1, which would round RGBA values
+            region = (left, 1, left + out_w * factor, rows + 1)
+            output.paste(band.crop(region) if factor == 1 else band.reduce(factor, box=region), (0, out_row))
+            out_row += rows // factor
+        del band, data
+        row += rows
+    return output
+
+# === Georeferenced Reads ===
+def _read_rasterio(path, box, max_size, lat_lon_radius=None):
+    rasterio = _rasterio()
+    from rasterio.enums import Resampling  # type: ignore
+    from rasterio.windows import Window, from_bounds  # type: ignore
+
+    with rasterio.open(path) as dataset:
+        if lat_lon_radius is not None:
+            lat, lon, radius_m = lat_lon_radius
+            window = _rasterio_window_around(dataset, lat, lon, radius_m, from_bounds)
+        elif box is not None:
+            left, upper, right, lower = box
+            window = Window(left, upper, right - left, lower - upper)
+        else:
+            window = Window(0, 0, dataset.width, dataset.height)
+        window = window.intersection(Window(0, 0, dataset.width, dataset.height))
+        factor = _reduction_factor(int(window.width), int(window.height), max_size)
+        out_shape = (min(dataset.count, 3), max(1, int(window.height) // factor), max(1, int(window.width) // factor))
+        # Decimated reads use overviews/tiles, so only the requested window is decoded
+        data = dataset.read(
+            indexes=list(range(1, out_shape[0] + 1)), window=window,
+            out_shape=out_shape, resampling=Resampling.average
+        )
+    data = np.moveaxis(data, 0, -1)
+    if data.dtype != np.uint8:
+        data = np.clip(data / max(1, data.max()) * 255, 0, 255).astype(np.uint8)
+    if data.shape[-1] == 1:
+        return fit_within(Image.fromarray(data[..., 0], "L"), max_size)
+    return fit_within(Image.fromarray(np.ascontiguousarray(data[..., :3]), "RGB"), max_size)
+
+def _rasterio_window_around(dataset, lat, lon, radius_m, from_bounds):
+    from rasterio.warp import transform as warp_transform  # type: ignore
+    xs, ys = warp_transform("EPSG:4326", dataset.crs, [lon], [lat])
+    if dataset.crs.is_geographic:
+        dx = radius_m / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        dy = radius_m / METERS_PER_DEGREE
+    else:
+        dx = dy = radius_m
+    return from_bounds(xs[0] - dx, ys[0] - dy, xs[0] + dx, ys[0] + dy, transform=dataset.transform)
+
+def _is_georeferenced(image: Image.Image) -> bool:
+    # GeoTIFF ModelTiepoint / ModelTransformation tags
+    tags = getattr(image, "tag_v2", {})
+    return image.format == "TIFF" and (33922 in tags or 34264 in tags)
+
+# === Public API ===
+def load_image(source, max_size: int = DEFAULT_MAX_SIZE, box=None) -> Image.Image:
+    """Open an image (or the pixel box within it) downsized to fit max_size
+
+    Only the file header is parsed up front. Depending on the format the
+    pixels are then decoded at reduced scale (JPEG draft mode), read band by
+    band from a memory map (uncompressed TIFF/BMP/PPM) or from the compressed
+    stream (8-bit PNG), read through windowed rasterio reads (GeoTIFF), or -
+    for small images only - fully decoded.
+    """
+    image = _open(source)
+    width, height = image.size
+    box = tuple(int(v) for v in box) if box is not None else (0, 0, width, height)
+    box = (max(0, box[0]), max(0, box[1]), min(width, box[2]), min(height, box[3]))
+    box_w, box_h = box[2] - box[0], box[3] - box[1]
+    if box_w <= 0 or box_h <= 0:
+        raise ValueError(f"Crop box {box} lies outside the {width}x{height} image")
+    factor = _reduction_factor(box_w, box_h, max_size)
+    path = _path_of(source)
+
+    if image.format == "JPEG":
+        # The JPEG decoder can scale by 1/2, 1/4 or 1/8 while decoding
+        image.draft("RGB" if image.mode != "L" else "L", (width // factor, height // factor))
+        scale = image.size[0] / width
+        scaled_box = tuple(int(round(v * scale)) for v in box)
+        _check_full_decode(*image.size)
+        return fit_within(image.crop(scaled_box), max_size)
+
+    if path and _rasterio() is not None and _is_georeferenced(image):
+        image.close()
+        return _read_rasterio(path, box, max_size)
+
+    layout = _raw_layout(image) if path else None
+    if layout is not None and box_w >= factor and box_h >= factor:
+        image.close()
+        return fit_within(_read_mapped(path, layout, (width, height), box, factor), max_size)
+
+    if image.format == "PNG" and box_w >= factor and box_h >= factor:
+        fp = open(path, "rb") if path else source
+        try:
+            mode = _png_mode(image, fp)
+            if mode is not None:
+                return fit_within(_read_png(fp, mode, image.tile[0][2], (width, height), box, factor), max_size)
+        finally:
+            if path:
+                fp.close()
+
+    _check_full_decode(width, height)
+    if box != (0, 0, width, height):
+        image = image.crop(box)
+    if factor > 1:
+        image = image.reduce(factor)
+    return fit_within(image, max_size)
+
+def crop_around(source, lat: float, lon: float, radius_m: float = 50.0, bounds=None,
+                max_size: int = DEFAULT_MAX_SIZE) -> Image.Image:
+    """Read a square window of radius_m around lat/lon
+
+    GeoTIFFs are located with their own georeferencing (needs rasterio). For
+    plain images pass bounds=(west, south, east, north) in degrees.
+    """
+    path = _path_of(source)
+    if bounds is None:
+        if path is None or _rasterio() is None:
+            raise ValueError("bounds are required unless the source is a GeoTIFF path and rasterio is installed")
+        return _read_rasterio(path, None, max_size, lat_lon_radius=(lat, lon, radius_m))
+
+    with _open(source) as header:
+        width, height = header.size
+    west, south, east, north = bounds
+    if not (west <= lon <= east and south <= lat <= north):
+        raise ValueError(f"({lat}, {lon}) is outside the image bounds {bounds}")
+    dx = radius_m / (METERS_PER_DEGREE * math.cos(math.radians(lat))) / (east - west) * width
+    dy = radius_m / METERS_PER_DEGREE / (north - south) * height
+    x = (lon - west) / (east - west) * width
+    y = (north - lat) / (north - south) * height
+    box = (int(x - dx), int(y - dy), int(math.ceil(x + dx)), int(math.ceil(y + dy)))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return load_image(source, max_size=max_size, box=box)
+
+def fit_within(image: Image.Image, max_size: int) -> Image.Image:
+    """Final exact resize to max_size after the coarse reduction"""
+    if max(image.size) > max_size:
+        image = image.copy()
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    return image
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx  # type: ignore
+
+# Sample payloads for each endpoint
+FINANCIALS_PAYLOAD = {
+    "panel_type": "Monocrystalline",
+    "system_size": 5.0,
+    "electricity_rate": 8.5,
+    "sun_hours": 4.5,
+    "country": "India"
+}
+
+COMPLIANCE_PAYLOAD = {
+    "location": "California",
+    "system_size_kw": 8,
+    "has_bi_directional_meter": True,
+    "inverter_certified": True,
+    "meets_fire_code": True
+}
+
+SCENARIOS = {
+    "financials": ("/financials", lambda batch: FINANCIALS_PAYLOAD),
+    "financials-batch": ("/financials/batch", lambda batch: [FINANCIALS_PAYLOAD] * batch),
+    "compliance": ("/compliance", lambda batch: COMPLIANCE_PAYLOAD),
+    "compliance-batch": ("/compliance/batch", lambda batch: [COMPLIANCE_PAYLOAD] * batch),
+}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def worker(client, path, payload, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+async def run(base_url, scenario, concurrency, duration, batch):
+    path, make_payload = SCENARIOS[scenario]
+    payload = make_payload(batch)
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, path, payload, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    items = batch if scenario.endswith("-batch") else 1
+    print(f"Scenario:     {scenario} ({path}), concurrency={concurrency}, duration={elapsed:.1f}s")
+    print(f"Requests:     {len(latencies)} ok, {len(errors)} failed")
+    if latencies:
+        print(f"Throughput:   {len(latencies) / elapsed:,.1f} req/s ({len(latencies) * items / elapsed:,.1f} items/s)")
+        print(f"Latency p50:  {percentile(latencies, 50) * 1000:.2f} ms")
+        print(f"Latency p99:  {percentile(latencies, 99) * 1000:.2f} ms")
+        print(f"Latency mean: {statistics.mean(latencies) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Solar Industry AI Assistant API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="financials")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--batch", type=int, default=100, help="Items per request for batch scenarios")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.scenario, args.concurrency, args.duration, args.batch))
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Drives the Streamlit apps headlessly with Streamlit's AppTest: N virtual users
+# each run load -> image -> analyze -> ROI form against a local mock of an
+# OpenAI-compatible vision endpoint.
+#
+# AppTest swaps process-global runtime state on every run, so two sessions in
+# one process can't rerun at the same time. Each user therefore gets its own
+# worker process; workers warm up (imports, first page load), report ready and
+# start together, so their reruns overlap like sessions on a real server.
+# Shared resources (blob store, history database) are shared on disk as in
+# production, but in-process caches are per worker.
+
+APPS = ("s.py", "solar_analysis_app.py")
+
+MOCK_ANALYSIS = (
+    "## Solar Potential\n"
+    "Recommended system size: 6.5 kW\n"
+    "Optimal panel type: Monocrystalline\n\n"
+    "The south-facing roof section is unshaded between 9:00 and 16:00.\n"
+)
+
+# === Mock Vision Endpoint ===
+class _MockVisionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency_s = 1.0
+    requests_served = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self._lock:
+            type(self).requests_served += 1
+        # Lognormal latency around the configured mean, like a real model's long tail
+        time.sleep(self.latency_s * random.lognormvariate(0, 0.35))
+        usage = {"prompt_tokens": 1200, "completion_tokens": 80, "total_tokens": 1280}
+        if body.get("stream"):
+            chunks = [
+                {"choices": [{"index": 0, "delta": {"content": MOCK_ANALYSIS}, "finish_reason": None}]},
+                {"choices": [], "usage": usage},
+            ]
+            payload = "".join(
+                f"data: {json.dumps({'id': 'mock', 'object': 'chat.completion.chunk', 'created': 0, 'model': body.get('model'), **chunk})}\n\n"
+                for chunk in chunks
+            ) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            payload = json.dumps({
+                "id": "mock", "object": "chat.completion", "created": 0, "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": MOCK_ANALYSIS}}],
+                "usage": usage,
+            })
+            content_type = "application/json"
+        data = payload.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def serve_mock_vision(port: int = 0, latency_s: float = 1.0):
+    """OpenAI-compatible /v1/chat/completions stand-in on a background thread; returns the server"""
+    _MockVisionHandler.latency_s = latency_s
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MockVisionHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# === Virtual Users ===
+def _rss_mib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _timed_run(app_test, timings, step):
+    start = time.perf_counter()
+    app_test.run()
+    timings.append((step, time.perf_counter() - start))
+    # Apps catch most failures and show them with st.error, so those fail the step too
+    if app_test.exception:
+        raise RuntimeError(f"{step}: {app_test.exception[0].value}")
+    if app_test.error:
+        raise RuntimeError(f"{step}: {app_test.error[0].value}")
+
+def _button(app_test, prefix):
+    for button in app_test.button:
+        if button.label.startswith(prefix):
+            return button
+    raise RuntimeError(f"No button starting with {prefix!r} on the page")
+
+def virtual_user(app_path, seed_image_key, iterations, think_time_s, timeout_s):
+    """One user session: returns (AppTest kept alive for memory accounting, [(step, seconds)])"""
+    from streamlit.testing.v1 import AppTest  # type: ignore
+
+    timings = []
+    app_test = AppTest.from_file(app_path, default_timeout=timeout_s)
+    _timed_run(app_test, timings, "load")
+    for _ in range(iterations):
+        if seed_image_key:
+            # File uploads can't be driven through AppTest, so the image is handed over
+            # the way a fetched satellite view would be: as a blob store key
+            app_test.session_state["satellite"] = (("load test roof", 30), seed_image_key)
+            _timed_run(app_test, timings, "image")
+        time.sleep(think_time_s)
+        _button(app_test, "🔍 Analyze Rooftop").click()
+        _timed_run(app_test, timings, "analyze")
+        time.sleep(think_time_s)
+        roi_inputs = {n.label: n for n in app_test.number_input}
+        roi_inputs["Number of Panels"].set_value(random.randint(5, 30))
+        _button(app_test, "Calculate ROI").click()
+        _timed_run(app_test, timings, "roi")
+    return app_test, timings
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def seed_image(blob_dir):
+    """A synthetic roof stored in the shared blob store; returns its key"""
+    from PIL import Image, ImageDraw  # type: ignore
+    import blob_store
+    roof = Image.new("RGB", (1024, 768), (90, 90, 100))
+    ImageDraw.Draw(roof).rectangle((200, 150, 820, 600), fill=(150, 60, 50))
+    return blob_store.BlobStore(blob_dir).put_image(roof)
+
+def run_user(app, seed_image_key, iterations, think_time_s, timeout_s):
+    """Worker-process entry point: one user session, started when "go" arrives on stdin; prints a JSON result"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    app_path = os.path.join(here, app)
+    sys.path.insert(0, here)
+
+    # Warm imports and caches so they aren't billed to the user
+    virtual_user(app_path, seed_image_key, 0, 0, timeout_s)
+    baseline_mib = _rss_mib()
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    timings, error = [], None
+    try:
+        app_test, timings = virtual_user(app_path, seed_image_key, iterations, think_time_s, timeout_s)
+    except Exception as e:
+        error = str(e)
+    # The session is still referenced here, so its state counts toward RSS
+    print(json.dumps({"timings": timings, "error": error, "rss_mib": _rss_mib(),
+                      "session_mib": _rss_mib() - baseline_mib}), flush=True)
+
+def run_users(app, users, iterations, think_time_s, timeout_s, env, cwd, seed_image_key):
+    """Start one worker per user, release them together and merge their results"""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--app", app,
+               "--iterations", str(iterations), "--think-time", str(think_time_s), "--timeout", str(timeout_s)]
+    if seed_image_key:
+        command += ["--seed-image", seed_image_key]
+    workers = [subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True) for _ in range(users)]
+    results, errors = [], []
+    try:
+        ready = []
+        for worker in workers:
+            if worker.stdout.readline().strip() == "ready":
+                ready.append(worker)
+            else:
+                errors.append(f"worker failed to start: {worker.stderr.read()[-500:]}")
+        start = time.perf_counter()
+        for worker in ready:
+            worker.stdin.write("go\n")
+            worker.stdin.flush()
+        for worker in ready:
+            line = worker.stdout.readline()
+            if line.strip():
+                results.append(json.loads(line))
+            else:
+                errors.append(f"worker died: {worker.stderr.read()[-500:]}")
+        elapsed = time.perf_counter() - start
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.kill()
+            worker.wait()
+    errors += [result["error"] for result in results if result["error"]]
+    return {
+        "users": users, "elapsed_s": elapsed, "errors": errors[:5], "failed_users": len(errors),
+        "timings": [timing for result in results for timing in result["timings"]],
+        "rss_mib": sum(result["rss_mib"] for result in results),
+        "memory_per_user_mib": statistics.mean(result["session_mib"] for result in results) if results else 0.0,
+    }
+
+# === Reporting ===
+def report(result):
+    timings, elapsed = result["timings"], result["elapsed_s"]
+    print(f"\n{result['users']} users: {len(timings)} reruns in {elapsed:.1f}s "
+          f"({len(timings) / elapsed:.1f} reruns/s), {result['failed_users']} failed users")
+    print(f"  RSS {result['rss_mib']:.0f} MiB across workers, {result['memory_per_user_mib']:.2f} MiB per session")
+    print(f"  {'step':<9}{'count':>7}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'mean (ms)':>11}")
+    steps = {}
+    for step, seconds in timings:
+        steps.setdefault(step, []).append(seconds)
+    steps["all"] = [seconds for _, seconds in timings]
+    for step, values in steps.items():
+        if not values:
+            continue
+        print(f"  {step:<9}{len(values):>7}{percentile(values, 50) * 1000:>11.0f}"
+              f"{percentile(values, 95) * 1000:>11.0f}{percentile(values, 99) * 1000:>11.0f}"
+              f"{statistics.mean(values) * 1000:>11.0f}")
+    for error in result["errors"]:
+        print(f"  error: {error}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Streamlit apps with concurrent virtual users")
+    parser.add_argument("--app", choices=APPS, default="s.py")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50], help="User counts to sweep")
+    parser.add_argument("--iterations", type=int, default=3, help="Analyze/ROI cycles per user")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Seconds between a user's actions")
+    parser.add_argument("--mock-latency", type=float, default=1.0, help="Mean mock vision latency (s)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun timeout (s)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--seed-image", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_user(args.app, args.seed_image, args.iterations, args.think_time, args.timeout)
+        sys.exit(0)
+
+    server = serve_mock_vision(latency_s=args.mock_latency)
+    mock_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {k: v for k, v in os.environ.items() if k not in ("HEDGE_API_KEY", "OPENAI_API_KEY")}
+        env.update({
+            "OPENROUTER_API_KEY": "mock", "OPENROUTER_BASE_URL": mock_url,
+            # The OpenAI SDK reads these when solar_analysis_app.py creates its client
+            "OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": mock_url,
+            "SOLAR_HISTORY_DB": os.path.join(workdir, "history.db"),
+            "BLOB_STORE_DIR": os.path.join(workdir, "blobs"),
+            "TILE_CACHE_PATH": os.path.join(workdir, "tiles.mbtiles"),
+            "ROOFTOP_IMAGE_PATH": os.path.join(workdir, "rooftop.png"),
+        })
+        if args.app == "s.py":
+            env.pop("OPENAI_API_KEY")  # Otherwise s.py would hedge to OpenAI
+        from PIL import Image  # type: ignore
+        Image.new("RGB", (1024, 768), (120, 120, 130)).save(env["ROOFTOP_IMAGE_PATH"])
+        seed_image_key = seed_image(env["BLOB_STORE_DIR"]) if args.app == "s.py" else None
+
+        print(f"App: {args.app}, {args.iterations} cycles per user, mock vision latency ~{args.mock_latency}s")
+        for users in args.users:
+            report(run_users(args.app, users, args.iterations, args.think_time, args.timeout, env, workdir,
+                             seed_image_key))
+    print(f"\nMock vision requests served: {_MockVisionHandler.requests_served}")
@@ -0,0 +1,119 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np  # type: ignore
+
+import solar_core
+
+# === Default Uncertainty Assumptions ===
+# Standard deviations are relative to the point estimate unless noted
+UNCERTAINTY_DEFAULTS = {
+    "sun_hours_sd": 0.08,           # Long-term irradiance vs. the site estimate
+    "interannual_sd": 0.04,         # Year-to-year weather variability
+    "electricity_rate_sd": 0.05,    # Uncertainty in today's effective tariff
+    "tariff_escalation": 0.03,      # Mean annual tariff growth
+    "tariff_escalation_sd": 0.015,  # Absolute, per simulated scenario
+    "degradation": 0.005,           # Mean annual panel degradation
+    "degradation_sd": 0.002,        # Absolute
+}
+
+SAMPLES_PER_CHUNK = 20000
+
+# === Sampling ===
+def _simulate_chunk(args):
+    """Draw one chunk of scenarios and return (production, payback, npv) arrays"""
+    (seed, samples, total_cost, annual_production, electricity_rate, lifetime_years,
+     discount_rate, assumptions) = args
+    rng = np.random.default_rng(seed)
+    years = np.arange(lifetime_years)
+
+    sun_factor = rng.normal(1.0, assumptions["sun_hours_sd"], samples).clip(0.5, 1.5)
+    rate_factor = rng.normal(1.0, assumptions["electricity_rate_sd"], samples).clip(0.5, 1.5)
+    escalation = rng.normal(assumptions["tariff_escalation"], assumptions["tariff_escalation_sd"], samples)
+    degradation = rng.normal(assumptions["degradation"], assumptions["degradation_sd"], samples).clip(0, 0.05)
+    weather = rng.normal(1.0, assumptions["interannual_sd"], (samples, lifetime_years)).clip(0.5, 1.5)
+
+    # (samples, years) production and cash flows
+    production = (annual_production * sun_factor)[:, None] * (1 - degradation[:, None]) ** years * weather
+    rates = (electricity_rate * rate_factor)[:, None] * (1 + escalation[:, None]) ** years
+    savings = production * rates
+    cumulative = np.cumsum(savings, axis=1)
+
+    # Payback: first year the cumulative savings cover the cost, interpolated within that year
+    paid = cumulative >= total_cost
+    first = np.where(paid.any(axis=1), paid.argmax(axis=1), lifetime_years)
+    capped = np.minimum(first, lifetime_years - 1)
+    before = np.where(first > 0, cumulative[np.arange(samples), np.maximum(capped - 1, 0)], 0.0)
+    during = savings[np.arange(samples), capped]
+    # Samples that never pay back may have no savings in the capped year; their quotient is discarded
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payback = np.where(first < lifetime_years, first + (total_cost - before) / during, np.inf)
+
+    discount = (1 + discount_rate) ** -(years + 1)
+    npv = savings @ discount - total_cost
+    return production[:, 0], payback, npv
+
+def simulate_financials(panel_type, system_size, electricity_rate, sun_hours=4.5, country="India",
+                        tariff=None, annual_load_kwh=None, latitude=20.0, battery=None,
+                        battery_strategy="self_consumption", samples: int = 100000, lifetime_years: int = 25,
+                        discount_rate: float = 0.07, seed: int = 0, workers: int = 1, **assumptions):
+    """Monte Carlo P50/P90 production, payback and NPV around calculate_financials
+
+    The tariff, load and battery are passed to calculate_financials, so the
+    bands are centred on the same point estimate: its total cost (battery
+    included) and its savings per kWh produced, which the sampled production
+    and rate factors then scale.
+
+    Samples are drawn in fixed-size chunks, each from its own child of
+    SeedSequence(seed), so results depend only on the seed - not on how many
+    worker processes run the chunks.
+
+    P90 follows the banking convention of the value met with 90% probability:
+    the 10th percentile for production and NPV, the 90th for payback years.
+    """
+    point = solar_core.calculate_financials(panel_type, system_size, electricity_rate, sun_hours, country,
+                                            tariff=tariff, annual_load_kwh=annual_load_kwh, latitude=latitude,
+                                            battery=battery, battery_strategy=battery_strategy)
+    settings = {**UNCERTAINTY_DEFAULTS, **assumptions}
+    unknown = set(settings) - set(UNCERTAINTY_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown uncertainty assumptions: {sorted(unknown)}")
+
+    # Equal to electricity_rate without a tariff; a tariff values exports and peak hours differently
+    value_per_kwh = point["annual_savings"] / point["annual_production_kwh"] if point["annual_production_kwh"] else 0.0
+    chunks = math.ceil(samples / SAMPLES_PER_CHUNK)
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    jobs = [
+        (seeds[i], min(SAMPLES_PER_CHUNK, samples - i * SAMPLES_PER_CHUNK), point["total_cost"],
+         point["annual_production_kwh"], value_per_kwh, lifetime_years, discount_rate, settings)
+        for i in range(chunks)
+    ]
+    if workers > 1 and chunks > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, chunks)) as pool:
+            results = list(pool.map(_simulate_chunk, jobs))
+    else:
+        results = [_simulate_chunk(job) for job in jobs]
+    production, payback, npv = (np.concatenate(parts) for parts in zip(*results))
+
+    return {
+        **point,
+        "samples": samples,
+        "production_p50_kwh": float(np.percentile(production, 50)),
+        "production_p90_kwh": float(np.percentile(production, 10)),
+        "payback_p50_years": _payback_percentile(payback, 50),
+        "payback_p90_years": _payback_percentile(payback, 90),
+        "npv_p50": float(np.percentile(npv, 50)),
+        "npv_p90": float(np.percentile(npv, 10)),
+        "probability_no_payback": float(np.mean(np.isinf(payback))),
+    }
+
+def _payback_percentile(payback, q):
+    # Interpolating between two never-paid-back (inf) samples gives nan; the answer is inf
+    with np.errstate(invalid="ignore"):
+        value = float(np.percentile(payback, q))
+    return math.inf if math.isnan(value) else value
+
+def default_workers():
+    """Worker processes to use for large runs"""
+    return min(8, os.cpu_count() or 1)
@@ -0,0 +1,79 @@
+import time
+from datetime import date, timedelta
+
+import streamlit as st
+
+import results_store
+
+# Portfolio view over the columnar results store: payback distribution and
+# compliance failure rates across every recorded assessment. Run with
+#   streamlit run portfolio_dashboard.py
+
+st.set_page_config(
+    page_title="Solar Portfolio Dashboard",
+    page_icon="📊",
+    layout="wide"
+)
+
+@st.cache_resource
+def get_results_store():
+    """One store per server so per-file aggregates stay memoized across sessions and reruns"""
+    return results_store.ResultsStore()
+
+st.title("📊 Solar Portfolio Dashboard")
+store = get_results_store()
+
+# === Filters ===
+filter_col1, filter_col2 = st.columns([2, 1])
+countries = filter_col1.multiselect("Countries", store.countries(), placeholder="All countries")
+date_range = filter_col2.date_input("Assessed between", value=(date.today() - timedelta(days=365), date.today()))
+since, until = (date_range + (None,))[:2] if isinstance(date_range, tuple) else (date_range, None)
+
+start = time.perf_counter()
+try:
+    summary = store.portfolio_summary(countries or None, since, until + timedelta(days=1) if until else None)
+except Exception as e:
+    st.error(f"Failed to load results: {str(e)}")
+    st.stop()
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+if not summary["rows"]:
+    st.info("No recorded results match these filters yet. Results are added as assessments are run.")
+    st.stop()
+
+# === Payback ===
+metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+metric_col1.metric("Results", f"{summary['rows']:,}")
+st.subheader("⏳ Payback Distribution")
+if summary["assessments"]:
+    metric_col2.metric("Payback P10", f"{summary['payback_p10']:.1f} years")
+    metric_col3.metric("Median Payback", f"{summary['payback_median']:.1f} years")
+    metric_col4.metric("Payback P90", f"{summary['payback_p90']:.1f} years")
+    st.bar_chart(summary["payback_histogram"], x="payback_years", y="assessments",
+                 x_label="Payback (years)", y_label="Assessments")
+else:
+    # e.g. only backfilled history rows, which have no financials
+    st.info("No results with a payback period match these filters yet.")
+
+# === Compliance ===
+st.subheader("✅ Compliance Failure Rates")
+by_country = summary["by_country"]
+rate_columns = [column for column in by_country.columns if column.endswith("_failure_rate")]
+checked = by_country[by_country["compliance_checks"] > 0]
+if checked.empty:
+    st.info("No compliance checks recorded for this selection.")
+else:
+    st.bar_chart(checked.set_index("country")[rate_columns], stack=False, y_label="Failure rate")
+
+st.subheader("🌍 By Country")
+st.dataframe(
+    by_country,
+    hide_index=True,
+    column_config={
+        "mean_payback_years": st.column_config.NumberColumn("Mean payback (years)", format="%.1f"),
+        "median_payback_years": st.column_config.NumberColumn("Median payback (years)", format="%.1f"),
+        **{column: st.column_config.NumberColumn(column.replace("_", " ").capitalize(), format="percent")
+           for column in rate_columns},
+    },
+)
+st.caption(f"Aggregated {summary['rows']:,} results in {elapsed_ms:.0f} ms")
@@ -1,4 +1,12 @@
+import sys
+
+import speech_service
+
+# Given arguments, render the text to a cached WAV file instead (see speech_service.py)
+if len(sys.argv) > 1:
+    sys.exit(speech_service.main(prog="project2.py"))
+
 import pyttsx3
 engine = pyttsx3.init()
 engine.say("Hey, mom how are you")
-engine.runAndWait()
\ No newline at end of file
+engine.runAndWait()
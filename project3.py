@@ -1,4 +1,11 @@
 import os
+import sys
+
+import fs_inventory
+
+# Given arguments, inventory a whole tree instead (see fs_inventory.py)
+if len(sys.argv) > 1:
+    sys.exit(fs_inventory.main(prog="project3.py"))
 
 # Select the diresctory whose contant you want to list
 diresctory_path = '/'
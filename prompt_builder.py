@@ -0,0 +1,202 @@
+import logging
+import os
+from functools import lru_cache
+
+logger = logging.getLogger("solar.prompt")
+
+# === Prompt Sections ===
+# Each section lists the bullet points it asks for and the output tokens it
+# typically needs, so max_tokens can follow what the user actually selected
+PROMPT_SECTIONS = {
+    "Rooftop Assessment": {
+        "items": [
+            "Usable area (square meters)",
+            "Orientation and tilt",
+            "Shading obstacles",
+            "Structural considerations",
+        ],
+        "output_tokens": 350,
+    },
+    "Solar Potential": {
+        "items": [
+            "Recommended system size (kW)",
+            "Optimal panel type",
+            "Estimated annual production (kWh)",
+        ],
+        "output_tokens": 250,
+    },
+    "Installation Details": {
+        "items": [
+            "Recommended mounting approach",
+            "Electrical considerations",
+            "Any permit requirements",
+        ],
+        "output_tokens": 350,
+    },
+    "Financial Analysis": {
+        "items": [
+            "Estimated costs",
+            "ROI timeframe",
+            "Available incentives",
+        ],
+        "output_tokens": 300,
+    },
+    "Maintenance Requirements": {
+        "items": [
+            "Cleaning frequency",
+            "Monitoring recommendations",
+            "Warranty information",
+        ],
+        "output_tokens": 250,
+    },
+}
+
+ANALYSIS_PRESETS = {
+    "Quick estimate": {
+        "sections": ["Solar Potential", "Financial Analysis"],
+        "concise": True,
+    },
+    "Full assessment": {
+        "sections": list(PROMPT_SECTIONS.keys()),
+        "concise": False,
+    },
+}
+
+# Headroom for headings and formatting around the section bodies
+OUTPUT_TOKEN_OVERHEAD = 100
+CONCISE_OUTPUT_FACTOR = 0.5
+MAX_OUTPUT_TOKENS = 2000
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "1500"))  # Text only; the image is billed separately
+
+class PromptBudgetError(ValueError):
+    """Raised when not even one section fits the prompt token budget"""
+
+# === Prompt Building ===
+@lru_cache(maxsize=None)
+def system_prompt(panel_types: tuple) -> str:
+    """Static instructions shared by every request
+
+    Nothing request-specific goes in here, so the prefix is byte-identical
+    across calls and provider-side prompt caching can reuse it.
+    """
+    return (
+        "You are a solar installation expert analyzing rooftop images.\n"
+        f"Choose panel types only from {list(panel_types)}.\n"
+        "Answer only the numbered sections the user requests, in the order given, "
+        "formatted as markdown with one heading per section. "
+        "Include quantitative estimates where possible. "
+        "Write the system size as 'Recommended system size: <number> kW' and the panel "
+        "type as 'Optimal panel type: <type>' so they can be parsed."
+    )
+
+def build_user_prompt(country: str, sections, concise: bool = False) -> str:
+    """Request-specific part of the prompt: location and the selected sections"""
+    lines = [f"Analyze this rooftop in {country}. Provide:"]
+    for number, name in enumerate(sections, start=1):
+        lines.append(f"\n{number}. **{name}**:")
+        lines.extend(f"   - {item}" for item in PROMPT_SECTIONS[name]["items"])
+        if name == "Financial Analysis":
+            lines[-1] += f" in {country}"
+    if concise:
+        lines.append("\nBe brief: one line per bullet, numbers over prose.")
+    return "\n".join(lines)
+
+def build_messages(country: str, img_base64: str, panel_types, sections=None, concise: bool = False):
+    """Chat messages with the static system prefix first and the image last"""
+    sections = list(sections or PROMPT_SECTIONS.keys())
+    return [
+        {"role": "system", "content": system_prompt(tuple(panel_types))},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": build_user_prompt(country, sections, concise)},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{img_base64}"
+                    }
+                }
+            ]
+        }
+    ]
+
+# === Token Budgeting ===
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken  # type: ignore
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, else ~4 characters per token"""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return max(1, len(text) // 4)
+
+def output_token_budget(sections=None, concise: bool = False) -> int:
+    """max_tokens sized to the selected sections"""
+    sections = list(sections or PROMPT_SECTIONS.keys())
+    budget = sum(PROMPT_SECTIONS[name]["output_tokens"] for name in sections)
+    if concise:
+        budget *= CONCISE_OUTPUT_FACTOR
+    return min(MAX_OUTPUT_TOKENS, int(budget) + OUTPUT_TOKEN_OVERHEAD)
+
+def fit_sections(country: str, panel_types, sections=None, concise: bool = False,
+                 max_prompt_tokens: int = MAX_PROMPT_TOKENS, max_output_tokens: int = MAX_OUTPUT_TOKENS):
+    """The selected sections, in order, that fit the prompt and output token budgets
+
+    Sections that would push the estimated prompt past max_prompt_tokens, or
+    the output budget past max_output_tokens (where max_tokens would cut the
+    answer short), are dropped and logged. Raises PromptBudgetError when none fit.
+    """
+    sections = list(sections or PROMPT_SECTIONS.keys())
+    fixed = estimate_tokens(system_prompt(tuple(panel_types)))
+    kept, dropped = [], []
+    for name in sections:
+        candidate = kept + [name]
+        prompt_tokens = fixed + estimate_tokens(build_user_prompt(country, candidate, concise))
+        output_tokens = sum(PROMPT_SECTIONS[s]["output_tokens"] for s in candidate)
+        output_tokens = int(output_tokens * (CONCISE_OUTPUT_FACTOR if concise else 1)) + OUTPUT_TOKEN_OVERHEAD
+        if prompt_tokens <= max_prompt_tokens and output_tokens <= max_output_tokens:
+            kept = candidate
+        else:
+            dropped.append(name)
+    if not kept:
+        raise PromptBudgetError(f"The prompt exceeds the {max_prompt_tokens}-token budget")
+    if dropped:
+        logger.warning("Dropped sections over the token budget: %s", ", ".join(dropped))
+    return kept
+
+def estimate_prompt_tokens(messages) -> int:
+    """Estimated text tokens of a message list (image tokens are not included)"""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        else:
+            total += sum(estimate_tokens(part["text"]) for part in content if part.get("type") == "text")
+    return total
+
+def log_usage(response, model: str, estimated_prompt_tokens: int = None, max_tokens: int = None):
+    """Log the token usage reported by the provider for one call"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        logger.info("model=%s usage=unavailable estimated_prompt_tokens=%s", model, estimated_prompt_tokens)
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) if details else None
+    logger.info(
+        "model=%s prompt_tokens=%s cached_prompt_tokens=%s completion_tokens=%s max_tokens=%s "
+        "estimated_prompt_tokens=%s",
+        model, usage.prompt_tokens, cached_tokens, usage.completion_tokens, max_tokens,
+        estimated_prompt_tokens
+    )
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_prompt_tokens": cached_tokens,
+        "completion_tokens": usage.completion_tokens,
+    }
@@ -0,0 +1,156 @@
+import base64
+import html
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from string import Template
+
+# === Configuration ===
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_IMAGE_SIZE = 480
+
+# Rendering (markdown conversion, PDF layout) is CPU-bound and slow, so it runs
+# on a small pool instead of the Streamlit script thread
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+
+# === Templates ===
+@lru_cache(maxsize=None)
+def load_template(name: str = "report.html") -> Template:
+    """Read and compile a report template once per process"""
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        return Template(f.read())
+
+_local = threading.local()
+
+def _markdown_converter():
+    # Markdown instances carry parser state, so each worker thread gets its own
+    converter = getattr(_local, "markdown", None)
+    if converter is None:
+        import markdown  # type: ignore
+        converter = _local.markdown = markdown.Markdown(extensions=["tables", "sane_lists"])
+    return converter
+
+def markdown_to_html(text: str) -> str:
+    """Convert the AI's markdown analysis to HTML"""
+    converter = _markdown_converter()
+    try:
+        return converter.reset().convert(text or "")
+    except Exception:
+        return f"<pre>{html.escape(text or '')}</pre>"
+
+# === Section Builders ===
+def _image_section(image) -> str:
+    if image is None:
+        return ""
+    image = image.copy()
+    image.thumbnail((REPORT_IMAGE_SIZE, REPORT_IMAGE_SIZE))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=80)
+    img_base64 = base64.b64encode(buffered.getvalue()).decode()
+    return f'<img class="roof" src="data:image/jpeg;base64,{img_base64}" alt="Rooftop image">'
+
+def _financials_section(financials, currency: str) -> str:
+    if not financials:
+        return ""
+    incentives = "".join(
+        f"<li><strong>{html.escape(str(k))}:</strong> {html.escape(str(v))}</li>"
+        for k, v in financials.get("incentives", {}).items()
+    )
+    return f"""<h2>💰 Financial Projections</h2>
+<div class="success-box">
+    <p><strong>Total System Cost:</strong> {currency}{financials['total_cost']:,.2f}</p>
+    <p><strong>Annual Production:</strong> {financials['annual_production_kwh']:,.0f} kWh</p>
+    <p><strong>Annual Savings:</strong> {currency}{financials['annual_savings']:,.2f}</p>
+    <p><strong>ROI Period:</strong> {_payback(financials['roi_years'])}</p>
+    <h4>Government Incentives:</h4>
+    <ul>{incentives}</ul>
+</div>"""
+
+def _compliance_section(compliance) -> str:
+    if not compliance:
+        return ""
+    rows = "".join(
+        f'<tr><td>{html.escape(category)}</td>'
+        f'<td class="{"pass" if status else "fail"}">{"✅ Passed" if status else "❌ Failed"}</td>'
+        f'<td>{html.escape(message)}</td></tr>'
+        for category, (status, message) in compliance.items()
+    )
+    return f"""<h2>📋 Compliance Checks</h2>
+<table><tr><th>Check</th><th>Status</th><th>Details</th></tr>{rows}</table>"""
+
+def _payback(roi_years) -> str:
+    return "never (no annual savings)" if roi_years is None else f"{roi_years:.1f} years"
+
+# === Rendering ===
+def render_html(analysis: str, financials=None, compliance=None, image=None, site: str = "",
+                country: str = "", title: str = "Solar Assessment Report", currency: str = "₹",
+                generated_at: str = None) -> str:
+    """Combine analysis, financials, compliance results and roof image into an HTML report"""
+    return load_template().safe_substitute(
+        title=html.escape(title),
+        site=html.escape(site or "Unnamed site"),
+        country=html.escape(country or ""),
+        generated_at=html.escape(generated_at or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")),
+        image_section=_image_section(image),
+        analysis_html=markdown_to_html(analysis),
+        financials_section=_financials_section(financials, currency),
+        compliance_section=_compliance_section(compliance),
+    )
+
+def html_to_pdf(report_html: str) -> bytes:
+    """Lay out an HTML report as PDF"""
+    from xhtml2pdf import pisa  # type: ignore
+    output = io.BytesIO()
+    result = pisa.CreatePDF(report_html, dest=output, encoding="utf-8")
+    if result.err:
+        raise RuntimeError(f"PDF rendering failed with {result.err} error(s)")
+    return output.getvalue()
+
+def render_report(fmt: str = "html", **report) -> bytes:
+    """Render a report as 'html', 'pdf' or 'md' bytes"""
+    if fmt == "md":
+        return (report.get("analysis") or "").encode("utf-8")
+    report_html = render_html(**report)
+    if fmt == "html":
+        return report_html.encode("utf-8")
+    if fmt == "pdf":
+        return html_to_pdf(report_html)
+    raise ValueError(f"Unsupported report format: {fmt}")
+
+def submit_report(fmt: str = "html", **report):
+    """Render a report on the background worker pool; returns a Future of bytes"""
+    return _executor.submit(render_report, fmt, **report)
+
+# === Batch Export ===
+def export_reports_zip(reports, fileobj, fmt: str = "html"):
+    """Stream reports into a zip archive one at a time
+
+    `reports` may be any iterable (e.g. a generator over the history store) of
+    (filename_stem, report_kwargs) pairs; at most two rendered reports are held
+    in memory at any point.
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        # Render the next report while the current one is being compressed
+        pending = None
+        for stem, report in reports:
+            future = submit_report(fmt, **report)
+            if pending is not None:
+                _write_entry(archive, *pending)
+                count += 1
+            pending = (f"{stem}.{fmt}", future)
+        if pending is not None:
+            _write_entry(archive, *pending)
+            count += 1
+    return count
+
+def _write_entry(archive, name, future):
+    with archive.open(name, "w") as entry:
+        entry.write(future.result())
@@ -0,0 +1,476 @@
+import argparse
+import atexit
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import unquote
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.dataset as ds  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+# Append-only columnar store for analysis, financial and compliance results.
+# Every append lands as new Parquet files under country=<c>/month=<YYYY-MM>/,
+# so queries prune whole partitions by country and date and push remaining
+# filters down to row-group statistics. Portfolio aggregates run in Arrow
+# without building Python objects per row. Request handlers add rows through a
+# ResultsWriter, which buffers them and appends in batches from a background
+# thread, so neither a request nor the file count pays for one file per result.
+
+# === Configuration ===
+RESULTS_STORE_DIR = os.getenv("RESULTS_STORE_DIR", "results_store")
+COMPACT_MIN_FILES = 8                   # Partitions with at least this many small files get merged by compact()
+COMPACT_SMALL_BYTES = 8 * 1024 * 1024   # Files past this size are left alone, bounding what a merge rewrites
+RESULTS_FLUSH_ROWS = int(os.getenv("RESULTS_FLUSH_ROWS", "5000"))
+RESULTS_FLUSH_SECONDS = float(os.getenv("RESULTS_FLUSH_SECONDS", "5"))
+
+logger = logging.getLogger("solar.results")
+
+SCHEMA = pa.schema([
+    ("created_at", pa.timestamp("ms", tz="UTC")),
+    ("source", pa.string()),
+    ("analysis_id", pa.int64()),
+    ("site", pa.string()),
+    ("panel_type", pa.string()),
+    ("system_size_kw", pa.float64()),
+    ("total_cost", pa.float64()),
+    ("annual_production_kwh", pa.float64()),
+    ("annual_savings", pa.float64()),
+    ("roi_years", pa.float64()),
+    ("tariff", pa.string()),
+    ("battery_cost", pa.float64()),
+    ("compliance_passed", pa.bool_()),
+    ("building_code_passed", pa.bool_()),
+    ("net_metering_passed", pa.bool_()),
+    ("safety_passed", pa.bool_()),
+    ("country", pa.string()),
+    ("month", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("country", pa.string()), ("month", pa.string())]), flavor="hive")
+
+# Held while compacting; the leading underscore keeps it out of the dataset
+COMPACT_LOCK_NAME = "_compact.lock"
+
+# SolarInstallation.run_all_checks() names -> columns
+COMPLIANCE_COLUMNS = {
+    "Building Code": "building_code_passed",
+    "Net Metering": "net_metering_passed",
+    "Safety Standards": "safety_passed",
+}
+FINANCIAL_COLUMNS = ("total_cost", "annual_production_kwh", "annual_savings", "roi_years", "tariff", "battery_cost")
+CHECK_COLUMNS = ("compliance_passed", *COMPLIANCE_COLUMNS.values())
+
+# Payback is aggregated as a fine histogram so per-file results merge exactly
+PAYBACK_BIN_YEARS = 0.1
+PAYBACK_BINS = 600  # 0-60 years; longer paybacks land in the last bin
+
+# === Records ===
+def make_record(country: str, site: str = "", analysis_id=None, system_size_kw=None, panel_type=None,
+                financials=None, checks=None, created_at=None, source: str = "app"):
+    """One result row from calculate_financials() output and/or SolarInstallation.run_all_checks() results"""
+    created_at = created_at or datetime.now(timezone.utc)
+    record = {
+        "created_at": created_at,
+        "source": source,
+        "analysis_id": analysis_id,
+        "site": site,
+        "panel_type": panel_type,
+        "system_size_kw": system_size_kw,
+        "country": country or "Unknown",
+        "month": created_at.strftime("%Y-%m"),
+    }
+    for column in FINANCIAL_COLUMNS:
+        record[column] = (financials or {}).get(column)
+    if checks:
+        for name, (passed, _) in checks.items():
+            if name in COMPLIANCE_COLUMNS:
+                record[COMPLIANCE_COLUMNS[name]] = bool(passed)
+        record["compliance_passed"] = all(passed for passed, _ in checks.values())
+    return record
+
+@contextmanager
+def _file_lock(path: str, blocking: bool):
+    """Exclusive lock on a file across processes; yields whether it was acquired"""
+    with open(path, "a+b") as f:
+        try:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _month_bounds(since=None, until=None):
+    """Partition pruning predicate for a created_at range"""
+    expression = None
+    if since is not None:
+        expression = ds.field("month") >= since.strftime("%Y-%m")
+    if until is not None:
+        upper = ds.field("month") <= until.strftime("%Y-%m")
+        expression = upper if expression is None else expression & upper
+    return expression
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+def _created_at_bounds(since=None, until=None):
+    """Row-level predicate for a created_at range (until exclusive)"""
+    expression = None
+    if since is not None:
+        expression = ds.field("created_at") >= pa.scalar(_timestamp(since), SCHEMA.field("created_at").type)
+    if until is not None:
+        upper = ds.field("created_at") < pa.scalar(_timestamp(until), SCHEMA.field("created_at").type)
+        expression = upper if expression is None else expression & upper
+    return expression
+
+# === Store ===
+class ResultsStore:
+    def __init__(self, root: str = RESULTS_STORE_DIR):
+        self.root = root
+        self._partials = {}  # file path -> aggregates of the whole file
+        os.makedirs(root, exist_ok=True)
+
+    # --- Writes ---
+    def append(self, records) -> int:
+        """Append result rows (dicts, e.g. from make_record()); returns the number written"""
+        records = list(records)
+        if not records:
+            return 0
+        return self.append_table(pa.Table.from_pylist(records, schema=SCHEMA))
+
+    def append_table(self, table: pa.Table) -> int:
+        """Append an Arrow table with the store's schema as new files in each touched partition
+
+        Files are written under a staging directory (hidden from readers by its
+        leading underscore) and renamed into place, so readers never see partial files.
+        """
+        table = table.select(SCHEMA.names).cast(SCHEMA)
+        staging = os.path.join(self.root, f"_staging-{uuid.uuid4().hex}")
+        try:
+            ds.write_dataset(
+                table, staging, format="parquet", partitioning=PARTITIONING,
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+                max_rows_per_group=256 * 1024,
+            )
+            for directory, _, files in os.walk(staging):
+                for name in files:
+                    target_dir = os.path.join(self.root, os.path.relpath(directory, staging))
+                    os.makedirs(target_dir, exist_ok=True)
+                    os.replace(os.path.join(directory, name), os.path.join(target_dir, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return table.num_rows
+
+    def compact(self, min_files: int = COMPACT_MIN_FILES, small_bytes: int = COMPACT_SMALL_BYTES,
+                wait: bool = False) -> int:
+        """Merge the small files of partitions that accumulated many; returns partitions rewritten
+
+        One process compacts a store at a time: two merging the same inputs
+        would each write a copy of their rows. Unless wait is set, a call
+        returns 0 straight away while another process holds the lock. Readers
+        may briefly see both the merged file and its inputs (summaries retry if
+        an input disappears mid-scan).
+        """
+        with _file_lock(os.path.join(self.root, COMPACT_LOCK_NAME), wait) as locked:
+            return self._compact(min_files, small_bytes) if locked else 0
+
+    def _compact(self, min_files: int, small_bytes: int) -> int:
+        rewritten = 0
+        for directory, _, files in os.walk(self.root):
+            if os.path.basename(directory).startswith(("_", ".")):
+                continue
+            parts = [os.path.join(directory, f) for f in files if f.endswith(".parquet") and not f.startswith(".")]
+            parts = [path for path in parts if os.path.getsize(path) < small_bytes]
+            if len(parts) < min_files:
+                continue
+            # Files inside a partition hold no partition columns; the merged file keeps it that way
+            table = ds.dataset(parts, format="parquet").to_table()
+            name = f"part-{uuid.uuid4().hex}-compact.parquet"
+            staged = os.path.join(directory, f".{name}")
+            pq.write_table(table, staged, compression="zstd", row_group_size=256 * 1024)
+            os.replace(staged, os.path.join(directory, name))
+            for path in parts:
+                os.remove(path)
+            rewritten += 1
+        return rewritten
+
+    # --- Reads ---
+    def dataset(self) -> ds.Dataset:
+        return ds.dataset(self.root, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+
+    def countries(self):
+        """Countries with recorded results, read from the partition directories"""
+        return sorted(unquote(entry.name.split("=", 1)[1]) for entry in os.scandir(self.root)
+                      if entry.is_dir() and entry.name.startswith("country="))
+
+    @staticmethod
+    def filter_expression(countries=None, since=None, until=None, where=None):
+        """Arrow filter for a country list and created_at range (dates or datetimes, until exclusive)"""
+        expressions = []
+        if countries:
+            expressions.append(ds.field("country").isin(list(countries)))
+        for bound in (_month_bounds(since, until), _created_at_bounds(since, until), where):
+            if bound is not None:
+                expressions.append(bound)
+        if not expressions:
+            return None
+        expression = expressions[0]
+        for other in expressions[1:]:
+            expression = expression & other
+        return expression
+
+    def scan(self, columns=None, countries=None, since=None, until=None, where=None) -> pa.Table:
+        """Arrow table of the requested columns; partitions and row groups outside the filter aren't read"""
+        return self.dataset().to_table(columns=columns, filter=self.filter_expression(countries, since, until, where))
+
+    def query(self, columns=None, countries=None, since=None, until=None, where=None) -> pd.DataFrame:
+        """Same as scan() as a DataFrame backed by the Arrow buffers (no per-column copies)"""
+        return self.scan(columns, countries, since, until, where).to_pandas(types_mapper=pd.ArrowDtype)
+
+    # --- Portfolio Aggregates ---
+    def _fragment_partial(self, fragment, row_filter=None):
+        """Mergeable aggregates for one file; files are immutable, so whole-file results are memoized"""
+        if row_filter is None and fragment.path in self._partials:
+            return self._partials[fragment.path]
+        table = fragment.to_table(columns=["roi_years", *CHECK_COLUMNS], filter=row_filter)
+        payback = pc.drop_null(table["roi_years"])
+        # Systems that never pay back have no payback; older rows stored those as negative years
+        payback = pc.filter(payback, pc.and_(pc.is_finite(payback), pc.greater(payback, 0))).to_numpy()
+        bins = np.clip((payback / PAYBACK_BIN_YEARS).astype(np.int64), 0, PAYBACK_BINS - 1)
+        partial = {
+            "rows": table.num_rows,
+            "payback_counts": np.bincount(bins, minlength=PAYBACK_BINS),
+            "payback_sum": float(payback.sum()),
+            # (rows checked, rows passed) per check; nulls are rows without compliance results
+            "checks": {column: (len(table[column]) - table[column].null_count, pc.sum(table[column]).as_py() or 0)
+                       for column in CHECK_COLUMNS},
+        }
+        if row_filter is None:
+            self._partials[fragment.path] = partial
+        return partial
+
+    def portfolio_summary(self, countries=None, since=None, until=None, payback_bin_years: float = 1.0,
+                          max_payback_years: float = 40):
+        """Payback distribution and compliance failure rates over the selected results
+
+        Work is done per file: partitions outside the filter are skipped, files
+        wholly inside it reuse their memoized aggregates, and only files in a
+        boundary month are scanned with the row-level date filter. Quantiles come
+        from a PAYBACK_BIN_YEARS histogram.
+        """
+        since = since and _timestamp(since)
+        until = until and _timestamp(until)
+        for attempt in range(3):
+            try:
+                totals = self._country_totals(countries, since, until)
+                break
+            except FileNotFoundError:
+                # Compaction removed a file between listing and reading it; list again
+                if attempt == 2:
+                    raise
+
+        counts = sum((t["payback_counts"] for t in totals.values()), np.zeros(PAYBACK_BINS, dtype=np.int64))
+        per_display_bin = max(1, int(round(payback_bin_years / PAYBACK_BIN_YEARS)))
+        display_bins = int(np.ceil(max_payback_years / (per_display_bin * PAYBACK_BIN_YEARS)))
+        histogram = counts[:display_bins * per_display_bin].reshape(display_bins, per_display_bin).sum(axis=1)
+        rows = []
+        for country, total in totals.items():
+            assessments = int(total["payback_counts"].sum())
+            rows.append({
+                "country": country,
+                "assessments": assessments,
+                "mean_payback_years": total["payback_sum"] / assessments if assessments else np.nan,
+                "median_payback_years": _histogram_quantiles(total["payback_counts"], [0.5])[0],
+                "compliance_checks": total["checks"]["compliance_passed"][0],
+                **{column.replace("_passed", "_failure_rate"): 1 - passed / checked if checked else np.nan
+                   for column, (checked, passed) in total["checks"].items()},
+            })
+        by_country = pd.DataFrame(rows, columns=["country", "assessments", "mean_payback_years",
+                                                 "median_payback_years", "compliance_checks",
+                                                 *(c.replace("_passed", "_failure_rate") for c in CHECK_COLUMNS)])
+        p10, median, p90 = _histogram_quantiles(counts, [0.1, 0.5, 0.9])
+        return {
+            "rows": sum(t["rows"] for t in totals.values()),
+            "assessments": int(counts.sum()),
+            "payback_p10": p10,
+            "payback_median": median,
+            "payback_p90": p90,
+            "payback_histogram": pd.DataFrame({
+                "payback_years": np.arange(display_bins) * per_display_bin * PAYBACK_BIN_YEARS,
+                "assessments": histogram,
+            }),
+            "by_country": by_country.sort_values("assessments", ascending=False, ignore_index=True),
+        }
+
+    def _country_totals(self, countries, since, until):
+        """Per-country merged aggregates of every file matching the filter"""
+        row_filter = _created_at_bounds(since, until)
+        totals = {}
+        live = set()
+        for fragment in self.dataset().get_fragments(filter=self.filter_expression(countries, since, until)):
+            live.add(fragment.path)
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            month_start = datetime.strptime(keys["month"], "%Y-%m").replace(tzinfo=timezone.utc)
+            month_end = (month_start + timedelta(days=32)).replace(day=1)
+            whole = (since is None or since <= month_start) and (until is None or until >= month_end)
+            partial = self._fragment_partial(fragment, None if whole else row_filter)
+            total = totals.get(keys["country"])
+            if total is None:
+                totals[keys["country"]] = {**partial, "checks": dict(partial["checks"])}
+                continue
+            total["rows"] += partial["rows"]
+            total["payback_counts"] = total["payback_counts"] + partial["payback_counts"]
+            total["payback_sum"] += partial["payback_sum"]
+            for column, (checked, passed) in partial["checks"].items():
+                total["checks"][column] = (total["checks"][column][0] + checked, total["checks"][column][1] + passed)
+        # Drop memoized aggregates of files removed by compaction
+        for path in [path for path in self._partials if path not in live and not os.path.exists(path)]:
+            self._partials.pop(path, None)
+        return totals
+
+# === Buffered Writes ===
+class ResultsWriter:
+    """Collects result rows in memory and appends them to a store from a background thread
+
+    add() only takes a lock, so it is safe to call from async handlers. Rows are
+    written once RESULTS_FLUSH_ROWS are waiting or RESULTS_FLUSH_SECONDS have
+    passed, whichever comes first, and each write is followed by compaction of
+    partitions that have gathered small files. Pending rows are flushed at exit.
+    """
+
+    def __init__(self, store: ResultsStore = None, flush_rows: int = RESULTS_FLUSH_ROWS,
+                 flush_seconds: float = RESULTS_FLUSH_SECONDS, auto_compact: bool = True):
+        self.store = store or ResultsStore()
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.auto_compact = auto_compact
+        self._buffer = []
+        self._lock = threading.Lock()        # Guards the buffer
+        self._flush_lock = threading.Lock()  # One write at a time, from the thread or flush()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, records) -> int:
+        """Queue result rows (dicts, e.g. from make_record()); returns the number queued"""
+        records = list(records)
+        with self._lock:
+            self._buffer.extend(records)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+        return len(records)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every queued row now; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return 0
+            try:
+                self.store.append(records)
+            except Exception:
+                logger.exception("Couldn't write %d results", len(records))
+                with self._lock:
+                    # Retried with the next flush, unless writes keep failing and the buffer keeps growing
+                    if len(self._buffer) < 10 * self.flush_rows:
+                        self._buffer[:0] = records
+                return 0
+            if self.auto_compact:
+                try:
+                    self.store.compact()
+                except Exception:
+                    logger.exception("Couldn't compact the results store")
+            return len(records)
+
+    def close(self):
+        """Stop the background thread and write whatever is still queued"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_seconds + 30)
+        self.flush()
+
+def _histogram_quantiles(counts, quantiles):
+    """Quantiles (bin midpoints) of a PAYBACK_BIN_YEARS histogram"""
+    total = counts.sum()
+    if not total:
+        return [float("nan")] * len(quantiles)
+    cumulative = np.cumsum(counts)
+    bins = np.searchsorted(cumulative, np.asarray(quantiles) * total, side="left")
+    return [float((b + 0.5) * PAYBACK_BIN_YEARS) for b in bins]
+
+# === Backfill ===
+def import_history(store: ResultsStore, db_path: str) -> int:
+    """One-off import of analysis_history rows (sizes and panel types were parsed when saved)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id, created_at, site, country, system_size_kw, panel_type FROM analyses ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+    return store.append(
+        make_record(country, site=site, analysis_id=analysis_id, system_size_kw=size, panel_type=panel_type,
+                    created_at=datetime.fromisoformat(created_at), source="history")
+        for analysis_id, created_at, site, country, size, panel_type in rows
+    )
+
+# === Command Line ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the columnar results store")
+    parser.add_argument("--root", default=RESULTS_STORE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("import-history", help="Backfill from the analysis history database")
+    history.add_argument("db_path", nargs="?", default=os.getenv("SOLAR_HISTORY_DB", "solar_history.db"))
+    commands.add_parser("compact", help="Merge partitions with many small files")
+    summary = commands.add_parser("summary", help="Print portfolio aggregates")
+    summary.add_argument("--country", action="append")
+    summary.add_argument("--since", type=date.fromisoformat)
+    summary.add_argument("--until", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    store = ResultsStore(args.root)
+    if args.command == "import-history":
+        print(f"Imported {import_history(store, args.db_path)} analyses")
+    elif args.command == "compact":
+        print(f"Compacted {store.compact(wait=True)} partitions")
+    else:
+        result = store.portfolio_summary(args.country, args.since, args.until)
+        print(f"{result['rows']} results, {result['assessments']} with payback: "
+              f"p10 {result['payback_p10']:.1f}, median {result['payback_median']:.1f}, "
+              f"p90 {result['payback_p90']:.1f} years")
+        print(result["by_country"].to_string(index=False))
@@ -1,177 +1,152 @@
 import streamlit as st
 from PIL import Image
-import io
-import base64
 import os
 import requests
 from tenacity import retry, stop_after_attempt, wait_exponential
 from openai import OpenAI
 import json
+import math
 import pandas as pd
+import analysis_history
+import report_renderer
+import prompt_builder
+import solar_core
+import image_ingest
+import tariff_billing
+import battery_dispatch
+import monte_carlo
+import tile_cache
+import blob_store
+import vision_hedging
+import geo_index
+import results_store
+import speech_service
+import solar_compliance
+import tempfile
 
 # === Configuration ===
 # Use environment variables or Streamlit secrets for API keys
-OPENROUTER_API_KEY = os.getenv("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") #or st.secrets.get("OPENROUTER_API_KEY")
-MODEL_NAME = "google/gemini-pro-vision"  # Using OpenRouter's vision model
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or os.getenv("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") #or st.secrets.get("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MODEL_NAME = os.getenv("VISION_MODEL", "google/gemini-pro-vision")  # Using OpenRouter's vision model
 
 # Initialize OpenRouter client
 openrouter_client = None
 if OPENROUTER_API_KEY:
     try:
         openrouter_client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=OPENROUTER_BASE_URL,
             api_key=OPENROUTER_API_KEY
         )
     except Exception as e:
         st.error(f"OpenRouter client initialization failed: {str(e)}")
 
+def site_url():
+    """SITE_URL from Streamlit secrets; deployments without a secrets.toml use the default"""
+    try:
+        return st.secrets.get("SITE_URL", "https://solar-rooftop.streamlit.app")
+    except FileNotFoundError:
+        return "https://solar-rooftop.streamlit.app"
+
 # === Solar Industry Constants ===
-SOLAR_PANEL_TYPES = {
-    "Monocrystalline": {
-        "efficiency": "15-22%",
-        "cost_per_watt": 45,
-        "lifespan": "25-30 years",
-        "description": "High efficiency, space-efficient, more expensive"
-    },
-    "Polycrystalline": {
-        "efficiency": "13-16%",
-        "cost_per_watt": 40,
-        "lifespan": "23-27 years",
-        "description": "Good value, moderate efficiency"
-    },
-    "Thin-Film": {
-        "efficiency": "10-13%",
-        "cost_per_watt": 35,
-        "lifespan": "10-20 years",
-        "description": "Lightweight, flexible, lower efficiency"
-    }
-}
-
-GOVERNMENT_INCENTIVES = {
-    "India": {
-        "Central Financial Assistance (CFA)": "Up to 40% subsidy for residential systems",
-        "Net Metering": "Available in most states",
-        "Tax Benefits": "Accelerated depreciation for commercial systems"
-    },
-    "USA": {
-        "Federal Tax Credit": "26% of system cost (2023)",
-        "State Incentives": "Varies by state",
-        "Net Metering": "Available in most states"
-    },
-    "Germany": {
-        "Feed-in Tariff": "Guaranteed rates for solar power",
-        "VAT Reduction": "Reduced VAT for solar systems"
-    }
-}
+SOLAR_PANEL_TYPES = solar_core.SOLAR_PANEL_TYPES
+GOVERNMENT_INCENTIVES = solar_core.GOVERNMENT_INCENTIVES
 
 # === Helper Functions ===
 def resize_image(image: Image.Image, max_size: int = 1024) -> Image.Image:
     """Resize image to reduce API payload while maintaining aspect ratio"""
     try:
-        width, height = image.size
-        if width > max_size or height > max_size:
-            ratio = min(max_size/width, max_size/height)
-            new_size = (int(width * ratio), (int(height * ratio)))
-            return image.resize(new_size, Image.LANCZOS)
-        return image
+        return solar_core.resize_image(image, max_size)
     except Exception as e:
         st.error(f"Image processing error: {str(e)}")
         return image
 
-def calculate_financials(panel_type, system_size, electricity_rate, sun_hours=4.5, country="India"):
+def calculate_financials(panel_type, system_size, electricity_rate, sun_hours=4.5, country="India",
+                         tariff=None, annual_load_kwh=None, latitude=20.0, battery=None,
+                         battery_strategy="self_consumption"):
     """Calculate financial metrics for solar installation"""
     try:
-        cost_per_watt = SOLAR_PANEL_TYPES[panel_type]["cost_per_watt"]
-        total_cost = system_size * cost_per_watt * 1000  # Convert kW to W
-        annual_production = system_size * sun_hours * 365
-        annual_savings = annual_production * electricity_rate
-        roi_years = total_cost / annual_savings
-        
-        incentives = GOVERNMENT_INCENTIVES.get(country, {})
-        
-        return {
-            "total_cost": total_cost,
-            "annual_production_kwh": annual_production,
-            "annual_savings": annual_savings,
-            "roi_years": roi_years,
-            "incentives": incentives
-        }
+        return solar_core.calculate_financials(
+            panel_type, system_size, electricity_rate, sun_hours, country,
+            tariff=tariff, annual_load_kwh=annual_load_kwh, latitude=latitude,
+            battery=battery, battery_strategy=battery_strategy
+        )
     except Exception as e:
         st.error(f"Financial calculation error: {str(e)}")
         return None
 
 # === AI Analysis Functions ===
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def analyze_rooftop_with_ai(image: Image.Image, country: str):
-    """Analyze rooftop image with AI for solar potential"""
-    try:
-        # Prepare image
-        image = resize_image(image)
-        if image.mode == 'RGBA':
-            image = image.convert('RGB')
-        
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-        prompt = f"""You are a solar installation expert analyzing a rooftop in {country}. Provide a detailed analysis including:
-
-1. **Rooftop Assessment**:
-   - Usable area (square meters)
-   - Orientation and tilt
-   - Shading obstacles
-   - Structural considerations
-
-2. **Solar Potential**:
-   - Recommended system size (kW)
-   - Optimal panel type from {list(SOLAR_PANEL_TYPES.keys())}
-   - Estimated annual production (kWh)
-
-3. **Installation Details**:
-   - Recommended mounting approach
-   - Electrical considerations
-   - Any permit requirements
-
-4. **Financial Analysis**:
-   - Estimated costs
-   - ROI timeframe
-   - Available incentives in {country}
+@st.cache_resource
+def get_vision_hedger():
+    """Hedge OpenRouter with a backup provider (HEDGE_* / OPENAI_API_KEY) when one is configured"""
+    backup = vision_hedging.backup_provider_from_env()
+    if not (OPENROUTER_API_KEY and backup):
+        return None
+    primary = vision_hedging.VisionProvider(
+        "openrouter", OPENROUTER_BASE_URL, OPENROUTER_API_KEY, MODEL_NAME,
+        extra_headers={
+            "HTTP-Referer": site_url(),
+            "X-Title": "Solar Industry AI Assistant"
+        }
+    )
+    return vision_hedging.Hedger(primary, backup)
 
-5. **Maintenance Requirements**:
-   - Cleaning frequency
-   - Monitoring recommendations
-   - Warranty information
+@st.cache_resource
+def get_blob_store():
+    """Image blobs shared by all sessions; session state only keeps their keys"""
+    return blob_store.BlobStore()
 
-Format as markdown with clear headings. Include quantitative estimates where possible."""
+def session_image():
+    """The analyzed image, loaded from the blob store on demand"""
+    try:
+        return get_blob_store().open_image(st.session_state.image_key) if 'image_key' in st.session_state else None
+    except KeyError:
+        return None
 
-        if not openrouter_client:
-            raise Exception("No API client available")
+@st.cache_resource
+def get_results_writer():
+    """Buffered writer to the columnar results store read by portfolio_dashboard.py, shared by all sessions"""
+    return results_store.ResultsWriter()
+
+def record_result(financials, checks, system_size, panel_type, country, site):
+    """Append this analysis' financials and compliance checks to the results store once per distinct set of inputs"""
+    roi_years = financials['roi_years']
+    signature = (st.session_state.get('analysis_id'), system_size, panel_type,
+                 None if roi_years is None else round(roi_years, 4),
+                 tuple(passed for passed, _ in checks.values()))
+    if st.session_state.get('recorded_result') == signature:
+        return
+    get_results_writer().add([results_store.make_record(
+        country, site=site, analysis_id=st.session_state.get('analysis_id'),
+        system_size_kw=system_size, panel_type=panel_type, financials=financials, checks=checks
+    )])
+    st.session_state.recorded_result = signature
+
+@st.cache_resource
+def get_speech_service():
+    """One speech engine and audio cache shared by all sessions, warmed when the app first loads"""
+    service = speech_service.SpeechService()
+    service.warm()
+    return service
+
+@st.cache_resource
+def get_tile_fetcher():
+    """One tile cache and download pool shared by all sessions"""
+    return tile_cache.TileFetcher()
 
-        response = openrouter_client.chat.completions.create(
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+def analyze_rooftop_with_ai(image: Image.Image, country: str, sections=None, concise: bool = False):
+    """Analyze rooftop image with AI for solar potential"""
+    try:
+        analysis, st.session_state.token_usage = solar_core.analyze_rooftop(
+            openrouter_client, MODEL_NAME, image, country, sections=sections, concise=concise,
             extra_headers={
-                "HTTP-Referer": st.secrets.get("SITE_URL", "https://solar-rooftop.streamlit.app"),
+                "HTTP-Referer": site_url(),
                 "X-Title": "Solar Industry AI Assistant"
             },
-            model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.1
+            hedger=get_vision_hedger()
         )
-        
-        return response.choices[0].message.content
+        return analysis
         
     except Exception as e:
         st.error(f"API call failed: {str(e)}")
@@ -227,6 +202,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Starts the speech engine in the background on first load
+get_speech_service()
+
 # Main App
 st.title("☀️ Solar Industry AI Assistant")
 st.markdown("""
@@ -252,39 +230,178 @@ with col1:
     with st.expander("📷 Upload Rooftop Image", expanded=True):
         uploaded_file = st.file_uploader(
             "Choose a rooftop image (satellite or direct photo)",
-            type=["png", "jpg", "jpeg"],
+            type=["png", "jpg", "jpeg", "tif", "tiff"],
             help="Clear, top-down views work best for accurate analysis."
         )
 
-        image = None
+        # No screenshot needed: pull satellite imagery for an address or coordinates instead
+        sat_col1, sat_col2 = st.columns([3, 1])
+        satellite_place = sat_col1.text_input("…or an address / \"lat, lon\" for satellite imagery")
+        satellite_radius = sat_col2.number_input("Radius (m)", min_value=10, max_value=150, value=30, step=5)
+        if satellite_place and st.button("🛰️ Fetch Satellite View"):
+            try:
+                with st.spinner("Fetching imagery..."):
+                    st.session_state.satellite = (
+                        (satellite_place, satellite_radius),
+                        get_blob_store().put_image(get_tile_fetcher().mosaic(satellite_place, satellite_radius))
+                    )
+            except Exception as e:
+                st.error(f"Failed to fetch satellite imagery: {str(e)}")
+
+        # Images live in the blob store; session state and reruns only carry their key
+        store = get_blob_store()
+        image_key = None
+        image_phash = None
+        similar_analyses = []
         if uploaded_file:
+            # file_id is new for every upload, even of a different file with the same name and size
+            upload_key = uploaded_file.file_id
+            stored = st.session_state.get('image_blob')
+            if stored and stored[0] == upload_key and stored[1] in store:
+                image_key = stored[1]
+            else:
+                try:
+                    image_key = store.put_image(image_ingest.load_image(uploaded_file))
+                    st.session_state.image_blob = (upload_key, image_key)
+                except Exception as e:
+                    st.error(f"Failed to load image: {str(e)}")
+            image_caption = "Uploaded Rooftop Image"
+        elif 'satellite' in st.session_state:
+            (satellite_shown, _), image_key = st.session_state.satellite
+            image_caption = f"Satellite view: {satellite_shown}"
+            if image_key not in store:
+                st.warning("The satellite view has expired from the image cache; please fetch it again.")
+                del st.session_state.satellite
+                image_key = None
+        if image_key:
+            try:
+                st.image(store.thumbnail(image_key), caption=image_caption, use_column_width=True)
+            except KeyError:
+                st.warning("The image has expired from the image cache; please upload it again.")
+                image_key = None
+        if image_key:
+            # Re-crops, screenshots and re-compressions of the same roof hash within a few bits
             try:
-                image = Image.open(uploaded_file)
-                st.image(image, caption="Uploaded Rooftop Image", use_column_width=True)
+                # Hash once per image rather than on every rerun
+                if st.session_state.get('image_fingerprint', (None,))[0] != image_key:
+                    _, fingerprint = solar_core.resize_image(store.open_image(image_key), fingerprint=True)
+                    st.session_state.image_fingerprint = (image_key, fingerprint)
+                image_phash = st.session_state.image_fingerprint[1]
+                similar_analyses = analysis_history.find_similar(image_phash)
             except Exception as e:
-                st.error(f"Failed to load image: {str(e)}")
+                st.warning(f"Couldn't check for earlier analyses of this roof: {str(e)}")
+            if similar_analyses:
+                st.info("This roof looks like earlier analyses:\n" + "\n".join(
+                    f"- #{a['id']} {a['site'] or '(no site)'} ({a['country']}), {a['created_at'][:10]}, "
+                    f"{a['distance']}/64 bits different"
+                    for a in similar_analyses
+                ))
 
     # Location and Settings
     with st.expander("⚙️ Analysis Parameters"):
+        site = st.text_input(
+            "Site Name / Address",
+            help="Used to find this assessment again in the analysis history."
+        )
+        loc_col1, loc_col2 = st.columns(2)
+        latitude = loc_col1.number_input("Latitude", min_value=-90.0, max_value=90.0, value=None, format="%.5f")
+        longitude = loc_col2.number_input("Longitude", min_value=-180.0, max_value=180.0, value=None, format="%.5f")
+        # Local defaults, tariff, incentives and rules from the region index, when one is built
+        region = None
+        if latitude is not None and longitude is not None:
+            region = geo_index.lookup(latitude, longitude)
+            if region and region["regions"]:
+                st.caption("Region: " + " › ".join(region["regions"].values()))
+        region = region or {}
+        countries = list(GOVERNMENT_INCENTIVES.keys())
         country = st.selectbox(
             "Country",
-            list(GOVERNMENT_INCENTIVES.keys()),
-            index=0
+            countries,
+            index=countries.index(region["country"]) if region.get("country") in countries else 0
         )
         electricity_rate = st.number_input(
             "Local Electricity Rate (per kWh)",
             min_value=0.01,
-            max_value=2.0,
-            value=0.12,
+            max_value=50.0,
+            value=float(region.get("electricity_rate", 0.12)),
             step=0.01
         )
         sun_hours = st.number_input(
             "Average Daily Sun Hours",
             min_value=1.0,
             max_value=12.0,
-            value=4.5,
+            value=float(region.get("sun_hours", 4.5)),
             step=0.1
         )
+        tariff_options = tariff_billing.preset_tariffs(electricity_rate)
+        tariff_choices = ["Flat rate (production × rate)"] + list(tariff_options.keys())
+        tariff_name = st.selectbox(
+            "Tariff",
+            tariff_choices,
+            index=tariff_choices.index(region["tariff"]) if region.get("tariff") in tariff_choices else 0,
+            help="Hourly tariffs bill simulated production against household load, including exports."
+        )
+        tariff = tariff_options.get(tariff_name)
+        annual_load_kwh = st.number_input(
+            "Annual Household Consumption (kWh, 0 = match production)",
+            min_value=0,
+            max_value=200000,
+            value=0,
+            step=500
+        )
+        reuse_similar = st.checkbox(
+            "Reuse the closest earlier analysis for near-duplicate images",
+            help="Skips the AI call when this roof has already been analyzed for the selected country."
+        )
+        show_uncertainty = st.checkbox(
+            "Show P50/P90 uncertainty bands",
+            help="Monte Carlo over sun hours, tariffs and degradation (100,000 scenarios)."
+        )
+        analysis_depth = st.selectbox(
+            "Analysis Depth",
+            list(prompt_builder.ANALYSIS_PRESETS.keys()) + ["Custom"],
+            index=0,
+            help="Quick estimates request fewer sections and fewer output tokens, so they return faster."
+        )
+        if analysis_depth == "Custom":
+            analysis_sections = st.multiselect(
+                "Report Sections",
+                list(prompt_builder.PROMPT_SECTIONS.keys()),
+                default=list(prompt_builder.PROMPT_SECTIONS.keys())
+            )
+            concise = False
+        else:
+            analysis_sections = prompt_builder.ANALYSIS_PRESETS[analysis_depth]["sections"]
+            concise = prompt_builder.ANALYSIS_PRESETS[analysis_depth]["concise"]
+
+    # Battery Storage
+    with st.expander("🔋 Battery Storage"):
+        include_battery = st.checkbox("Include a battery in the quote")
+        battery_capacity = st.number_input("Usable Capacity (kWh)", min_value=1.0, max_value=200.0, value=10.0, step=0.5)
+        battery_power = st.number_input("Max Charge/Discharge Power (kW)", min_value=0.5, max_value=100.0, value=5.0, step=0.5)
+        battery_efficiency = st.slider("Round-trip Efficiency", min_value=0.7, max_value=1.0, value=0.9, step=0.01)
+        battery_cost_per_kwh = st.number_input("Battery Cost (₹/kWh)", min_value=1000, max_value=100000, value=20000, step=1000)
+        battery_strategy = st.selectbox(
+            "Dispatch Strategy",
+            battery_dispatch.DISPATCH_STRATEGIES,
+            format_func=lambda s: s.replace("_", " ").capitalize(),
+            help="TOU arbitrage charges from the grid in cheap hours; it needs a time-of-use tariff."
+        )
+        battery = None
+        if include_battery:
+            battery = battery_dispatch.Battery(
+                battery_capacity, battery_power, round_trip_efficiency=battery_efficiency,
+                cost_per_kwh=battery_cost_per_kwh
+            )
+
+    # Installation details for the building code, net metering and safety checks
+    with st.expander("📋 Installation Compliance"):
+        has_bi_directional_meter = st.checkbox(
+            "Bi-directional meter installed", value=True,
+            help="Without one, or where net metering isn't offered, exports are billed at zero."
+        )
+        inverter_certified = st.checkbox("Inverter certified", value=True)
+        meets_fire_code = st.checkbox("Meets fire code", value=True)
 
     # Solar Panel Information
     with st.expander("🔧 Solar Panel Types"):
@@ -301,35 +418,95 @@ with col1:
 
 with col2:
     # Analysis Section
-    if image and st.button("🔍 Analyze Rooftop", type="primary"):
+    if image_key and st.button("🔍 Analyze Rooftop", type="primary"):
         with st.spinner("Analyzing with AI (this may take 20-30 seconds)..."):
             try:
-                analysis_result = analyze_rooftop_with_ai(image, country)
+                reused = None
+                if reuse_similar and image_phash is not None:
+                    # Incentives, rates and rules in a report are country-specific
+                    same_country = analysis_history.find_similar(image_phash, limit=1, country=country)
+                    if same_country:
+                        reused = analysis_history.get_analysis(same_country[0]['id'])
+                if reused:
+                    analysis_result = reused['report']
+                    st.session_state.token_usage = None
+                else:
+                    analysis_result = analyze_rooftop_with_ai(
+                        store.open_image(image_key), country, analysis_sections or None, concise
+                    )
                 
                 st.subheader("📊 Professional Solar Assessment")
                 st.markdown(analysis_result)
+                if reused:
+                    st.caption(f"Reused analysis #{reused['id']} from {reused['created_at'][:10]}; no AI call made")
+                usage = st.session_state.get('token_usage')
+                if usage:
+                    st.caption(
+                        f"Tokens: {usage['prompt_tokens']} prompt "
+                        f"({usage['cached_prompt_tokens'] or 0} cached), {usage['completion_tokens']} completion"
+                    )
+                hedger = get_vision_hedger()
+                if hedger and not reused:
+                    hedge = hedger.stats.snapshot()
+                    st.caption(
+                        f"Hedged {hedge['hedged']}/{hedge['requests']} requests ({hedge['hedge_rate']:.0%}), "
+                        f"backup won {hedge['backup_wins']}, ~{hedge['latency_saved_s']:.1f}s saved"
+                    )
                 
                 # Save to session state
                 st.session_state.analysis_result = analysis_result
-                st.session_state.image = image
+                st.session_state.image_key = image_key
+                st.session_state.pop('speech_job', None)  # Its audio described the previous analysis
+
+                # Persist to the local history store
+                try:
+                    if reused:
+                        st.session_state.analysis_id = reused['id']
+                    else:
+                        st.session_state.analysis_id = analysis_history.save_analysis(
+                            analysis_result, country, site=site, image_phash=image_phash
+                        )
+                except Exception as e:
+                    st.warning(f"Couldn't save analysis to history: {str(e)}")
             except Exception as e:
                 st.error(f"Analysis failed: {str(e)}")
 
         # Extract system size for financial calculations
-        if image and 'analysis_result' in st.session_state and "Recommended system size" in st.session_state['analysis_result']:
+        if image_key and 'analysis_result' in st.session_state and "Recommended system size" in st.session_state['analysis_result']:
             analysis_result = st.session_state['analysis_result']
             try:
-                system_size = float(analysis_result.split("Recommended system size")[1].split("kW")[0].strip())
-                panel_type = analysis_result.split("Optimal panel type")[1].split("\n")[0].strip()
+                # The system prompt pins the "Recommended system size: <n> kW" / "Optimal panel type: <type>" format
+                system_size = analysis_history.parse_system_size(analysis_result)
+                panel_type = analysis_history.parse_panel_type(analysis_result)
+                if system_size is None or panel_type is None:
+                    raise ValueError("system size or panel type not found in the analysis")
+                installation = solar_compliance.SolarInstallation(
+                    site or country, system_size, has_bi_directional_meter, inverter_certified, meets_fire_code,
+                    rules=region.get("compliance_rules")
+                )
+                checks = installation.run_all_checks()
+                st.session_state.compliance = checks
+                billing_tariff = installation.billing_tariff(tariff, electricity_rate)
                 financials = calculate_financials(
                     panel_type,
                     system_size,
                     electricity_rate,
                     sun_hours,
-                    country
+                    country,
+                    tariff=billing_tariff,
+                    annual_load_kwh=annual_load_kwh or None,
+                    latitude=latitude if latitude is not None else 20.0,
+                    battery=battery,
+                    battery_strategy=battery_strategy
                 )
                 
                 if financials:
+                    financials["incentives"] = {**financials["incentives"], **region.get("incentives", {})}
+                    st.session_state.financials = financials
+                    try:
+                        record_result(financials, checks, system_size, panel_type, country, site)
+                    except Exception as e:
+                        st.warning(f"Couldn't record results for the portfolio dashboard: {str(e)}")
                     st.subheader("💰 Financial Projections")
                     st.markdown(f"""
                     <div class="success-box">
@@ -337,13 +514,48 @@ with col2:
                         <p><strong>Total System Cost:</strong> ₹{financials['total_cost']:,.2f}</p>
                         <p><strong>Annual Production:</strong> {financials['annual_production_kwh']:,.0f} kWh</p>
                         <p><strong>Annual Savings:</strong> ₹{financials['annual_savings']:,.2f}</p>
-                        <p><strong>ROI Period:</strong> {financials['roi_years']:.1f} years</p>
+                        <p><strong>ROI Period:</strong> {"Never (no annual savings)" if financials['roi_years'] is None else f"{financials['roi_years']:.1f} years"}</p>
+                        {f"<p><strong>Annual Bill ({financials['tariff']}):</strong> ₹{financials['annual_bill_before']:,.2f} → ₹{financials['annual_bill_after']:,.2f}</p>" if 'tariff' in financials else ""}
+                        {f"<p><strong>Battery:</strong> ₹{financials['battery_cost']:,.0f}, {financials['battery_annual_discharge_kwh']:,.0f} kWh/year discharged ({financials['battery_cycles_per_year']:.0f} cycles)</p>" if 'battery_cost' in financials else ""}
                         <h5>Government Incentives:</h5>
                         <ul>
                             {"".join([f"<li><strong>{k}:</strong> {v}</li>" for k, v in financials['incentives'].items()])}
                         </ul>
                     </div>
                     """, unsafe_allow_html=True)
+
+                st.subheader("📋 Compliance Checks")
+                for category, (status, message) in checks.items():
+                    st.markdown(f"**{category}:** {'✅ Passed' if status else '❌ Failed'} - {message}")
+
+                if show_uncertainty:
+                    bands = monte_carlo.simulate_financials(
+                        panel_type,
+                        system_size,
+                        electricity_rate,
+                        sun_hours,
+                        country,
+                        tariff=billing_tariff,
+                        annual_load_kwh=annual_load_kwh or None,
+                        latitude=latitude if latitude is not None else 20.0,
+                        battery=battery,
+                        battery_strategy=battery_strategy,
+                        workers=monte_carlo.default_workers()
+                    )
+                    st.session_state.financial_bands = bands
+                    st.subheader("📈 Uncertainty (P50 / P90)")
+                    band_col1, band_col2, band_col3 = st.columns(3)
+                    band_col1.metric("Year-1 Production P50", f"{bands['production_p50_kwh']:,.0f} kWh")
+                    band_col1.metric("Year-1 Production P90", f"{bands['production_p90_kwh']:,.0f} kWh")
+                    for label, years in (("Payback P50", bands["payback_p50_years"]),
+                                         ("Payback P90", bands["payback_p90_years"])):
+                        band_col2.metric(label, f"{years:.1f} years" if math.isfinite(years) else "Never")
+                    band_col3.metric("NPV P50", f"₹{bands['npv_p50']:,.0f}")
+                    band_col3.metric("NPV P90", f"₹{bands['npv_p90']:,.0f}")
+                    st.caption(
+                        "P90 is the value met in 90% of scenarios (25 years, 7% discount rate). Savings per kWh "
+                        "follow the tariff, load and battery above."
+                    )
             except Exception as e:
                 st.warning(f"Couldn't extract all financial details: {str(e)}")
 
@@ -367,22 +579,128 @@ with st.form("roi_form"):
         else:
             st.success(f"Estimated ROI: {roi} years")
 
-
-                
-
-    # Show saved analysis if available
-    if 'analysis_result' in st.session_state:
-        st.divider()
-        st.subheader("Last Analysis")
-        st.markdown(st.session_state['analysis_result'])
-        
-        # Download button
-        st.download_button(
-            label="📥 Download Full Report",
-            data=st.session_state.analysis_result,
-            file_name="solar_assessment_report.md",
-            mime="text/markdown"
-        )
+# Show saved analysis if available (outside the form: forms can't hold download buttons)
+if 'analysis_result' in st.session_state:
+    st.divider()
+    st.subheader("Last Analysis")
+    st.markdown(st.session_state['analysis_result'])
+
+    # Download button
+    st.download_button(
+        label="📥 Download Full Report",
+        data=st.session_state.analysis_result,
+        file_name="solar_assessment_report.md",
+        mime="text/markdown"
+    )
+
+    # Speech renders on a background worker; cached summaries are ready immediately
+    if st.button("🔊 Read Summary"):
+        try:
+            st.session_state.speech_job = get_speech_service().speak(speech_service.summary_text(
+                st.session_state.analysis_result, st.session_state.get('financials')
+            ))
+        except Exception as e:
+            st.error(f"Speech is unavailable: {str(e)}")
+    if 'speech_job' in st.session_state:
+        speech_job = st.session_state.speech_job
+        if not speech_job.done():
+            st.info("Preparing audio in the background...")
+            st.button("Refresh", key="speech_refresh")
+        elif speech_job.exception():
+            st.error(f"Speech rendering failed: {str(speech_job.exception())}")
+        else:
+            st.audio(speech_job.result(), format=speech_service.audio_format(speech_job.result()))
+
+# Report Export
+if 'analysis_result' in st.session_state:
+    st.subheader("📄 Export Report")
+    export_format = st.radio("Format", ["html", "pdf"], horizontal=True, format_func=str.upper)
+    if st.button("Render Report"):
+        # Rendering runs on a background worker; the result is picked up on a later rerun
+        st.session_state.report_job = (export_format, report_renderer.submit_report(
+            export_format,
+            analysis=st.session_state.analysis_result,
+            financials=st.session_state.get('financials'),
+            compliance=st.session_state.get('compliance'),
+            image=session_image(),
+            site=site,
+            country=country
+        ))
+    if 'report_job' in st.session_state:
+        job_format, job = st.session_state.report_job
+        if not job.done():
+            st.info("Rendering report in the background...")
+            st.button("Refresh")
+        elif job.exception():
+            st.error(f"Report rendering failed: {str(job.exception())}")
+        else:
+            st.download_button(
+                label=f"📥 Download {job_format.upper()} Report",
+                data=job.result(),
+                file_name=f"solar_assessment_report.{job_format}",
+                mime="application/pdf" if job_format == "pdf" else "text/html"
+            )
+
+# Analysis History
+st.subheader("📚 Analysis History")
+with st.expander("Browse past assessments"):
+    hist_col1, hist_col2, hist_col3 = st.columns([2, 1, 1])
+    history_query = hist_col1.text_input("Search reports", placeholder="e.g. shading, Pune, monocrystalline")
+    history_country = hist_col2.selectbox("Country filter", ["All"] + list(GOVERNMENT_INCENTIVES.keys()))
+    history_page = hist_col3.number_input("Page", min_value=1, value=1, step=1) - 1
+
+    history_filters = {"country": None if history_country == "All" else history_country}
+    try:
+        if history_query.strip():
+            history_rows = analysis_history.search_analyses(history_query, page=history_page, **history_filters)
+        else:
+            history_rows = analysis_history.list_analyses(page=history_page, **history_filters)
+    except Exception as e:
+        st.error(f"Failed to load analysis history: {str(e)}")
+        history_rows = []
+
+    if not history_rows:
+        st.info("No saved assessments found.")
+    for row in history_rows:
+        size = f"{row['system_size_kw']:.1f} kW" if row['system_size_kw'] else "size n/a"
+        label = f"#{row['id']} · {row['site'] or 'Unnamed site'} · {row['country']} · {size} · {row['created_at'][:10]}"
+        # Report bodies are only fetched when the user opens one
+        if st.checkbox(label, key=f"history_{row['id']}"):
+            record = analysis_history.get_analysis(row['id'])
+            if record:
+                st.markdown(record['report'])
+
+    if st.button("📦 Export History as ZIP"):
+        with st.spinner("Exporting reports..."):
+            try:
+                # Reports are rendered and compressed one by one into a temp file on disk
+                archive_file = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+                try:
+                    with archive_file:
+                        exported = report_renderer.export_reports_zip(
+                            (
+                                (f"{record['id']}_{record['country']}_{record['created_at'][:10]}", {
+                                    "analysis": record['report'],
+                                    "site": record['site'],
+                                    "country": record['country'],
+                                    "generated_at": record['created_at'],
+                                })
+                                for record in analysis_history.iter_analyses(**history_filters)
+                            ),
+                            archive_file
+                        )
+                    # download_button takes bytes or a file opened for reading, not the temp file handle
+                    with open(archive_file.name, "rb") as archive:
+                        st.download_button(
+                            label=f"📥 Download {exported} Reports",
+                            data=archive,
+                            file_name="solar_assessment_reports.zip",
+                            mime="application/zip"
+                        )
+                finally:
+                    os.remove(archive_file.name)
+            except Exception as e:
+                st.error(f"Export failed: {str(e)}")
 
 # Footer
 st.divider()
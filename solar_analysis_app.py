@@ -1,10 +1,10 @@
 import streamlit as st  # type: ignore
-from PIL import Image  # type: ignore
 import openai  # type: ignore
 import io
 import base64
 from dotenv import load_dotenv  # type: ignore
 import os
+import image_ingest
 from openai import OpenAI #type: ignore
 from openai.types.chat import ChatCompletion  #type: ignore
 from openai.types.chat.chat_completion import ChatCompletionMessage  #type: ignore
@@ -25,8 +25,8 @@ def calculate_roi(panel_watt, panel_count, cost_per_panel, electricity_rate, sun
     return total_cost, annual_savings, roi_years
 
 # Load image
-image_path = r"c:\Users\itzra\OneDrive\Pictures\Screenshots\rooftop.png"
-image = Image.open(image_path)
+image_path = os.getenv("ROOFTOP_IMAGE_PATH", r"c:\Users\itzra\OneDrive\Pictures\Screenshots\rooftop.png")
+image = image_ingest.load_image(image_path)
 
 # Streamlit UI
 st.title("☀️ Solar Rooftop Analysis AI Tool")
@@ -51,29 +51,29 @@ if st.button("🔍 Analyze Rooftop"):
             "4. Notes on shading or obstacles"
         )
 
-try:
-    # GPT-4 Vision API call (new SDK syntax)
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": vision_prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_base64}"}}
-                ]
-            }
-        ],
-        max_tokens=800,
-    )
+        try:
+            # GPT-4 Vision API call (new SDK syntax)
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": vision_prompt},
+                            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_base64}"}}
+                        ]
+                    }
+                ],
+                max_tokens=800,
+            )
 
-    result = response.choices[0].message.content
+            result = response.choices[0].message.content
 
-    st.subheader("📊 AI Analysis Result")
-    st.markdown(result)
+            st.subheader("📊 AI Analysis Result")
+            st.markdown(result)
 
-except Exception as e:
-    st.error(f"❌ An unexpected error occurred: {e}")
+        except Exception as e:
+            st.error(f"❌ An unexpected error occurred: {e}")
 
 # ROI Calculator
 st.subheader("🧮 ROI Calculator (Manual Entry)")
@@ -0,0 +1,62 @@
+# Jurisdictions override these via rules=..., e.g. from geo_index.lookup(lat, lon)["compliance_rules"]
+DEFAULT_COMPLIANCE_RULES = {
+    "max_residential_kw": 10,
+    "net_metering_available": True,
+}
+
+class SolarInstallation:
+    def __init__(self, location, system_size_kw, has_bi_directional_meter, inverter_certified, meets_fire_code,
+                 rules=None):
+        self.location = location
+        self.system_size_kw = system_size_kw
+        self.has_bi_directional_meter = has_bi_directional_meter
+        self.inverter_certified = inverter_certified
+        self.meets_fire_code = meets_fire_code
+        self.rules = {**DEFAULT_COMPLIANCE_RULES, **(rules or {})}
+
+    def check_building_code_compliance(self):
+        # Residential size limit (10 kW unless the jurisdiction sets its own)
+        if self.system_size_kw > self.rules["max_residential_kw"]:
+            return False, "Exceeds residential size limit"
+        return True, "Compliant with building code"
+
+    def check_net_metering_eligibility(self):
+        # Net metering must be offered locally and requires a bi-directional meter
+        if not self.rules["net_metering_available"]:
+            return False, "Net metering not offered in this jurisdiction"
+        if not self.has_bi_directional_meter:
+            return False, "Missing bi-directional meter"
+        return True, "Eligible for net metering"
+
+    def check_safety_standards(self):
+        # Must have certified inverter and meet fire code
+        if not self.inverter_certified:
+            return False, "Inverter not certified"
+        if not self.meets_fire_code:
+            return False, "Fails fire safety compliance"
+        return True, "Meets safety standards"
+
+    def billing_tariff(self, tariff=None, electricity_rate=None):
+        """The tariff to bill this installation under, given its net metering eligibility
+
+        Eligible systems keep the tariff's export terms; a missing tariff then
+        means the flat electricity_rate, which credits every kWh at retail, so
+        None is returned. Ineligible systems get nothing for exports: the tariff
+        loses its export credit, or a flat electricity_rate tariff without one
+        is built.
+        """
+        eligible, _ = self.check_net_metering_eligibility()
+        if eligible:
+            return tariff
+        if tariff is None:
+            import tariff_billing
+            return tariff_billing.Tariff("Flat rate (exports not credited)", energy_rate=electricity_rate)
+        return tariff.without_export_credit()
+
+    def run_all_checks(self):
+        results = {
+            "Building Code": self.check_building_code_compliance(),
+            "Net Metering": self.check_net_metering_eligibility(),
+            "Safety Standards": self.check_safety_standards()
+        }
+        return results
@@ -0,0 +1,232 @@
+import base64
+import io
+
+import numpy as np  # type: ignore
+from PIL import Image  # type: ignore
+
+import prompt_builder
+import tariff_billing
+import battery_dispatch
+import image_hash
+
+# Shared constants and calculations used by the Streamlit apps and the API service.
+# Nothing in here touches Streamlit, so it can be imported headlessly.
+
+# === Solar Industry Constants ===
+SOLAR_PANEL_TYPES = {
+    "Monocrystalline": {
+        "efficiency": "15-22%",
+        "cost_per_watt": 45,
+        "lifespan": "25-30 years",
+        "description": "High efficiency, space-efficient, more expensive"
+    },
+    "Polycrystalline": {
+        "efficiency": "13-16%",
+        "cost_per_watt": 40,
+        "lifespan": "23-27 years",
+        "description": "Good value, moderate efficiency"
+    },
+    "Thin-Film": {
+        "efficiency": "10-13%",
+        "cost_per_watt": 35,
+        "lifespan": "10-20 years",
+        "description": "Lightweight, flexible, lower efficiency"
+    }
+}
+
+GOVERNMENT_INCENTIVES = {
+    "India": {
+        "Central Financial Assistance (CFA)": "Up to 40% subsidy for residential systems",
+        "Net Metering": "Available in most states",
+        "Tax Benefits": "Accelerated depreciation for commercial systems"
+    },
+    "USA": {
+        "Federal Tax Credit": "26% of system cost (2023)",
+        "State Incentives": "Varies by state",
+        "Net Metering": "Available in most states"
+    },
+    "Germany": {
+        "Feed-in Tariff": "Guaranteed rates for solar power",
+        "VAT Reduction": "Reduced VAT for solar systems"
+    }
+}
+
+# Default Electricity Rates and Sun Hours by Country
+DEFAULT_SOLAR_PARAMS = {
+    "India": {"electricity_rate": 0.12, "sun_hours": 4.5},
+    "USA": {"electricity_rate": 0.15, "sun_hours": 5.1},
+    "Germany": {"electricity_rate": 0.13, "sun_hours": 4.9},
+}
+
+# === Helper Functions ===
+def resize_image(image: Image.Image, max_size: int = 1024, fingerprint: bool = False):
+    """Resize image to reduce API payload while maintaining aspect ratio
+
+    With fingerprint=True, returns (image, perceptual hash) - hashing the
+    downscaled copy is cheaper and matches what the vision model sees.
+    """
+    width, height = image.size
+    if width > max_size or height > max_size:
+        ratio = min(max_size/width, max_size/height)
+        new_size = (int(width * ratio), (int(height * ratio)))
+        image = image.resize(new_size, Image.LANCZOS)
+    if fingerprint:
+        return image, image_hash.phash(image)
+    return image
+
+def calculate_financials(panel_type, system_size, electricity_rate, sun_hours=4.5, country="India",
+                         tariff=None, annual_load_kwh=None, latitude=20.0, battery=None,
+                         battery_strategy="self_consumption"):
+    """Calculate financial metrics for solar installation
+
+    Without a tariff, savings are annual production x electricity_rate. With a
+    tariff_billing.Tariff, hourly production and household load profiles are
+    billed under it and savings are the difference in annual bills; the load
+    defaults to the system's own annual production. A battery_dispatch.Battery
+    is dispatched over the same hourly profiles and its cost added to the system
+    cost; without a tariff it is billed at a flat, net-metered electricity_rate,
+    which credits every kWh like the battery-free calculation does.
+
+    roi_years is None when the system saves nothing a year, which a tariff
+    that doesn't credit exports can produce.
+    """
+    total_cost = system_cost(panel_type, system_size)
+    annual_production = system_size * sun_hours * 365
+    annual_savings = annual_production * electricity_rate
+    billing = {}
+    if battery is not None and tariff is None:
+        tariff = tariff_billing.Tariff("Flat rate", energy_rate=electricity_rate, export_rate=electricity_rate,
+                                       net_metering=True)
+    if tariff is not None:
+        production = tariff_billing.production_profile(system_size, sun_hours, latitude)
+        load = tariff_billing.load_profile(annual_load_kwh or annual_production)
+        if battery is not None:
+            dispatch = battery_dispatch.simulate_battery(production, load, battery, battery_strategy, tariff)
+            production = dispatch["effective_production_kwh"]
+            total_cost += battery.total_cost
+            billing.update({
+                "battery_cost": battery.total_cost,
+                "battery_strategy": battery_strategy,
+                "battery_annual_discharge_kwh": float(dispatch["annual_discharge_kwh"]),
+                "battery_cycles_per_year": float(dispatch["equivalent_full_cycles"]),
+            })
+        bills = tariff_billing.simulate_bills(production, load, tariff)
+        annual_savings = float(bills["annual_savings"])
+        billing.update({
+            "tariff": tariff.name,
+            "annual_bill_before": float(bills["annual_bill_without_solar"]),
+            "annual_bill_after": float(bills["annual_bill"]),
+            "annual_export_kwh": float(bills["annual_export_kwh"]),
+            "self_consumption_kwh": float(bills["self_consumption_kwh"]),
+        })
+    roi_years = payback_years(total_cost, annual_savings)
+
+    incentives = GOVERNMENT_INCENTIVES.get(country, {})
+
+    return {
+        "total_cost": total_cost,
+        "annual_production_kwh": annual_production,
+        "annual_savings": annual_savings,
+        "roi_years": roi_years,
+        "incentives": incentives,
+        **billing
+    }
+
+def system_cost(panel_type, system_size):
+    """Installed cost of the panels; raises KeyError for an unknown panel type"""
+    return system_size * SOLAR_PANEL_TYPES[panel_type]["cost_per_watt"] * 1000  # Convert kW to W
+
+def payback_years(total_cost, annual_savings):
+    """Simple payback, or None when the system saves nothing a year"""
+    return total_cost / annual_savings if annual_savings > 0 else None
+
+def calculate_financials_batch(scenarios, chunk_size: int = 500):
+    """calculate_financials for many scenarios (dicts of its arguments); results come back in order
+
+    Scenarios with a tariff and no battery are grouped by tariff and latitude
+    and billed together by tariff_billing.portfolio_study, which builds hourly
+    profiles a chunk of customers at a time. The rest are calculated one by one:
+    flat rates are a multiplication, and battery dispatch is sequential anyway.
+    """
+    results = [None] * len(scenarios)
+    groups = {}
+    for i, scenario in enumerate(scenarios):
+        tariff = scenario.get("tariff")
+        if tariff is None or scenario.get("battery") is not None:
+            results[i] = calculate_financials(**scenario)
+        else:
+            groups.setdefault((tariff.key(), scenario.get("latitude", 20.0)), []).append(i)
+
+    for (_, latitude), members in groups.items():
+        tariff = scenarios[members[0]]["tariff"]
+        group = [scenarios[i] for i in members]
+        sizes = np.array([s["system_size"] for s in group], dtype=np.float64)
+        sun_hours = np.array([s.get("sun_hours", 4.5) for s in group], dtype=np.float64)
+        production = sizes * sun_hours * 365
+        loads = np.array([s.get("annual_load_kwh") or p for s, p in zip(group, production)], dtype=np.float64)
+        bills = tariff_billing.portfolio_study(sizes, loads, sun_hours, [tariff], latitude, chunk_size)[tariff.name]
+        for j, (i, scenario) in enumerate(zip(members, group)):
+            total_cost = system_cost(scenario["panel_type"], scenario["system_size"])
+            annual_savings = float(bills["annual_savings"][j])
+            results[i] = {
+                "total_cost": total_cost,
+                "annual_production_kwh": float(production[j]),
+                "annual_savings": annual_savings,
+                "roi_years": payback_years(total_cost, annual_savings),
+                "incentives": GOVERNMENT_INCENTIVES.get(scenario.get("country", "India"), {}),
+                "tariff": tariff.name,
+                "annual_bill_before": float(bills["annual_bill_without_solar"][j]),
+                "annual_bill_after": float(bills["annual_bill"][j]),
+                "annual_export_kwh": float(bills["annual_export_kwh"][j]),
+                "self_consumption_kwh": float(bills["self_consumption_kwh"][j]),
+            }
+    return results
+
+def encode_image(image: Image.Image) -> str:
+    """Downsize and JPEG-encode an image for a vision request"""
+    image = resize_image(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=85)
+    return base64.b64encode(buffered.getvalue()).decode()
+
+# === AI Analysis Functions ===
+def analyze_rooftop(client, model: str, image: Image.Image, country: str, sections=None,
+                    concise: bool = False, extra_headers=None, hedger=None):
+    """Analyze rooftop image with AI for solar potential; returns (markdown, token usage)
+
+    With a vision_hedging.Hedger, the request is hedged across its primary and
+    backup providers and client/model/extra_headers are not used.
+    """
+    if not client and not hedger:
+        raise Exception("No API client available")
+
+    sections = prompt_builder.fit_sections(country, SOLAR_PANEL_TYPES.keys(), sections, concise)
+    messages = prompt_builder.build_messages(
+        country, encode_image(image), SOLAR_PANEL_TYPES.keys(), sections=sections, concise=concise
+    )
+    max_tokens = prompt_builder.output_token_budget(sections, concise=concise)
+
+    if hedger:
+        content, response, route = hedger.complete(messages, max_tokens)
+        usage = prompt_builder.log_usage(
+            response, route["model"],
+            estimated_prompt_tokens=prompt_builder.estimate_prompt_tokens(messages),
+            max_tokens=max_tokens
+        )
+        return content, usage
+
+    response = client.chat.completions.create(
+        extra_headers=extra_headers,
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0.1
+    )
+    usage = prompt_builder.log_usage(
+        response, model,
+        estimated_prompt_tokens=prompt_builder.estimate_prompt_tokens(messages),
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content, usage
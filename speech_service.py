@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import analysis_history
+import blob_store
+
+# Spoken summaries for the solar apps. pyttsx3's say() + runAndWait() blocks the
+# caller for the whole utterance and synthesizes the same sentence again on
+# every call, so instead one worker thread owns the engine and renders text to
+# WAV in the background (callers get a Future). Rendered audio is cached on
+# disk by a hash of the text and voice settings, with LRU eviction past a size
+# cap, so a repeated phrase is a file read.
+
+# === Configuration ===
+SPEECH_CACHE_DIR = os.getenv("SPEECH_CACHE_DIR", "speech_cache")
+SPEECH_CACHE_MAX_BYTES = int(os.getenv("SPEECH_CACHE_MAX_MB", "256")) * 1024 * 1024
+SPEECH_RATE = int(os.getenv("SPEECH_RATE", "175"))  # Words per minute
+SPEECH_VOICE = os.getenv("SPEECH_VOICE", "")        # pyttsx3 voice id; empty keeps the system default
+SPEECH_MAX_CHARS = 1200
+SUMMARY_INTRO = "Here is your solar assessment summary."
+NO_FINANCIALS = "No financial projection is available for this analysis yet."
+
+# === Summaries ===
+def _spoken_amount(value: float) -> str:
+    # Rounded so that near-identical results share cached audio
+    if value >= 1e7:
+        return f"{value / 1e7:.1f} crore"
+    if value >= 1e5:
+        return f"{value / 1e5:.1f} lakh"
+    return f"{value:,.0f}"
+
+def _plain_text(markdown: str) -> str:
+    text = re.sub(r"[#*_`>|]+", " ", markdown)
+    return re.sub(r"\s+", " ", text).strip()
+
+def summary_text(analysis: str, financials=None) -> str:
+    """A short spoken summary of an assessment and its financial projection"""
+    parts = [SUMMARY_INTRO]
+    system_size = analysis_history.parse_system_size(analysis)
+    panel_type = analysis_history.parse_panel_type(analysis)
+    if system_size is not None:
+        parts.append(f"Recommended system size: {system_size:g} kilowatts"
+                     + (f" of {panel_type} panels." if panel_type else "."))
+    if financials:
+        parts.append(
+            f"Total system cost: {_spoken_amount(financials['total_cost'])} rupees. "
+            f"Annual production: {financials['annual_production_kwh']:,.0f} kilowatt hours. "
+            f"Annual savings: {_spoken_amount(financials['annual_savings'])} rupees. "
+            + (f"Payback period: {financials['roi_years']:.1f} years." if financials['roi_years'] is not None
+               else "The system does not pay for itself at these savings.")
+        )
+    elif system_size is None:
+        parts.append(_plain_text(analysis or "")[:SPEECH_MAX_CHARS])
+    else:
+        parts.append(NO_FINANCIALS)
+    return " ".join(parts)
+
+def audio_format(data: bytes) -> str:
+    """MIME type of rendered audio (macOS' driver writes AIFF whatever the file name)"""
+    return "audio/wav" if data[:4] == b"RIFF" else "audio/aiff"
+
+# === Service ===
+class SpeechService:
+    def __init__(self, cache: blob_store.BlobStore = None, rate: int = SPEECH_RATE, voice: str = SPEECH_VOICE):
+        self.cache = cache or blob_store.BlobStore(SPEECH_CACHE_DIR, SPEECH_CACHE_MAX_BYTES)
+        self.rate = rate
+        self.voice = voice
+        # pyttsx3 engines aren't thread-safe, so a single worker owns the engine
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech")
+        self._engine = None  # Only touched on the worker thread
+        self._lock = threading.Lock()
+        self._pending = {}   # Cache key -> Future, so concurrent requests share one render
+
+    def cache_key(self, text: str) -> str:
+        settings = f"{self.voice}|{self.rate}|{' '.join(text.split())}"
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest() + ".wav"
+
+    def _get_engine(self):
+        if self._engine is None:
+            import pyttsx3  # type: ignore
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self.rate)
+            if self.voice:
+                engine.setProperty("voice", self.voice)
+            self._engine = engine
+        return self._engine
+
+    def _render(self, key: str, text: str) -> bytes:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            engine = self._get_engine()
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                data = f.read()
+        except Exception:
+            self._engine = None  # Start from a fresh engine on the next request
+            raise
+        finally:
+            os.remove(path)
+        if not data:
+            raise RuntimeError("speech engine produced no audio")
+        self.cache.put_named(key, data)
+        return data
+
+    def cached(self, text: str):
+        """Rendered audio for text if it's in the cache, else None"""
+        try:
+            return self.cache.get_bytes(self.cache_key(text))
+        except KeyError:
+            return None
+
+    def speak(self, text: str) -> Future:
+        """Future of WAV bytes for text; already resolved when the audio is cached"""
+        data = self.cached(text)
+        if data is not None:
+            future = Future()
+            future.set_result(data)
+            return future
+        key = self.cache_key(text)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._pending[key] = self._executor.submit(self._render, key, text)
+        # Added outside the lock: the callback runs right away if the render already finished
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def warm(self) -> Future:
+        """Start the engine in the background so the first summary doesn't wait on it"""
+        # Audio is cached per whole summary, so pre-rendering stock phrases on their own wouldn't be reused
+        return self._executor.submit(self._get_engine)
+
+# === Command Line ===
+def main(argv=None, prog=None) -> int:
+    parser = argparse.ArgumentParser(prog=prog, description="Render text to a WAV file through the speech cache")
+    parser.add_argument("text", help="Text to speak, or - to read it from stdin")
+    parser.add_argument("--output", default="speech.wav")
+    args = parser.parse_args(argv)
+
+    text = sys.stdin.read() if args.text == "-" else args.text
+    data = SpeechService().speak(text).result()
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"Wrote {len(data):,} bytes to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+from functools import lru_cache
+
+import numpy as np  # type: ignore
+
+# Hourly billing for one or many customers at once. Profiles are 8760-length
+# kWh arrays, or (customers, 8760) arrays; every calculation is vectorized
+# over customers and hours.
+
+HOURS_PER_YEAR = 8760
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# === Calendar ===
+@lru_cache(maxsize=None)
+def hourly_calendar(first_weekday: int = 0):
+    """Hour-of-day, month and weekend flag for each hour of a 365-day year"""
+    hours = np.arange(HOURS_PER_YEAR)
+    day = hours // 24
+    month = np.repeat(np.arange(12), np.array(DAYS_PER_MONTH) * 24)
+    weekend = (day + first_weekday) % 7 >= 5
+    return hours % 24, month, weekend
+
+@lru_cache(maxsize=None)
+def day_class_matrix():
+    """(365, 24) indicator mapping each day to its (month, weekend) class"""
+    _, month, weekend = hourly_calendar()
+    day_class = month[::24] * 2 + weekend[::24]
+    return (day_class[:, None] == np.arange(24)).astype(np.float64)
+
+def calendar_totals(hourly):
+    """Reduce hourly values (..., 8760) to totals by hour of day, month and weekend (..., 24, 12, 2)
+
+    Every tariff here prices energy by hour of day and weekday/weekend, so
+    these totals are all billing needs; the hourly array is read once and
+    each tariff is then priced from 576 numbers per customer.
+    """
+    hourly = np.asarray(hourly, dtype=np.float64)
+    days = hourly.reshape(*hourly.shape[:-1], 365, 24)
+    totals = np.tensordot(days, day_class_matrix(), axes=([-2], [0]))
+    return totals.reshape(*hourly.shape[:-1], 24, 12, 2)
+
+def monthly_totals(totals, rate_table=None):
+    """Monthly kWh (or value, given a (24, 2) rate table) from calendar_totals (..., 12)"""
+    if rate_table is None:
+        return totals.sum(axis=(-3, -1))
+    return np.tensordot(totals, rate_table, axes=([-3, -1], [0, 1]))
+
+# === Tariffs ===
+class Tariff:
+    def __init__(self, name, energy_rate=None, tou_rates=None, weekend_tou_rates=None, tiers=None,
+                 export_rate=0.0, net_metering=False, fixed_monthly_charge=0.0):
+        """Retail tariff
+
+        energy_rate: flat price per kWh.
+        tou_rates / weekend_tou_rates: 24 prices per kWh by hour of day.
+        tiers: [(monthly_kwh_up_to, rate), ...] with None as the last limit;
+            applied to monthly imports instead of the hourly rates.
+        export_rate: price paid per exported kWh (feed-in), and for leftover
+            net-metering credit at the end of the year.
+        net_metering: exports offset imports at the retail rate, with monthly
+            credit rolled over until the annual true-up.
+        """
+        if energy_rate is None and tou_rates is None and tiers is None:
+            raise ValueError("Tariff needs energy_rate, tou_rates or tiers")
+        self.name = name
+        self.energy_rate = energy_rate
+        self.tou_rates = tou_rates
+        self.weekend_tou_rates = weekend_tou_rates
+        self.tiers = tiers
+        self.export_rate = export_rate
+        self.net_metering = net_metering
+        self.fixed_monthly_charge = fixed_monthly_charge
+        self._rate_table = None
+
+    def without_export_credit(self):
+        """Copy of this tariff under which exports earn nothing, e.g. for a system without net metering"""
+        if not self.net_metering and not self.export_rate:
+            return self
+        return Tariff(f"{self.name} (exports not credited)", self.energy_rate, self.tou_rates,
+                      self.weekend_tou_rates, self.tiers, 0.0, False, self.fixed_monthly_charge)
+
+    def key(self):
+        """Hashable terms of the tariff, so equal tariffs built separately can be billed together"""
+        def frozen(values):
+            return None if values is None else tuple(np.asarray(values, dtype=np.float64).tolist())
+        tiers = None if self.tiers is None else tuple(tuple(tier) for tier in self.tiers)
+        return (self.name, self.energy_rate, frozen(self.tou_rates), frozen(self.weekend_tou_rates), tiers,
+                self.export_rate, self.net_metering, self.fixed_monthly_charge)
+
+    def rate_table(self):
+        """Retail price by hour of day (rows) for weekdays and weekends (columns)"""
+        if self._rate_table is None:
+            if self.tou_rates is None:
+                table = np.full((24, 2), self.energy_rate or 0.0, dtype=np.float64)
+            else:
+                weekday = np.asarray(self.tou_rates, dtype=np.float64)
+                weekend = weekday if self.weekend_tou_rates is None else np.asarray(self.weekend_tou_rates, dtype=np.float64)
+                table = np.stack([weekday, weekend], axis=1)
+            self._rate_table = table
+        return self._rate_table
+
+    def hourly_rates(self):
+        """Retail price for each hour of the year"""
+        hour_of_day, _, weekend = hourly_calendar()
+        return self.rate_table()[hour_of_day, weekend.astype(int)]
+
+    def tiered_charge(self, monthly_kwh):
+        """Charge for monthly imports (..., 12) under the tier blocks"""
+        charge = np.zeros_like(monthly_kwh, dtype=np.float64)
+        lower = 0.0
+        for upper, rate in self.tiers:
+            block = monthly_kwh - lower if upper is None else np.clip(monthly_kwh, lower, upper) - lower
+            charge += np.maximum(block, 0) * rate
+            if upper is None:
+                break
+            lower = upper
+        return charge
+
+def preset_tariffs(electricity_rate: float):
+    """Example tariff designs around a given average retail rate"""
+    peak_hours = np.zeros(24)
+    peak_hours[17:22] = 1
+    tou = np.where(peak_hours, electricity_rate * 1.6, electricity_rate * 0.8)
+    return {
+        "Flat rate, net metering": Tariff("Flat rate, net metering", energy_rate=electricity_rate,
+                                          export_rate=electricity_rate * 0.5, net_metering=True),
+        "Flat rate, export at 50%": Tariff("Flat rate, export at 50%", energy_rate=electricity_rate,
+                                           export_rate=electricity_rate * 0.5),
+        "Time-of-use (peak 17-22h), net metering": Tariff(
+            "Time-of-use (peak 17-22h), net metering", tou_rates=tou,
+            weekend_tou_rates=np.full(24, electricity_rate * 0.8),
+            export_rate=electricity_rate * 0.5, net_metering=True),
+        "Time-of-use (peak 17-22h), export at 30%": Tariff(
+            "Time-of-use (peak 17-22h), export at 30%", tou_rates=tou,
+            weekend_tou_rates=np.full(24, electricity_rate * 0.8), export_rate=electricity_rate * 0.3),
+        "Tiered, net metering": Tariff("Tiered, net metering",
+                                       tiers=[(100, electricity_rate * 0.7), (300, electricity_rate),
+                                              (None, electricity_rate * 1.4)],
+                                       export_rate=electricity_rate * 0.5, net_metering=True),
+    }
+
+# === Profiles ===
+@lru_cache(maxsize=None)
+def production_shape(latitude: float = 20.0):
+    """Normalized hourly PV production (sums to 1 over the year)
+
+    A clear-sky approximation: a half-sine between sunrise and sunset whose day
+    length and height follow the season at the given latitude.
+    """
+    hour_of_day, _, _ = hourly_calendar()
+    day = np.arange(HOURS_PER_YEAR) // 24
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (day - 80) / 365)
+    lat = np.radians(latitude)
+    cos_hour_angle = np.clip(-np.tan(lat) * np.tan(declination), -1, 1)
+    half_day = np.degrees(np.arccos(cos_hour_angle)) / 15
+    solar_time = hour_of_day + 0.5 - 12
+    daylight = np.abs(solar_time) < half_day
+    elevation = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(np.radians(15 * solar_time))
+    shape = np.where(daylight, np.maximum(elevation, 0), 0)
+    return shape / shape.sum()
+
+@lru_cache(maxsize=None)
+def load_shape():
+    """Normalized hourly residential consumption (sums to 1 over the year)"""
+    hour_of_day, month, weekend = hourly_calendar()
+    daily = np.array([0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.8, 1.1, 1.0, 0.8, 0.7, 0.7,
+                      0.7, 0.7, 0.7, 0.8, 1.0, 1.3, 1.6, 1.7, 1.5, 1.2, 0.9, 0.7])[hour_of_day]
+    seasonal = 1 + 0.2 * np.cos(2 * np.pi * (month - 6) / 12)  # Summer cooling peak
+    shape = daily * seasonal * np.where(weekend, 1.1, 1.0)
+    return shape / shape.sum()
+
+def production_profile(system_size_kw, sun_hours, latitude: float = 20.0):
+    """Hourly kWh for one system, or (customers, 8760) for an array of sizes"""
+    annual_kwh = np.asarray(system_size_kw, dtype=np.float64) * sun_hours * 365
+    return np.multiply.outer(annual_kwh, production_shape(latitude))
+
+def load_profile(annual_kwh):
+    """Hourly kWh for one customer, or (customers, 8760) for an array of annual totals"""
+    return np.multiply.outer(np.asarray(annual_kwh, dtype=np.float64), load_shape())
+
+# === Billing ===
+def hourly_flows(production, load):
+    """Grid import/export totals for production and load profiles, ready for billing"""
+    production = np.asarray(production, dtype=np.float64)
+    load = np.asarray(load, dtype=np.float64)
+    net = load - production
+    imports = np.maximum(net, 0)
+    exports = np.subtract(imports, net, out=net)  # max(-net, 0) without another temporary
+    flows = {
+        "load": calendar_totals(load),
+        "imports": calendar_totals(imports),
+        "exports": calendar_totals(exports),
+    }
+    flows["annual_import_kwh"] = flows["imports"].sum(axis=(-3, -2, -1))
+    flows["annual_export_kwh"] = flows["exports"].sum(axis=(-3, -2, -1))
+    flows["self_consumption_kwh"] = flows["load"].sum(axis=(-3, -2, -1)) - flows["annual_import_kwh"]
+    return flows
+
+def simulate_bills(production, load, tariff: Tariff, flows=None):
+    """Bills with and without solar for one or many customers
+
+    production and load are hourly kWh arrays of shape (8760,) or (customers, 8760).
+    Pass precomputed hourly_flows() to bill the same customers under several tariffs.
+    Returns annual figures with shape () or (customers,) plus (..., 12) monthly bills.
+    """
+    flows = flows or hourly_flows(production, load)
+    monthly_bill = _bill(tariff, flows["imports"], flows["exports"])
+    annual_bill = monthly_bill.sum(axis=-1)
+    annual_bill_without = _bill(tariff, flows["load"], None).sum(axis=-1)
+    return {
+        "annual_bill": annual_bill,
+        "annual_bill_without_solar": annual_bill_without,
+        "annual_savings": annual_bill_without - annual_bill,
+        "monthly_bill": monthly_bill,
+        "annual_import_kwh": flows["annual_import_kwh"],
+        "annual_export_kwh": flows["annual_export_kwh"],
+        "self_consumption_kwh": flows["self_consumption_kwh"],
+    }
+
+def _bill(tariff: Tariff, imports, exports):
+    """Monthly bills (..., 12) from calendar totals of imports and exports (None for no exports)"""
+    fixed = tariff.fixed_monthly_charge
+    if tariff.tiers is not None:
+        monthly_imports = monthly_totals(imports)
+        monthly_exports = monthly_totals(exports) if exports is not None else 0.0
+        if not tariff.net_metering:
+            return tariff.tiered_charge(monthly_imports) - monthly_exports * tariff.export_rate + fixed
+        # Tiered net metering nets kWh per month and rolls surplus kWh forward
+        billed_kwh, leftover_kwh = _roll_forward(monthly_imports - monthly_exports)
+        monthly = tariff.tiered_charge(billed_kwh) + fixed
+        monthly[..., -1] -= leftover_kwh * tariff.export_rate
+        return monthly
+
+    rates = tariff.rate_table()
+    charges = monthly_totals(imports, rates)
+    if exports is None:
+        return charges + fixed
+    if not tariff.net_metering:
+        # Exports earn the feed-in rate only
+        return charges - monthly_totals(exports) * tariff.export_rate + fixed
+
+    # Flat/TOU net metering credits exports at the hourly retail rate and rolls
+    # surplus credit forward; credit left at the annual true-up is converted back
+    # to kWh at the average retail rate and paid at the export rate
+    billed, leftover_value = _roll_forward(charges - monthly_totals(exports, rates))
+    monthly = billed + fixed
+    average_rate = tariff.hourly_rates().mean()
+    if average_rate > 0:
+        monthly[..., -1] -= leftover_value / average_rate * tariff.export_rate
+    return monthly
+
+def _roll_forward(monthly_net):
+    """Carry negative monthly balances into later months; returns (billed, leftover credit)"""
+    billed = np.empty_like(monthly_net)
+    credit = np.zeros(monthly_net.shape[:-1])
+    for m in range(12):
+        balance = monthly_net[..., m] - credit
+        billed[..., m] = np.maximum(balance, 0)
+        credit = np.maximum(-balance, 0)
+    return billed, credit
+
+# === Portfolio Studies ===
+def portfolio_study(system_sizes_kw, annual_loads_kwh, sun_hours, tariffs, latitude: float = 20.0,
+                    chunk_size: int = 500):
+    """Annual bills for many customers under several tariffs
+
+    Customers are described by system size and annual consumption; hourly
+    profiles are built from the shared shapes one chunk at a time, so memory
+    stays at chunk_size x 8760 regardless of portfolio size.
+    Returns {tariff name: {metric: (customers,) array}}.
+    """
+    system_sizes_kw = np.asarray(system_sizes_kw, dtype=np.float64)
+    annual_loads_kwh = np.asarray(annual_loads_kwh, dtype=np.float64)
+    sun_hours = np.broadcast_to(np.asarray(sun_hours, dtype=np.float64), system_sizes_kw.shape)
+    metrics = ("annual_bill", "annual_bill_without_solar", "annual_savings",
+               "annual_import_kwh", "annual_export_kwh", "self_consumption_kwh")
+    results = {t.name: {m: np.empty(len(system_sizes_kw)) for m in metrics} for t in tariffs}
+    shape = production_shape(latitude)
+    for start in range(0, len(system_sizes_kw), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        production = np.multiply.outer(system_sizes_kw[chunk] * sun_hours[chunk] * 365, shape)
+        load = load_profile(annual_loads_kwh[chunk])
+        flows = hourly_flows(production, load)
+        for tariff in tariffs:
+            bills = simulate_bills(production, load, tariff, flows=flows)
+            for metric in metrics:
+                results[tariff.name][metric][chunk] = bills[metric]
+    return results
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import date, datetime
+from functools import lru_cache
+
+import tariff_billing
+
+# Streaming ingestion of inverter/meter telemetry. Records are folded into
+# per-site accumulators as they arrive: the open day's energy and the model's
+# expectation for the same intervals, plus a fixed window of closed days. Memory
+# is constant per site however long the stream runs, and sites whose rolling
+# performance ratio falls below the threshold are flagged as underperforming.
+
+# === Configuration ===
+TELEMETRY_INTERVAL_MIN = float(os.getenv("TELEMETRY_INTERVAL_MIN", "15"))
+TELEMETRY_WINDOW_DAYS = int(os.getenv("TELEMETRY_WINDOW_DAYS", "14"))
+TELEMETRY_PR_THRESHOLD = float(os.getenv("TELEMETRY_PR_THRESHOLD", "0.75"))
+TELEMETRY_MIN_DAYS = 3           # Closed days needed before a site can be flagged
+TELEMETRY_MIN_COVERAGE = 0.5     # Days with less of their expected yield reported are left out
+DEFAULT_SUN_HOURS = 4.5
+DEFAULT_LATITUDE = 20.0
+
+# === Expectation ===
+@lru_cache(maxsize=None)
+def _hourly_shape(latitude: int):
+    """(365 days x 24 hours) production shape as nested lists for cheap per-record indexing"""
+    return tariff_billing.production_shape(latitude).reshape(365, 24).tolist()
+
+class Site:
+    """An installation being monitored
+
+    Its expectation is the same hourly simulation calculate_financials bills
+    against: annual yield system_size_kw x sun_hours x 365, shaped by latitude
+    over local hours. utc_offset_hours places UTC timestamps (epoch seconds,
+    or ISO strings with Z or an offset) on that local day.
+    """
+
+    def __init__(self, site_id: str, system_size_kw: float, sun_hours: float = DEFAULT_SUN_HOURS,
+                 latitude: float = DEFAULT_LATITUDE, utc_offset_hours: float = 0.0):
+        self.site_id = site_id
+        self.system_size_kw = system_size_kw
+        self.sun_hours = sun_hours
+        self.latitude = latitude
+        self.utc_offset_hours = utc_offset_hours
+        self.utc_offset_seconds = utc_offset_hours * 3600
+        self.annual_kwh = system_size_kw * sun_hours * 365
+
+    def expected_hourly(self, day: str):
+        """Expected kWh for each hour of a YYYY-MM-DD day"""
+        day_of_year = min(date.fromisoformat(day).timetuple().tm_yday - 1, 364)  # Leap days reuse Dec 30
+        shape = _hourly_shape(int(round(self.latitude)))[day_of_year]
+        return [self.annual_kwh * fraction for fraction in shape]
+
+def load_sites(path: str):
+    """Sites from a CSV or JSON-lines file with site_id, system_size_kw and optional
+    sun_hours/latitude/longitude/utc_offset
+
+    Sites with coordinates but no sun_hours take them from the region index when
+    one is built. utc_offset is in hours (e.g. 5.5); without it the offset is
+    local solar time from the longitude, or UTC when there's no longitude.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()] if path.endswith((".jsonl", ".json")) \
+            else list(csv.DictReader(f))
+    sites = {}
+    for row in rows:
+        latitude = float(row["latitude"]) if row.get("latitude") not in (None, "") else None
+        longitude = float(row["longitude"]) if row.get("longitude") not in (None, "") else None
+        sun_hours = float(row["sun_hours"]) if row.get("sun_hours") not in (None, "") else None
+        if sun_hours is None and latitude is not None and longitude is not None:
+            import geo_index
+            region = geo_index.lookup(latitude, longitude)
+            sun_hours = region.get("sun_hours") if region else None
+        utc_offset = float(row["utc_offset"]) if row.get("utc_offset") not in (None, "") else \
+            longitude / 15 if longitude is not None else 0.0
+        site_id = str(row["site_id"])
+        sites[site_id] = Site(site_id, float(row["system_size_kw"]), sun_hours or DEFAULT_SUN_HOURS,
+                              DEFAULT_LATITUDE if latitude is None else latitude, utc_offset)
+    return sites
+
+# === Rolling Aggregates ===
+class _SiteState:
+    __slots__ = ("site", "day", "closed_day", "day_kwh", "day_expected_kwh", "day_full_expected_kwh",
+                 "day_samples", "expected_hourly", "meter_kwh", "history", "window_kwh", "window_expected_kwh",
+                 "late_records")
+
+    def __init__(self, site: Site, window_days: int):
+        self.site = site
+        self.day = None         # Open day, None before the first record and after flush()
+        self.closed_day = None  # Most recently closed day
+        self.day_kwh = 0.0
+        self.day_expected_kwh = 0.0
+        self.day_full_expected_kwh = 0.0
+        self.day_samples = 0
+        self.expected_hourly = None
+        self.meter_kwh = None
+        self.history = deque(maxlen=window_days)  # (day, kWh, expected kWh) per closed day
+        self.window_kwh = 0.0
+        self.window_expected_kwh = 0.0
+        self.late_records = 0
+
+def _split_timestamp(value, utc_offset_seconds: float = 0.0):
+    """Local (YYYY-MM-DD, hour) from an ISO 8601 string or epoch seconds
+
+    ISO strings without a zone are already local and taken as-is; epoch seconds
+    and zoned ISO strings are UTC instants shifted by the site's offset.
+    """
+    if isinstance(value, str) and value[4:5] == "-":
+        if not (len(value) > 19 and (value[-1] in "Zz" or value[-6] in "+-")):
+            return value[:10], int(value[11:13]) if len(value) > 12 else 0
+        seconds = datetime.fromisoformat(value.replace("Z", "+00:00").replace("z", "+00:00")).timestamp()
+    else:
+        seconds = float(value)
+    seconds += utc_offset_seconds
+    return time.strftime("%Y-%m-%d", time.gmtime(seconds)), int(seconds % 86400) // 3600
+
+class TelemetryMonitor:
+    """Constant-memory rolling production aggregates and underperformance flags per site
+
+    Feed records with add(); each carries a site id, a timestamp and one of
+    energy_kwh (interval energy), power_kw (mean power over the interval) or
+    meter_kwh (a cumulative register). irradiance_wm2, when present, gives the
+    IEC 61724 performance ratio against measured plane-of-array irradiance
+    instead of the modelled expectation. Only records for a site's open day or
+    later are accepted; older ones are counted as late and dropped.
+    """
+
+    def __init__(self, sites, interval_minutes: float = TELEMETRY_INTERVAL_MIN,
+                 window_days: int = TELEMETRY_WINDOW_DAYS, threshold: float = TELEMETRY_PR_THRESHOLD):
+        self.sites = sites
+        self.interval_hours = interval_minutes / 60
+        self.window_days = window_days
+        self.threshold = threshold
+        self.records = 0
+        self.unknown_site_records = 0
+        self.latest_day = None
+        self._states = {}
+
+    def _state(self, site_id):
+        state = self._states.get(site_id)
+        if state is None:
+            site = self.sites.get(site_id)
+            if site is None:
+                return None
+            state = self._states[site_id] = _SiteState(site, self.window_days)
+        return state
+
+    def _close_day(self, state: _SiteState):
+        if state.day is None:
+            return
+        state.closed_day = state.day
+        # Days with large reporting gaps would read as underperformance, so they only count
+        # when most of the expected yield was covered by records
+        if state.day_full_expected_kwh and state.day_expected_kwh >= TELEMETRY_MIN_COVERAGE * state.day_full_expected_kwh:
+            if len(state.history) == state.history.maxlen:
+                _, kwh, expected = state.history[0]
+                state.window_kwh -= kwh
+                state.window_expected_kwh -= expected
+            state.history.append((state.day, state.day_kwh, state.day_expected_kwh))
+            state.window_kwh += state.day_kwh
+            state.window_expected_kwh += state.day_expected_kwh
+
+    def add(self, site_id, timestamp, energy_kwh=None, power_kw=None, meter_kwh=None, irradiance_wm2=None):
+        """Fold one telemetry record into its site's aggregates"""
+        state = self._state(site_id)
+        if state is None:
+            self.unknown_site_records += 1
+            return
+        day, hour = _split_timestamp(timestamp, state.site.utc_offset_seconds)
+        if day != state.day:
+            if (state.day is not None and day < state.day) or \
+                    (state.closed_day is not None and day <= state.closed_day):
+                state.late_records += 1
+                return
+            self._close_day(state)
+            state.day = day
+            state.day_kwh = state.day_expected_kwh = 0.0
+            state.day_samples = 0
+            state.expected_hourly = state.site.expected_hourly(day)
+            state.day_full_expected_kwh = sum(state.expected_hourly)
+            if self.latest_day is None or day > self.latest_day:
+                self.latest_day = day
+
+        if energy_kwh is None:
+            if power_kw is not None:
+                energy_kwh = power_kw * self.interval_hours
+            elif meter_kwh is not None:
+                previous, state.meter_kwh = state.meter_kwh, meter_kwh
+                # The first reading and register resets only set the baseline
+                energy_kwh = meter_kwh - previous if previous is not None and meter_kwh >= previous else 0.0
+            else:
+                energy_kwh = 0.0
+        state.day_kwh += energy_kwh
+        state.day_samples += 1
+        if irradiance_wm2 is not None:
+            expected = state.site.system_size_kw * irradiance_wm2 / 1000 * self.interval_hours
+        else:
+            expected = state.expected_hourly[hour] * self.interval_hours
+        state.day_expected_kwh += expected
+        self.records += 1
+
+    def flush(self):
+        """Close every site's open day (call at the end of a finite stream)
+
+        Records that arrive afterwards for a closed day are counted as late.
+        """
+        for state in self._states.values():
+            self._close_day(state)
+            state.day = None
+            state.expected_hourly = None
+            state.day_kwh = state.day_expected_kwh = state.day_full_expected_kwh = 0.0
+            state.day_samples = 0
+
+    def summary(self, site_id: str):
+        state = self._states.get(site_id)
+        if state is None:
+            return {"site_id": site_id, "status": "no data"}
+        days = len(state.history)
+        last_day = state.day or state.closed_day
+        performance_ratio = state.window_kwh / state.window_expected_kwh if state.window_expected_kwh else None
+        if last_day is not None and self.latest_day and last_day < self.latest_day and \
+                (date.fromisoformat(self.latest_day) - date.fromisoformat(last_day)).days > 1:
+            status = "silent"
+        elif days < TELEMETRY_MIN_DAYS or performance_ratio is None:
+            status = "insufficient data"
+        elif performance_ratio < self.threshold:
+            status = "underperforming"
+        else:
+            status = "ok"
+        last = state.history[-1] if state.history else None
+        return {
+            "site_id": site_id,
+            "status": status,
+            "days": days,
+            "last_day": last_day,
+            "last_day_kwh": last[1] if last else None,
+            "mean_daily_kwh": state.window_kwh / days if days else None,
+            "performance_ratio": performance_ratio,
+            "late_records": state.late_records,
+        }
+
+    def report(self):
+        """Summaries for every known site, worst performance ratio first"""
+        summaries = [self.summary(site_id) for site_id in self.sites]
+        return sorted(summaries, key=lambda s: (s.get("performance_ratio") is None, s.get("performance_ratio") or 0))
+
+    def underperforming(self):
+        return [s for s in self.report() if s["status"] in ("underperforming", "silent")]
+
+# === Readers ===
+def _number(value):
+    return None if value in (None, "") else float(value)
+
+def ingest(monitor: TelemetryMonitor, stream, fmt: str = "csv"):
+    """Feed a text stream of CSV (with header) or JSON-lines records into the monitor; returns records read"""
+    count = 0
+    add = monitor.add
+    if fmt == "jsonl":
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            add(str(record["site_id"]), record["timestamp"], _number(record.get("energy_kwh")),
+                _number(record.get("power_kw")), _number(record.get("meter_kwh")),
+                _number(record.get("irradiance_wm2")))
+            count += 1
+        return count
+
+    reader = csv.reader(stream)
+    header = next(reader)
+    columns = {name.strip(): i for i, name in enumerate(header)}
+    site_col, time_col = columns["site_id"], columns["timestamp"]
+    optional = [columns.get(name) for name in ("energy_kwh", "power_kw", "meter_kwh", "irradiance_wm2")]
+    for row in reader:
+        if not row:
+            continue
+        values = [_number(row[i]) if i is not None and i < len(row) else None for i in optional]
+        add(row[site_col], row[time_col], *values)
+        count += 1
+    return count
+
+def ingest_file(monitor: TelemetryMonitor, path: str, fmt=None):
+    """Ingest a telemetry file ("-" for stdin); the format follows the extension unless given"""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    if path == "-":
+        return ingest(monitor, io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline=""), fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        return ingest(monitor, f, fmt)
+
+# === Command Line ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest inverter/meter telemetry and flag underperforming sites")
+    parser.add_argument("sites", help="CSV or JSON-lines file with site_id, system_size_kw, sun_hours, latitude, "
+                                      "longitude, utc_offset")
+    parser.add_argument("telemetry", nargs="+", help="CSV or JSON-lines telemetry files, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Telemetry format (default: from extension)")
+    parser.add_argument("--interval-minutes", type=float, default=TELEMETRY_INTERVAL_MIN)
+    parser.add_argument("--window-days", type=int, default=TELEMETRY_WINDOW_DAYS)
+    parser.add_argument("--threshold", type=float, default=TELEMETRY_PR_THRESHOLD, help="Flag sites below this ratio")
+    parser.add_argument("--all", action="store_true", help="Report every site, not just flagged ones")
+    args = parser.parse_args()
+
+    monitor = TelemetryMonitor(load_sites(args.sites), args.interval_minutes, args.window_days, args.threshold)
+    start = time.perf_counter()
+    for path in args.telemetry:
+        ingest_file(monitor, path, args.format)
+    monitor.flush()
+    elapsed = time.perf_counter() - start
+    for summary in (monitor.report() if args.all else monitor.underperforming()):
+        print(json.dumps(summary))
+    print(f"{monitor.records} records from {len(monitor._states)} sites in {elapsed:.1f}s "
+          f"({monitor.records / max(elapsed, 1e-9):,.0f} records/s); "
+          f"{monitor.unknown_site_records} records for unknown sites", file=sys.stderr)
@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+import blob_store
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), max_bytes=1 << 20)
+    first = store.put_bytes(b"roof" * 100)
+    second = store.put_bytes(b"roof" * 100)
+    assert first == second
+    assert store.size_bytes == 400
+    assert store.get_bytes(first) == b"roof" * 100
+
+def test_least_recently_used_blobs_are_evicted_past_the_cap(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), max_bytes=1000)
+    keys = [store.put_bytes(bytes([i]) * 300) for i in range(3)]
+    store.get_bytes(keys[0])  # Now the most recently used
+    newest = store.put_bytes(b"\xff" * 300)
+    assert keys[1] not in store
+    with pytest.raises(KeyError):
+        store.get_bytes(keys[1])
+    assert all(key in store for key in (keys[0], keys[2], newest))
+    assert store.size_bytes == 900
+
+def test_reopening_restores_contents_and_size(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), max_bytes=1 << 20)
+    keys = [store.put_bytes(os.urandom(100 + i)) for i in range(5)]
+    reopened = blob_store.BlobStore(str(tmp_path), max_bytes=1 << 20)
+    assert reopened.size_bytes == store.size_bytes
+    assert all(reopened.get_bytes(key) == store.get_bytes(key) for key in keys)
+
+def test_concurrent_writes_of_one_blob_count_it_once(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), max_bytes=1 << 20)
+    barrier = threading.Barrier(8)
+
+    def write():
+        barrier.wait()
+        store.put_bytes(b"same" * 1000)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.size_bytes == 4000
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+def test_images_round_trip_losslessly_with_cached_thumbnails(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), max_bytes=1 << 24)
+    image = Image.new("RGB", (1200, 800))
+    image.putpixel((5, 7), (10, 20, 30))
+    key = store.put_image(image)
+    assert store.open_image(key).tobytes() == image.tobytes()
+
+    thumb = store.thumbnail(key, size=300)
+    assert f"{key}.thumb300.jpg" in store
+    assert store.thumbnail(key, size=300) == thumb
@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import time
+
+import fs_inventory
+
+HOUR_NS = 3600 * 10 ** 9
+
+def _age(*directories, offset_ns=0):
+    """Backdate directories so their listings are outside the racy window and can be reused"""
+    mtime = time.time_ns() - HOUR_NS + offset_ns
+    for directory in directories:
+        os.utime(directory, ns=(mtime, mtime))
+
+def _tree(root):
+    for directory in ("a/b", "a/c", "d"):
+        os.makedirs(root / directory)
+    for name in ("top.txt", "a/one.txt", "a/b/two.txt", "a/c/three.txt", "d/four.txt"):
+        (root / name).write_text(name)
+    _age(*(directory for directory, _, _ in os.walk(root)))
+
+def _scan(root, index, **options):
+    out = io.StringIO()
+    stats = fs_inventory.scan(str(root), index, out, workers=4, excludes=(), **options)
+    return stats, [json.loads(line) for line in out.getvalue().splitlines()]
+
+def _walk(root):
+    paths = set()
+    for directory, subdirs, files in os.walk(root):
+        paths.add(directory)
+        paths.update(os.path.join(directory, name) for name in files)
+    return paths
+
+def test_rescans_reuse_unchanged_listings_and_report_the_same_tree(tmp_path):
+    root = tmp_path / "tree"
+    _tree(root)
+    index = fs_inventory.InventoryIndex(str(tmp_path / "index.db"))
+    try:
+        first_stats, first = _scan(root, index)
+        assert {entry["path"] for entry in first} == _walk(str(root))
+        assert first_stats["listed"] == first_stats["directories"] == 5
+
+        second_stats, second = _scan(root, index)
+        assert second_stats["reused"] == 5 and second_stats["listed"] == 0
+        assert sorted(second, key=lambda e: e["path"]) == sorted(first, key=lambda e: e["path"])
+    finally:
+        index.close()
+
+def test_changes_only_reports_additions_and_deletions(tmp_path):
+    root = tmp_path / "tree"
+    _tree(root)
+    index = fs_inventory.InventoryIndex(str(tmp_path / "index.db"))
+    try:
+        _scan(root, index)
+        (root / "a" / "new.txt").write_text("new")
+        (root / "a" / "b" / "two.txt").unlink()
+        os.rmdir(root / "a" / "b")
+        (root / "d" / "four.txt").unlink()
+        _age(root / "a", root / "d", offset_ns=10 ** 9)
+
+        stats, changes = _scan(root, index, changes_only=True)
+        reported = {(os.path.relpath(e["path"], root), e["change"]) for e in changes}
+        # The removed directory is reported once, not file by file
+        assert reported == {("a/new.txt", "added"), ("a/b", "deleted"), ("d/four.txt", "deleted")}
+        assert stats["listed"] == 2 and stats["reused"] == 2
+
+        _, again = _scan(root, index, changes_only=True)
+        assert again == []
+    finally:
+        index.close()
+
+def test_missing_root_is_reported(tmp_path):
+    index = fs_inventory.InventoryIndex(str(tmp_path / "index.db"))
+    try:
+        stats, lines = _scan(tmp_path / "missing", index)
+    finally:
+        index.close()
+    assert lines == [] and stats["root_error"]
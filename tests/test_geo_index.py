@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+
+import geo_index
+
+def _square(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+def _feature(geometry_type, coordinates, **properties):
+    return {"type": "Feature", "geometry": {"type": geometry_type, "coordinates": coordinates},
+            "properties": properties}
+
+@pytest.fixture
+def index(tmp_path):
+    features = [
+        _feature("Polygon", [_square(0, 0, 10, 10)], name="Country", level="country", country="Testland",
+                 electricity_rate=8.0, sun_hours=5.0, incentives={"Subsidy": "30%"},
+                 compliance_rules={"net_metering": True}),
+        # A state with a hole in the middle: the hole belongs to the country only
+        _feature("Polygon", [_square(0, 0, 5, 5), _square(2, 2, 3, 3)], name="State", level="state",
+                 electricity_rate=9.0, compliance_rules={"max_residential_kw": 10}),
+        _feature("MultiPolygon", [[_square(6, 6, 7, 7)], [_square(8, 8, 9, 9)]], name="Islands",
+                 level="utility", tariff="Time-of-use", incentives={"Rebate": "5%"}),
+    ]
+    # Enough small cells that the R-tree has more than one level
+    for i in range(30):
+        for j in range(30):
+            west, south = 20 + i * 0.5, 20 + j * 0.5
+            features.append(_feature("Polygon", [_square(west, south, west + 0.5, south + 0.5)],
+                                     name=f"cell-{i}-{j}", level="municipality"))
+    geojson = tmp_path / "regions.geojson"
+    geojson.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    path = str(tmp_path / "regions.idx")
+    geo_index.build_index(str(geojson), path)
+    index = geo_index.GeoIndex(path)
+    yield index
+    index.close()
+
+def test_finer_regions_override_coarser_ones(index):
+    result = index.lookup(lat=1.0, lon=1.0)
+    assert result["regions"] == {"country": "Country", "state": "State"}
+    assert result["electricity_rate"] == 9.0
+    assert result["sun_hours"] == 5.0
+    assert result["incentives"] == {"Subsidy": "30%"}
+    assert result["compliance_rules"] == {"net_metering": True, "max_residential_kw": 10}
+
+def test_holes_and_multipolygons(index):
+    assert index.lookup(lat=2.5, lon=2.5)["regions"] == {"country": "Country"}
+    for lat, lon in ((6.5, 6.5), (8.5, 8.5)):
+        result = index.lookup(lat=lat, lon=lon)
+        assert result["regions"] == {"country": "Country", "utility": "Islands"}
+        assert result["incentives"] == {"Subsidy": "30%", "Rebate": "5%"}
+    assert index.lookup(lat=7.5, lon=7.5)["regions"] == {"country": "Country"}
+
+def test_points_resolve_to_their_cell(index):
+    rng = np.random.default_rng(3)
+    for lon, lat in rng.uniform(20.01, 34.99, (200, 2)):
+        if min((lon - 20) % 0.5, (lat - 20) % 0.5) < 1e-6:
+            continue  # On a shared edge
+        expected = f"cell-{int((lon - 20) // 0.5)}-{int((lat - 20) // 0.5)}"
+        assert index.lookup(lat, lon)["regions"] == {"municipality": expected}
+    assert index.lookup(lat=-5.0, lon=-5.0)["regions"] == {}
+
+def test_missing_or_foreign_index_files(tmp_path):
+    assert geo_index.lookup(1.0, 1.0, str(tmp_path / "missing.idx")) is None
+    other = tmp_path / "other.idx"
+    other.write_bytes(b"\0" * geo_index._HEADER.size)
+    with pytest.raises(ValueError):
+        geo_index.GeoIndex(str(other))
+
+def test_unknown_level_is_rejected(tmp_path):
+    geojson = tmp_path / "bad.geojson"
+    geojson.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        _feature("Polygon", [_square(0, 0, 1, 1)], name="Somewhere", level="galaxy")]}))
+    with pytest.raises(ValueError):
+        geo_index.build_index(str(geojson), str(tmp_path / "bad.idx"))
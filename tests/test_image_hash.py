@@ -0,0 +1,63 @@
+import io
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_hash
+
+def _roof(seed, size=512):
+    """Smooth synthetic aerial-looking image"""
+    rng = np.random.default_rng(seed)
+    coarse = Image.fromarray(rng.integers(0, 256, (12, 12, 3), dtype=np.uint8))
+    return coarse.resize((size, size), Image.BICUBIC)
+
+def _reencoded(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+@pytest.mark.parametrize("hash_function", [image_hash.phash, image_hash.dhash])
+def test_edits_of_one_roof_are_near_duplicates_and_other_roofs_are_not(hash_function):
+    roof = _roof(1)
+    original = hash_function(roof)
+    edits = [
+        _reencoded(roof, 40),
+        roof.resize((300, 300), Image.BILINEAR),
+        roof.crop((8, 8, 504, 504)),
+        _reencoded(roof.resize((800, 800)), 70),
+    ]
+    for edited in edits:
+        assert image_hash.hamming(original, hash_function(edited)) <= image_hash.NEAR_DUPLICATE_DISTANCE
+    for seed in range(2, 6):
+        assert image_hash.hamming(original, hash_function(_roof(seed))) > image_hash.NEAR_DUPLICATE_DISTANCE
+
+def test_signed_storage_round_trips():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        stored = image_hash.to_signed(value)
+        assert -(1 << 63) <= stored < 1 << 63
+        assert image_hash.to_unsigned(stored) == value
+
+@pytest.mark.parametrize("max_distance", [0, 3, 7, 12])
+def test_index_search_matches_a_full_scan(max_distance):
+    rng = random.Random(max_distance)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    # Plant hashes a few bits away from some of the others
+    for base in hashes[:60]:
+        flipped = base
+        for bit in rng.sample(range(64), rng.randint(0, 14)):
+            flipped ^= 1 << bit
+        hashes.append(flipped)
+    index = image_hash.HammingIndex()
+    for item, value in enumerate(hashes):
+        index.add(value, item)
+    assert len(index) == len(hashes)
+
+    for query in hashes[:80]:
+        expected = sorted((image_hash.hamming(query, value), item) for item, value in enumerate(hashes)
+                          if image_hash.hamming(query, value) <= max_distance)
+        found = index.search(query, max_distance)
+        assert sorted(found) == expected
+        assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
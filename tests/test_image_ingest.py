@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_ingest
+
+MODES = {"L": 1, "RGB": 3, "RGBA": 4}
+
+def _image(mode, width=301, height=203, seed=0):
+    """Gradients plus noise, so PNG picks different filters from row to row"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    channels = [(x * 3 + y * (c + 1) + rng.integers(0, 40, (height, width))) % 256 for c in range(MODES[mode])]
+    array = np.stack(channels, axis=-1).astype(np.uint8)
+    return Image.fromarray(array[..., 0] if mode == "L" else array, mode)
+
+def _expected(image, box, factor, max_size):
+    # Banded reads drop the box's last rows and columns that don't fill a whole factor x factor block
+    left, upper, right, lower = box
+    region = image.crop((left, upper, left + (right - left) // factor * factor,
+                         upper + (lower - upper) // factor * factor))
+    return image_ingest.fit_within(region.reduce(factor) if factor > 1 else region, max_size)
+
+@pytest.fixture
+def small_bands(monkeypatch):
+    # A few rows per band, so every read spans many bands, and no falling back to a full decode
+    monkeypatch.setattr(image_ingest, "BAND_BYTES", 4096)
+    monkeypatch.setattr(image_ingest, "MAX_FULL_DECODE_PIXELS", 0)
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("box,max_size", [(None, 1000), (None, 100), ((17, 31, 250, 190), 60)])
+@pytest.mark.parametrize("from_path", [True, False])
+def test_banded_png_reads_match_a_full_decode(small_bands, tmp_path, mode, box, max_size, from_path):
+    image = _image(mode)
+    path = tmp_path / "roof.png"
+    image.save(path)
+    full_box = box or (0, 0, *image.size)
+    factor = image_ingest._reduction_factor(full_box[2] - full_box[0], full_box[3] - full_box[1], max_size)
+    source = str(path) if from_path else io.BytesIO(path.read_bytes())
+
+    loaded = image_ingest.load_image(source, max_size=max_size, box=box)
+    expected = _expected(image, full_box, factor, max_size)
+    assert loaded.mode == mode and loaded.size == expected.size
+    assert loaded.tobytes() == expected.tobytes()
+
+@pytest.mark.parametrize("fmt", ["BMP", "TIFF"])
+def test_memory_mapped_reads_match_a_full_decode(small_bands, tmp_path, fmt):
+    image = _image("RGB")
+    path = tmp_path / f"roof.{fmt.lower()}"
+    image.save(path, format=fmt)
+    box = (5, 9, 290, 200)
+    loaded = image_ingest.load_image(str(path), max_size=90, box=box)
+    expected = _expected(image, box, image_ingest._reduction_factor(285, 191, 90), 90)
+    assert loaded.tobytes() == expected.tobytes()
+
+def test_ingest_limit_is_local_to_this_module(tmp_path, monkeypatch):
+    path = tmp_path / "roof.png"
+    _image("RGB").save(path)
+    # Past twice Pillow's limit, Image.open itself would refuse the file
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    assert image_ingest.load_image(str(path), max_size=50).width == 50
+    assert Image.MAX_IMAGE_PIXELS == 1000
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
+
+    monkeypatch.setattr(image_ingest, "MAX_INGEST_PIXELS", 10000)
+    with pytest.raises(image_ingest.ImageTooLargeError):
+        image_ingest.load_image(str(path))
+
+def test_images_that_need_a_full_decode_are_refused_past_the_limit(tmp_path, monkeypatch):
+    path = tmp_path / "roof.tiff"
+    _image("RGB").save(path, compression="tiff_lzw")  # Neither mappable nor banded
+    assert image_ingest.load_image(str(path)).size == (301, 203)
+    monkeypatch.setattr(image_ingest, "MAX_FULL_DECODE_PIXELS", 10000)
+    with pytest.raises(image_ingest.ImageTooLargeError):
+        image_ingest.load_image(str(path))
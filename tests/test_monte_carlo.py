@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+import battery_dispatch
+import monte_carlo
+import tariff_billing
+
+RATE = 8.5
+
+def test_results_depend_on_the_seed_not_the_worker_count():
+    serial = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=50000, seed=11)
+    parallel = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=50000, seed=11, workers=3)
+    assert serial == parallel
+    assert monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=50000, seed=12) != serial
+
+def test_p90_is_the_conservative_side_of_p50():
+    bands = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=20000)
+    assert bands["production_p90_kwh"] < bands["production_p50_kwh"]
+    assert bands["payback_p90_years"] > bands["payback_p50_years"]
+    assert bands["npv_p90"] < bands["npv_p50"]
+    # Centred on the point estimate, which the bands sit beside
+    assert bands["production_p50_kwh"] == pytest.approx(bands["annual_production_kwh"], rel=0.02)
+
+def test_bands_follow_the_tariff_and_battery():
+    tariff = tariff_billing.preset_tariffs(RATE)["Time-of-use (peak 17-22h), export at 30%"]
+    flat = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=20000)
+    billed = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=20000, tariff=tariff,
+                                             annual_load_kwh=4000)
+    assert billed["annual_savings"] < flat["annual_savings"]
+    assert billed["payback_p50_years"] > flat["payback_p50_years"]
+
+    battery = battery_dispatch.Battery(10, 5)
+    with_battery = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=20000, tariff=tariff,
+                                                   annual_load_kwh=4000, battery=battery)
+    assert with_battery["total_cost"] == billed["total_cost"] + battery.total_cost
+    assert with_battery["npv_p50"] != billed["npv_p50"]
+
+def test_no_savings_never_pays_back():
+    free = tariff_billing.Tariff("Free power", energy_rate=0.0)
+    bands = monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=20000, tariff=free)
+    assert bands["probability_no_payback"] == 1.0
+    assert math.isinf(bands["payback_p50_years"])
+
+def test_unknown_assumptions_are_rejected():
+    with pytest.raises(ValueError):
+        monte_carlo.simulate_financials("Monocrystalline", 5, RATE, samples=1000, sun_hour_sd=0.1)
@@ -0,0 +1,80 @@
+import multiprocessing
+from datetime import datetime, timezone
+
+import pytest
+
+import results_store
+
+PASSED = {"Building Code": (True, ""), "Net Metering": (False, ""), "Safety Standards": (True, "")}
+
+def _records(country, paybacks, month=3, checks=None):
+    return [
+        results_store.make_record(country, financials={"roi_years": payback}, checks=checks,
+                                  created_at=datetime(2025, month, 1 + i % 28, tzinfo=timezone.utc))
+        for i, payback in enumerate(paybacks)
+    ]
+
+def test_summary_counts_paybacks_and_compliance(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path))
+    store.append(_records("India", [4.0] * 30 + [6.0] * 70, checks=PASSED))
+    # No payback: never pays back, or rows without financials
+    store.append(_records("India", [None] * 10))
+    store.append(_records("Kenya", [9.0] * 20))
+
+    summary = store.portfolio_summary()
+    assert summary["rows"] == 130
+    assert summary["assessments"] == 120
+    assert summary["payback_median"] == pytest.approx(6.0, abs=results_store.PAYBACK_BIN_YEARS)
+    by_country = summary["by_country"].set_index("country")
+    assert by_country.loc["India", "assessments"] == 100
+    assert by_country.loc["India", "mean_payback_years"] == pytest.approx(5.4)
+    assert by_country.loc["India", "compliance_checks"] == 100
+    assert by_country.loc["India", "net_metering_failure_rate"] == 1.0
+    assert by_country.loc["India", "building_code_failure_rate"] == 0.0
+    assert by_country.loc["Kenya", "compliance_checks"] == 0
+
+def test_country_and_date_filters(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path))
+    store.append(_records("India", [5.0] * 28, month=3))
+    store.append(_records("India", [5.0] * 28, month=4))
+    store.append(_records("Kenya", [5.0] * 28, month=3))
+    assert store.countries() == ["India", "Kenya"]
+    assert store.portfolio_summary(["Kenya"])["rows"] == 28
+    # A range ending mid-month reads that partition row by row
+    since = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    until = datetime(2025, 4, 11, tzinfo=timezone.utc)
+    assert store.portfolio_summary(["India"], since, until)["rows"] == 38
+    assert store.query(["created_at"], ["India"], since, until).shape == (38, 1)
+
+def test_compaction_keeps_every_row(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path))
+    for _ in range(results_store.COMPACT_MIN_FILES):
+        store.append(_records("India", [5.0] * 10))
+    before = store.portfolio_summary()
+    assert store.compact() == 1
+    assert store.compact() == 0
+    after = store.portfolio_summary()
+    assert after["rows"] == before["rows"] == 10 * results_store.COMPACT_MIN_FILES
+    assert after["assessments"] == before["assessments"]
+
+def _compact(root):
+    return results_store.ResultsStore(root).compact(min_files=2)
+
+def test_concurrent_compaction_from_several_processes(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path))
+    for _ in range(20):
+        store.append(_records("India", [5.0] * 10))
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        assert sum(pool.map(_compact, [str(tmp_path)] * 4)) >= 1
+    assert store.scan(["roi_years"]).num_rows == 200
+
+def test_writer_flushes_buffered_rows(tmp_path):
+    writer = results_store.ResultsWriter(results_store.ResultsStore(str(tmp_path)), flush_rows=1000,
+                                         flush_seconds=3600)
+    try:
+        writer.add(_records("India", [5.0] * 25))
+        assert writer.store.scan(["roi_years"]).num_rows == 0
+        assert writer.flush() == 25
+        assert writer.store.scan(["roi_years"]).num_rows == 25
+    finally:
+        writer.close()
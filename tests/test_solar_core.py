@@ -0,0 +1,54 @@
+import pytest
+
+import battery_dispatch
+import solar_core
+import tariff_billing
+
+RATE = 8.5
+
+@pytest.mark.parametrize("system_size,sun_hours,annual_load_kwh", [
+    (5, 4.5, None),
+    (3, 5.5, 8000),
+    (10, 4.0, 4000),
+])
+@pytest.mark.parametrize("capacity_kwh", [2, 10, 30])
+def test_lossless_battery_never_lowers_savings(system_size, sun_hours, annual_load_kwh, capacity_kwh):
+    without = solar_core.calculate_financials("Monocrystalline", system_size, RATE, sun_hours,
+                                              annual_load_kwh=annual_load_kwh)
+    battery = battery_dispatch.Battery(capacity_kwh, capacity_kwh / 2, round_trip_efficiency=1.0)
+    with_battery = solar_core.calculate_financials("Monocrystalline", system_size, RATE, sun_hours,
+                                                   annual_load_kwh=annual_load_kwh, battery=battery)
+
+    # Energy still in the battery at the end of the year was produced but not yet billed
+    production = tariff_billing.production_profile(system_size, sun_hours, 20.0)
+    load = tariff_billing.load_profile(annual_load_kwh or without["annual_production_kwh"])
+    soc = battery_dispatch.simulate_battery(production, load, battery)["soc_kwh"]
+    banked_kwh = max(soc[-1] - capacity_kwh * battery.initial_soc, 0.0)
+
+    assert with_battery["annual_savings"] + banked_kwh * RATE >= without["annual_savings"] - 1e-6
+
+def test_payback_is_none_without_savings():
+    free = tariff_billing.Tariff("Free power", energy_rate=0.0)
+    result = solar_core.calculate_financials("Monocrystalline", 5, RATE, tariff=free)
+    assert result["annual_savings"] == 0
+    assert result["roi_years"] is None
+
+def test_batch_financials_match_one_at_a_time():
+    tariffs = tariff_billing.preset_tariffs(RATE)
+    scenarios = [
+        {"panel_type": panel_type, "system_size": 1 + i % 9, "electricity_rate": RATE, "sun_hours": 4 + i % 3 * 0.5,
+         "tariff": tariffs[name] if name else None, "annual_load_kwh": 3000 * (i % 4) or None,
+         "battery": battery_dispatch.Battery(10, 5) if i % 11 == 0 else None}
+        for i, (panel_type, name) in enumerate(
+            (panel_type, name)
+            for panel_type in solar_core.SOLAR_PANEL_TYPES
+            for name in [None, *tariffs]
+        )
+    ]
+    # Equal tariffs built separately are billed in one group
+    scenarios.append({**scenarios[1], "tariff": tariff_billing.preset_tariffs(RATE)[scenarios[1]["tariff"].name]})
+    for scenario, result in zip(scenarios, solar_core.calculate_financials_batch(scenarios, chunk_size=4)):
+        expected = solar_core.calculate_financials(**scenario)
+        assert result.keys() == expected.keys()
+        for key, value in expected.items():
+            assert result[key] == (pytest.approx(value) if isinstance(value, float) else value), key
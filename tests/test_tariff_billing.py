@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import tariff_billing
+
+RATE = 8.5
+
+def _profiles(system_size=5.0, annual_load_kwh=6000.0, sun_hours=4.5):
+    return (tariff_billing.production_profile(system_size, sun_hours),
+            tariff_billing.load_profile(annual_load_kwh))
+
+@pytest.mark.parametrize("annual_load_kwh", [2000.0, 8212.5, 20000.0])
+def test_net_metering_at_retail_credits_every_kwh(annual_load_kwh):
+    tariff = tariff_billing.Tariff("Flat", energy_rate=RATE, export_rate=RATE, net_metering=True)
+    production, load = _profiles(annual_load_kwh=annual_load_kwh)
+    bills = tariff_billing.simulate_bills(production, load, tariff)
+    assert bills["annual_savings"] == pytest.approx(production.sum() * RATE)
+
+def test_feed_in_pays_self_consumption_at_retail_and_exports_at_the_export_rate():
+    tariff = tariff_billing.Tariff("Feed-in", energy_rate=RATE, export_rate=RATE * 0.3)
+    production, load = _profiles()
+    bills = tariff_billing.simulate_bills(production, load, tariff)
+    assert bills["self_consumption_kwh"] + bills["annual_export_kwh"] == pytest.approx(production.sum())
+    assert bills["annual_savings"] == pytest.approx(
+        bills["self_consumption_kwh"] * RATE + bills["annual_export_kwh"] * RATE * 0.3)
+
+def test_without_export_credit_only_values_self_consumption():
+    tariff = tariff_billing.preset_tariffs(RATE)["Flat rate, net metering"].without_export_credit()
+    assert tariff.export_rate == 0 and not tariff.net_metering
+    production, load = _profiles()
+    bills = tariff_billing.simulate_bills(production, load, tariff)
+    assert bills["annual_export_kwh"] > 0
+    assert bills["annual_savings"] == pytest.approx(bills["self_consumption_kwh"] * RATE)
+    assert tariff.without_export_credit() is tariff
+
+def test_tiered_charge_fills_each_block_in_turn():
+    tariff = tariff_billing.Tariff("Tiered", tiers=[(100, 1.0), (300, 2.0), (None, 4.0)])
+    charges = tariff.tiered_charge(np.array([50.0, 100.0, 350.0]))
+    np.testing.assert_allclose(charges, [50.0, 100.0, 100 + 200 * 2.0 + 50 * 4.0])
+
+def test_equal_tariffs_share_a_key():
+    first, second = tariff_billing.preset_tariffs(RATE), tariff_billing.preset_tariffs(RATE)
+    for name in first:
+        assert first[name].key() == second[name].key()
+    assert len({tariff.key() for tariff in first.values()}) == len(first)
+
+def test_portfolio_study_matches_billing_customers_one_at_a_time():
+    rng = np.random.default_rng(7)
+    sizes = rng.uniform(1, 10, 23)
+    loads = rng.uniform(1000, 15000, 23)
+    tariffs = list(tariff_billing.preset_tariffs(RATE).values())
+    # A chunk size that doesn't divide the portfolio exercises the last partial chunk
+    results = tariff_billing.portfolio_study(sizes, loads, 4.5, tariffs, chunk_size=5)
+    for tariff in tariffs:
+        for i in (0, 4, 5, 22):
+            bills = tariff_billing.simulate_bills(*_profiles(sizes[i], loads[i]), tariff)
+            for metric, values in results[tariff.name].items():
+                assert values[i] == pytest.approx(float(bills[metric])), (tariff.name, metric, i)
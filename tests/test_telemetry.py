@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import telemetry
+
+OFFSET_HOURS = 5.5  # India
+DAYS = 10
+
+def _daylight_records(site, factor, epoch):
+    """15-minute power records for the hours the model expects output, as epoch seconds or local ISO strings"""
+    local = timezone(timedelta(hours=OFFSET_HOURS))
+    start = datetime(2025, 3, 1, tzinfo=local)
+    for d in range(DAYS):
+        day = start + timedelta(days=d)
+        for hour, expected_kwh in enumerate(site.expected_hourly(day.strftime("%Y-%m-%d"))):
+            if expected_kwh <= 0:
+                continue  # Inverters only report while producing
+            for quarter in range(4):
+                moment = day + timedelta(hours=hour, minutes=15 * quarter)
+                timestamp = moment.timestamp() if epoch else moment.strftime("%Y-%m-%dT%H:%M:%S")
+                yield timestamp, expected_kwh * factor
+
+def _performance(factor, epoch, utc_offset=OFFSET_HOURS):
+    site = telemetry.Site("pune-1", 5.0, 5.0, 18.5, utc_offset)
+    monitor = telemetry.TelemetryMonitor({site.site_id: site})
+    for timestamp, power_kw in _daylight_records(site, factor, epoch):
+        monitor.add(site.site_id, timestamp, power_kw=power_kw)
+    monitor.flush()
+    return monitor.summary(site.site_id)
+
+@pytest.mark.parametrize("epoch", [True, False])
+def test_healthy_site_reads_full_performance_with_epoch_or_local_timestamps(epoch):
+    summary = _performance(1.0, epoch)
+    assert summary["status"] == "ok"
+    assert summary["performance_ratio"] == pytest.approx(1.0, abs=0.01)
+
+def test_epoch_timestamped_underperformer_is_flagged():
+    summary = _performance(0.55, epoch=True)
+    assert summary["status"] == "underperforming"
+    assert summary["performance_ratio"] == pytest.approx(0.55, abs=0.01)
+
+def test_records_after_flush_do_not_reopen_a_closed_day():
+    site = telemetry.Site("pune-1", 5.0, 5.0, 18.5, OFFSET_HOURS)
+    monitor = telemetry.TelemetryMonitor({site.site_id: site})
+    records = list(_daylight_records(site, 1.0, epoch=False))
+    for timestamp, power_kw in records:
+        monitor.add(site.site_id, timestamp, power_kw=power_kw)
+    monitor.flush()
+    before = monitor.summary(site.site_id)
+
+    # A replayed final day and a flush with nothing open change nothing but the late count
+    last_day = [(t, p) for t, p in records if t.startswith(before["last_day"])]
+    for timestamp, power_kw in last_day:
+        monitor.add(site.site_id, timestamp, power_kw=power_kw)
+    monitor.flush()
+    after = monitor.summary(site.site_id)
+    assert after["late_records"] == len(last_day)
+    assert {k: v for k, v in after.items() if k != "late_records"} == \
+        {k: v for k, v in before.items() if k != "late_records"}
+
+def test_zoned_iso_timestamps_are_shifted_like_epoch_seconds():
+    instant = datetime(2025, 3, 1, 6, 45, tzinfo=timezone.utc)
+    offset = OFFSET_HOURS * 3600
+    assert telemetry._split_timestamp(instant.isoformat(), offset) == ("2025-03-01", 12)
+    assert telemetry._split_timestamp(instant.strftime("%Y-%m-%dT%H:%M:%SZ"), offset) == ("2025-03-01", 12)
+    assert telemetry._split_timestamp(instant.timestamp(), offset) == ("2025-03-01", 12)
+    assert telemetry._split_timestamp("2025-03-01T06:45:00", offset) == ("2025-03-01", 6)
+
+def test_sites_file_offset_defaults_to_longitude(tmp_path):
+    path = tmp_path / "sites.csv"
+    path.write_text("site_id,system_size_kw,sun_hours,latitude,longitude,utc_offset\n"
+                    "a,5,5,18.5,73.9,5.5\nb,5,5,18.5,73.9,\nc,5,5,18.5,,\n")
+    sites = telemetry.load_sites(str(path))
+    assert sites["a"].utc_offset_hours == 5.5
+    assert sites["b"].utc_offset_hours == pytest.approx(73.9 / 15)
+    assert sites["c"].utc_offset_hours == 0.0
@@ -0,0 +1,69 @@
+import random
+import threading
+import time
+
+import pytest
+
+import tile_cache
+
+SITE = (18.5204, 73.8567)
+
+class SlowMissCache(tile_cache.TileCache):
+    """Misses return late, so a download can finish between a caller's miss and what it does next"""
+
+    def get(self, zoom, x, y):
+        data = super().get(zoom, x, y)
+        if data is None:
+            time.sleep(random.uniform(0, 0.05))
+        return data
+
+@pytest.fixture
+def stand_in():
+    server = tile_cache.serve_stand_in(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.jpg"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher(stand_in, tmp_path):
+    fetcher = tile_cache.TileFetcher(
+        provider=tile_cache.XYZTileProvider(stand_in, max_zoom=18),
+        cache=SlowMissCache(str(tmp_path / "tiles.mbtiles")),
+    )
+    yield fetcher
+    fetcher.close()
+
+def test_concurrent_requests_download_each_tile_once(fetcher):
+    tiles = tile_cache.tiles_covering(*SITE, radius_m=60, zoom=18)
+    served_before = tile_cache._StandInHandler.requests_served
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def request_all():
+        barrier.wait()
+        try:
+            for _ in range(3):
+                for tile in tiles:
+                    fetcher.get_tile(*tile)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert fetcher.network_fetches == len(tiles)
+    assert tile_cache._StandInHandler.requests_served - served_before == len(tiles)
+
+def test_mosaic_past_max_zoom_uses_the_deepest_level(fetcher):
+    image = fetcher.mosaic(SITE, radius_m=30, zoom=20)
+    # +/- 30 m at zoom 18 (~0.57 m/pixel at this latitude)
+    size = 2 * 30 / tile_cache.meters_per_pixel(SITE[0], 18)
+    assert abs(image.width - size) <= 2 and abs(image.height - size) <= 2
+    assert all(tile in fetcher.cache for tile in tile_cache.tiles_covering(*SITE, radius_m=30, zoom=18))
+    with pytest.raises(tile_cache.TileError):
+        fetcher.submit((20, 0, 0))
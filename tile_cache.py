@@ -0,0 +1,419 @@
+import argparse
+import io
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests  # type: ignore
+from PIL import Image, ImageDraw  # type: ignore
+from tenacity import retry, stop_after_attempt, wait_exponential  # type: ignore
+
+# Satellite imagery for a site, fetched from an XYZ tile provider and kept in
+# an on-disk MBTiles cache. Neighbouring houses share tiles, so a batch survey
+# prefetches the union of tiles once and every later mosaic is a cache read.
+
+# === Configuration ===
+TILE_URL_TEMPLATE = os.getenv(
+    "TILE_URL_TEMPLATE",
+    "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+)
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "19"))  # Deepest level the provider serves
+TILE_CACHE_PATH = os.getenv("TILE_CACHE_PATH", "tile_cache.mbtiles")
+TILE_CACHE_MAX_BYTES = int(os.getenv("TILE_CACHE_MAX_MB", "512")) * 1024 * 1024
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "8"))
+USER_AGENT = "solar-industry-ai-assistant/1.0"
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", USER_AGENT)  # Nominatim asks for one that identifies the app
+GEOCODER_EMAIL = os.getenv("GEOCODER_EMAIL", "")                      # Contact address sent with each query
+GEOCODER_MIN_INTERVAL_S = float(os.getenv("GEOCODER_MIN_INTERVAL_S", "1.0"))  # Public Nominatim allows 1 request/s
+
+TILE_SIZE = 256
+DEFAULT_ZOOM = 19       # ~0.3 m/pixel at the equator
+DEFAULT_RADIUS_M = 30
+
+class TileError(Exception):
+    pass
+
+# === Web Mercator ===
+def tile_position(lat: float, lon: float, zoom: int):
+    """Fractional XYZ tile coordinates of a point"""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    n = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return x, y
+
+def meters_per_pixel(lat: float, zoom: int) -> float:
+    return 156543.03392 * math.cos(math.radians(lat)) / 2 ** zoom
+
+def pixel_window(lat: float, lon: float, radius_m: float, zoom: int):
+    """Global pixel box (left, top, right, bottom) of a square around a point"""
+    x, y = tile_position(lat, lon, zoom)
+    radius_px = radius_m / meters_per_pixel(lat, zoom)
+    cx, cy = x * TILE_SIZE, y * TILE_SIZE
+    return (int(cx - radius_px), int(cy - radius_px), int(math.ceil(cx + radius_px)), int(math.ceil(cy + radius_px)))
+
+def tiles_covering(lat: float, lon: float, radius_m: float = DEFAULT_RADIUS_M, zoom: int = DEFAULT_ZOOM):
+    """(zoom, x, y) of every tile the square around a point touches"""
+    left, top, right, bottom = pixel_window(lat, lon, radius_m, zoom)
+    n = 2 ** zoom
+    return [
+        (zoom, x % n, y)
+        for y in range(max(top // TILE_SIZE, 0), min((bottom - 1) // TILE_SIZE, n - 1) + 1)
+        for x in range(left // TILE_SIZE, (right - 1) // TILE_SIZE + 1)
+    ]
+
+# === Providers ===
+class XYZTileProvider:
+    """Any HTTP tile server addressed by {z}/{x}/{y} in a URL template"""
+
+    def __init__(self, url_template: str = TILE_URL_TEMPLATE, name=None, headers=None, timeout: float = 10,
+                 max_zoom: int = TILE_MAX_ZOOM):
+        self.url_template = url_template
+        self.name = name or url_template
+        self.headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        self.timeout = timeout
+        self.max_zoom = max_zoom
+        self._local = threading.local()
+
+    def _session(self):
+        # One keep-alive session per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=0.5, max=4), reraise=True)
+    def fetch(self, zoom: int, x: int, y: int) -> bytes:
+        response = self._session().get(self.url_template.format(z=zoom, x=x, y=y), timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+# === Geocoding ===
+class NominatimGeocoder:
+    """Address -> (lat, lon) via an OpenStreetMap Nominatim-compatible endpoint, at most one request per interval"""
+
+    def __init__(self, url: str = GEOCODER_URL, timeout: float = 10, user_agent: str = GEOCODER_USER_AGENT,
+                 email: str = GEOCODER_EMAIL, min_interval_s: float = GEOCODER_MIN_INTERVAL_S):
+        self.url = url
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.email = email
+        self.min_interval_s = min_interval_s
+        self._lock = threading.Lock()
+        self._next_request = 0.0  # time.monotonic() of the earliest next request
+
+    def _wait_turn(self):
+        # Each caller reserves the next slot under the lock, then sleeps outside it
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + self.min_interval_s
+        if start > now:
+            time.sleep(start - now)
+
+    def geocode(self, address: str):
+        params = {"q": address, "format": "json", "limit": 1}
+        if self.email:
+            params["email"] = self.email
+        self._wait_turn()
+        response = requests.get(self.url, params=params, headers={"User-Agent": self.user_agent}, timeout=self.timeout)
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise TileError(f"Address not found: {address}")
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+def parse_coordinates(text: str):
+    """(lat, lon) for "lat, lon" input, or None if it's an address"""
+    parts = text.replace(",", " ").split()
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    return (lat, lon) if -90 <= lat <= 90 and -180 <= lon <= 180 else None
+
+# === MBTiles Cache ===
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER,
+    tile_column INTEGER,
+    tile_row INTEGER,
+    tile_data BLOB,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+CREATE INDEX IF NOT EXISTS idx_tiles_access ON tiles(last_access);
+CREATE TABLE IF NOT EXISTS geocodes (query TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL);
+"""
+
+class TileCache:
+    """MBTiles-layout SQLite store with least-recently-used eviction past max_bytes
+
+    Rows use the MBTiles (TMS) convention of counting tile_row from the south,
+    so the file opens in standard MBTiles viewers; last_access is extra.
+    """
+
+    def __init__(self, path: str = TILE_CACHE_PATH, max_bytes: int = TILE_CACHE_MAX_BYTES, name: str = ""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+                [("name", name or "tile cache"), ("format", "jpg"), ("type", "baselayer")]
+            )
+        self.size_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles").fetchone()[0]
+
+    @staticmethod
+    def _key(zoom, x, y):
+        return zoom, x, 2 ** zoom - 1 - y
+
+    def get(self, zoom: int, x: int, y: int):
+        key = self._key(zoom, x, y)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE tiles SET last_access = ? WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (time.time(), *key)
+            )
+        return row[0]
+
+    def put(self, zoom: int, x: int, y: int, data: bytes):
+        key = self._key(zoom, x, y)
+        with self._lock, self._conn:
+            old = self._conn.execute(
+                "SELECT LENGTH(tile_data) FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", key
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data, last_access) "
+                "VALUES (?, ?, ?, ?, ?)", (*key, data, time.time())
+            )
+            self.size_bytes += len(data) - (old[0] if old else 0)
+            if self.size_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop to 90% of the cap so eviction doesn't run on every insert
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, LENGTH(tile_data) FROM tiles ORDER BY last_access"
+        )
+        doomed = []
+        for zoom, column, row, size in rows:
+            if self.size_bytes <= target:
+                break
+            doomed.append((zoom, column, row))
+            self.size_bytes -= size
+        self._conn.executemany(
+            "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", doomed
+        )
+
+    def __contains__(self, tile):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", self._key(*tile)
+            ).fetchone() is not None
+
+    def get_geocode(self, query: str):
+        with self._lock:
+            row = self._conn.execute("SELECT lat, lon FROM geocodes WHERE query = ?", (query,)).fetchone()
+        return tuple(row) if row else None
+
+    def put_geocode(self, query: str, lat: float, lon: float):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO geocodes (query, lat, lon) VALUES (?, ?, ?)", (query, lat, lon))
+
+    def close(self):
+        self._conn.close()
+
+# === Fetching ===
+class TileFetcher:
+    """Cache-first tile access with de-duplicated concurrent downloads"""
+
+    def __init__(self, provider=None, cache=None, geocoder=None, workers: int = TILE_WORKERS):
+        self.provider = provider or XYZTileProvider()
+        self.cache = cache or TileCache()
+        self.geocoder = geocoder or NominatimGeocoder()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tiles")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.network_fetches = 0
+
+    def _download(self, tile):
+        try:
+            data = self.provider.fetch(*tile)
+            self.cache.put(*tile, data)
+            return data
+        finally:
+            with self._lock:
+                self._in_flight.pop(tile, None)
+
+    def submit(self, tile) -> Future:
+        """Future for a tile's bytes; concurrent callers for one tile share a single download"""
+        if tile[0] > self.provider.max_zoom:
+            raise TileError(f"Zoom {tile[0]} is past the provider's maximum of {self.provider.max_zoom}")
+        # _download caches a tile before dropping it from _in_flight, so checking both under
+        # the lock never misses a download that just finished and starts it again
+        with self._lock:
+            future = self._in_flight.get(tile)
+            if future is not None:
+                return future
+            data = self.cache.get(*tile)
+            if data is None:
+                self.network_fetches += 1
+                future = self._in_flight[tile] = self.pool.submit(self._download, tile)
+                return future
+        future = Future()
+        future.set_result(data)
+        return future
+
+    def get_tile(self, zoom: int, x: int, y: int) -> bytes:
+        return self.submit((zoom, x, y)).result()
+
+    def locate(self, place):
+        """(lat, lon) for a (lat, lon) pair, "lat, lon" text or an address"""
+        if not isinstance(place, str):
+            return float(place[0]), float(place[1])
+        coordinates = parse_coordinates(place)
+        if coordinates:
+            return coordinates
+        query = " ".join(place.split()).lower()
+        cached = self.cache.get_geocode(query)
+        if cached:
+            return cached
+        lat, lon = self.geocoder.geocode(place)
+        self.cache.put_geocode(query, lat, lon)
+        return lat, lon
+
+    def zoom_for(self, zoom: int) -> int:
+        """The requested zoom, capped at the deepest level the provider serves"""
+        return min(zoom, self.provider.max_zoom)
+
+    def prefetch(self, places, radius_m: float = DEFAULT_RADIUS_M, zoom: int = DEFAULT_ZOOM):
+        """Download every tile covering a list of addresses/coordinates, each tile once"""
+        zoom = self.zoom_for(zoom)
+        tiles = []
+        seen = set()
+        for place in places:
+            for tile in tiles_covering(*self.locate(place), radius_m, zoom):
+                if tile not in seen:
+                    seen.add(tile)
+                    tiles.append(tile)
+        missing = [tile for tile in tiles if tile not in self.cache]
+        failed = []
+        for tile, future in [(tile, self.submit(tile)) for tile in missing]:
+            try:
+                future.result()
+            except Exception:
+                failed.append(tile)
+        return {"tiles": len(tiles), "cached": len(tiles) - len(missing),
+                "fetched": len(missing) - len(failed), "failed": failed}
+
+    def mosaic(self, place, radius_m: float = DEFAULT_RADIUS_M, zoom: int = DEFAULT_ZOOM) -> Image.Image:
+        """Stitch the tiles around a place and crop to a square of +/- radius_m
+
+        Past the provider's max_zoom, the crop comes from its deepest level
+        at that level's resolution.
+        """
+        zoom = self.zoom_for(zoom)
+        lat, lon = self.locate(place)
+        left, top, right, bottom = pixel_window(lat, lon, radius_m, zoom)
+        tiles = tiles_covering(lat, lon, radius_m, zoom)
+        futures = [(tile, self.submit(tile)) for tile in tiles]
+        first_x, first_y = left // TILE_SIZE, max(top // TILE_SIZE, 0)
+        columns = (right - 1) // TILE_SIZE - first_x + 1
+        rows = len(tiles) // columns
+        canvas = Image.new("RGB", (columns * TILE_SIZE, rows * TILE_SIZE))
+        for index, (tile, future) in enumerate(futures):
+            try:
+                data = future.result()
+            except Exception as e:
+                raise TileError(f"Couldn't fetch tile {tile}: {e}")
+            with Image.open(io.BytesIO(data)) as tile_image:
+                canvas.paste(tile_image.convert("RGB"), ((index % columns) * TILE_SIZE, (index // columns) * TILE_SIZE))
+        origin_x, origin_y = first_x * TILE_SIZE, first_y * TILE_SIZE
+        return canvas.crop((left - origin_x, top - origin_y, right - origin_x, bottom - origin_y))
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.cache.close()
+
+# === Stand-in Tile Server ===
+class _StandInHandler(BaseHTTPRequestHandler):
+    requests_served = 0
+
+    def do_GET(self):
+        try:
+            zoom, x, y = (int(part.split(".")[0]) for part in self.path.strip("/").split("/")[-3:])
+        except ValueError:
+            self.send_error(404)
+            return
+        type(self).requests_served += 1
+        # Deterministic synthetic "imagery": a colour per tile with its address drawn on it
+        image = Image.new("RGB", (TILE_SIZE, TILE_SIZE), ((x * 37) % 256, (y * 59) % 256, (zoom * 11) % 256))
+        ImageDraw.Draw(image).text((8, 8), f"{zoom}/{x}/{y}", fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=80)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(buffer.tell()))
+        self.end_headers()
+        self.wfile.write(buffer.getvalue())
+
+    def log_message(self, *args):
+        pass
+
+def serve_stand_in(port: int = 8077):
+    """Local synthetic tile server; point TILE_URL_TEMPLATE at http://127.0.0.1:<port>/{z}/{x}/{y}.jpg"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StandInHandler)
+    server.daemon_threads = True
+    return server
+
+# === Command Line ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Satellite tile cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prefetch = commands.add_parser("prefetch", help="Cache tiles for addresses or 'lat, lon' lines in a file")
+    prefetch.add_argument("places_file")
+    prefetch.add_argument("--radius", type=float, default=DEFAULT_RADIUS_M)
+    prefetch.add_argument("--zoom", type=int, default=DEFAULT_ZOOM)
+    crop = commands.add_parser("crop", help="Write the imagery around one place to a file")
+    crop.add_argument("place")
+    crop.add_argument("output")
+    crop.add_argument("--radius", type=float, default=DEFAULT_RADIUS_M)
+    crop.add_argument("--zoom", type=int, default=DEFAULT_ZOOM)
+    serve = commands.add_parser("serve", help="Run the synthetic stand-in tile server")
+    serve.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        print(f"Serving synthetic tiles at http://127.0.0.1:{args.port}/{{z}}/{{x}}/{{y}}.jpg")
+        serve_stand_in(args.port).serve_forever()
+    else:
+        fetcher = TileFetcher()
+        try:
+            if args.command == "prefetch":
+                with open(args.places_file, encoding="utf-8") as f:
+                    places = [line.strip() for line in f if line.strip()]
+                print(fetcher.prefetch(places, args.radius, args.zoom))
+            else:
+                fetcher.mosaic(args.place, args.radius, args.zoom).save(args.output)
+        finally:
+            fetcher.close()
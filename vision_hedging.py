@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from openai import AsyncOpenAI  # type: ignore
+
+# Hedged vision requests: if the primary provider hasn't streamed its first
+# token within an adaptive deadline (the observed p95), the same request goes
+# to a backup provider/model. Whichever streams first wins and the other is
+# cancelled, trimming the tail latency caused by occasional slow upstreams.
+
+logger = logging.getLogger("solar.hedge")
+
+# === Configuration ===
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_INITIAL_DEADLINE_S = float(os.getenv("HEDGE_INITIAL_DEADLINE_S", "8"))  # Until enough samples exist
+HEDGE_MIN_DEADLINE_S = 0.5
+HEDGE_WINDOW = 200       # Recent first-token latencies kept per provider
+HEDGE_MIN_SAMPLES = 20
+
+class VisionProvider:
+    """An OpenAI-compatible endpoint and model; the async client is created on the hedger's event loop"""
+
+    def __init__(self, name, base_url, api_key, model, extra_headers=None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.extra_headers = extra_headers
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            # No SDK retries: a failing primary fails over to the backup instead
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+        return self._client
+
+def backup_provider_from_env():
+    """Backup provider from HEDGE_* variables (OpenAI's API by default), or None without a key"""
+    api_key = os.getenv("HEDGE_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return VisionProvider(
+        os.getenv("HEDGE_PROVIDER_NAME", "openai"), os.getenv("HEDGE_BASE_URL", "https://api.openai.com/v1"),
+        api_key, os.getenv("HEDGE_MODEL", "gpt-4o")
+    )
+
+# === Metrics ===
+class LatencyTracker:
+    """Sliding window of first-token latencies per provider"""
+
+    def __init__(self, quantile: float = HEDGE_QUANTILE, initial_deadline: float = HEDGE_INITIAL_DEADLINE_S,
+                 min_deadline: float = HEDGE_MIN_DEADLINE_S, window: int = HEDGE_WINDOW):
+        self.quantile = quantile
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def deadline(self, provider: str) -> float:
+        """How long to wait for the first token before hedging"""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.initial_deadline
+        return max(self.min_deadline, samples[min(len(samples) - 1, int(self.quantile * len(samples)))])
+
+    def median(self, provider: str):
+        """Median first-token latency, or None before any samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        return samples[len(samples) // 2] if samples else None
+
+class HedgeStats:
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+        self.failovers = 0
+        self.latency_saved_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, hedged: bool, backup_won: bool, failover: bool, saved_s: float):
+        with self._lock:
+            self.requests += 1
+            self.hedged += hedged
+            self.backup_wins += backup_won
+            self.failovers += failover
+            self.latency_saved_s += saved_s
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "backup_wins": self.backup_wins,
+                "failovers": self.failovers,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "latency_saved_s": self.latency_saved_s,
+                "mean_latency_saved_s": self.latency_saved_s / self.backup_wins if self.backup_wins else 0.0,
+            }
+
+# === Hedging ===
+class _Attempt:
+    def __init__(self, provider: VisionProvider):
+        self.provider = provider
+        self.started = time.monotonic()
+        self.first_token_at = None
+        self.done = False
+        self.error = None
+        self.parts = []
+        self.usage = None
+        self.task = None
+
+class Hedger:
+    """Races a primary and a backup provider on a private event loop thread
+
+    Running on asyncio means cancelling the losing request actually closes its
+    connection, and clients (with their connection pools) live as long as the hedger.
+    """
+
+    def __init__(self, primary: VisionProvider, backup: VisionProvider, tracker=None, stats=None):
+        self.primary = primary
+        self.backup = backup
+        self.tracker = tracker or LatencyTracker()
+        self.stats = stats or HedgeStats()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="vision-hedger", daemon=True).start()
+
+    def complete(self, messages, max_tokens: int, temperature: float = 0.1):
+        """Run a chat completion with hedging; returns (content, response with .usage, route info)
+
+        The attempt that streams its first token first wins, and the other is
+        cancelled right then, closing its connection. Safe to call from any thread.
+        """
+        request = {"messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        return asyncio.run_coroutine_threadsafe(self._complete(request), self._loop).result()
+
+    async def _stream(self, attempt: _Attempt, request: dict, progress: asyncio.Event):
+        provider = attempt.provider
+        try:
+            stream = await provider.client().chat.completions.create(
+                model=provider.model, extra_headers=provider.extra_headers,
+                stream=True, stream_options={"include_usage": True}, **request
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.usage:
+                        attempt.usage = chunk.usage
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not text:
+                        continue
+                    attempt.parts.append(text)
+                    if attempt.first_token_at is None:
+                        attempt.first_token_at = time.monotonic()
+                        progress.set()
+            finally:
+                await stream.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempt.error = e
+        finally:
+            attempt.done = True
+            progress.set()
+
+    @staticmethod
+    async def _wait_until(predicate, progress: asyncio.Event, timeout=None):
+        """Wait for predicate() to hold, re-checking whenever an attempt reports progress"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            progress.clear()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(progress.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def _start(self, provider, request, progress):
+        attempt = _Attempt(provider)
+        attempt.task = asyncio.ensure_future(self._stream(attempt, request, progress))
+        return attempt
+
+    async def _complete(self, request: dict):
+        progress = asyncio.Event()
+        primary = self._start(self.primary, request, progress)
+        attempts = [primary]
+        await self._wait_until(lambda: primary.first_token_at or primary.done, progress,
+                               timeout=self.tracker.deadline(self.primary.name))
+        # A primary that failed before streaming anything fails over at once
+        failover = primary.done and primary.first_token_at is None
+        if primary.first_token_at is None:
+            attempts.append(self._start(self.backup, request, progress))
+            await self._wait_until(lambda: any(a.first_token_at for a in attempts) or all(a.done for a in attempts),
+                                   progress)
+
+        streaming = [a for a in attempts if a.first_token_at]
+        if not streaming:
+            for attempt in attempts:
+                attempt.task.cancel()
+            raise next((a.error for a in attempts if a.error), None) or Exception("No content returned")
+        winner = min(streaming, key=lambda a: a.first_token_at)
+        losers = [a for a in attempts if a is not winner]
+        cancelled_at = time.monotonic()
+        typical_primary = self.tracker.median(self.primary.name)
+        for loser in losers:
+            loser.task.cancel()
+        await asyncio.gather(winner.task, *(loser.task for loser in losers), return_exceptions=True)
+        if winner.error:
+            raise winner.error
+
+        for attempt in attempts:
+            if attempt.first_token_at:
+                self.tracker.record(attempt.provider.name, attempt.first_token_at - attempt.started)
+            elif not attempt.error:
+                # Cancelled before its first token: record the wait as a lower bound
+                self.tracker.record(attempt.provider.name, cancelled_at - attempt.started)
+        backup_won = winner is not primary
+        saved = 0.0
+        if backup_won:
+            # A cancelled primary never shows its first token; estimate it from the primary's median,
+            # measured before this request's censored sample was added
+            if primary.first_token_at:
+                primary_first_token = primary.first_token_at
+            else:
+                primary_first_token = primary.started + (typical_primary or 0.0)
+            saved = max(0.0, primary_first_token - winner.first_token_at)
+        self.stats.record(len(attempts) > 1, backup_won, failover, saved)
+
+        route = {
+            "provider": winner.provider.name,
+            "model": winner.provider.model,
+            "hedged": len(attempts) > 1,
+            "first_token_s": winner.first_token_at - primary.started,
+        }
+        logger.info("provider=%s model=%s hedged=%s first_token_s=%.2f saved_s=%.2f",
+                    route["provider"], route["model"], route["hedged"], route["first_token_s"], saved)
+        return "".join(winner.parts), SimpleNamespace(usage=winner.usage), route